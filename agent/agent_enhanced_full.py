@@ -2,54 +2,162 @@
 Enhanced Agent Server — adds:
 - Scenario generation (/generate_scenario)
 - Self-improving testing loop (auto-repair & retry inside /run with repairer integration)
-- FailureBank for storing past failures and simple similarity-based retrieval
+- FailureBank for storing past failures and indexed similarity retrieval (utils/failure_bank.py)
+- Selector repair ranks the executor's DOM index of interactive elements against the failed
+  target (utils/selector_ranker.py) instead of scanning the raw HTML snapshot; artifacts are
+  fetched by key from the executor's store (GET /artifacts/{key})
+- Suite execution (/run_suite) sharded across several executors by historical duration (LPT);
+  each shard runs likely failures and fast tests first (failure history from tasks + FailureBank,
+  utils/prioritizer.py) and `fail_fast: N` cancels the rest of the suite after N failed tests
+- Push task deltas over Server-Sent Events (/events/tasks, resumable via Last-Event-ID)
+- Bounded job scheduler (MAX_PARALLEL_TASKS workers, MAX_QUEUE_DEPTH queue) behind /run;
+  `wait: false` enqueues and returns the task_id immediately, 429 + Retry-After when full
+- Single-flight /run: identical TestIR + options submitted while a run is in flight attach to it
+  (utils/run_dedupe.py); RUN_RESULT_CACHE_SECONDS also serves recently completed runs
+- Adaptive timeouts: executor step timings feed per-(url pattern, action, selector) latency
+  sketches; steps without timeout_ms and timeout repairs use p99 * factor + margin (GET /latency)
+- Executor calls share one keep-alive client (utils/executor_client.py): jittered exponential
+  backoff, a per-executor circuit breaker and a TASK_DEADLINE_SECONDS budget sent as X-Deadline-Ms
+- Event log, task tail log and FailureBank appends go through batched JSONL writers
+  (utils/jsonl_writer.py): bounded queue, group commit on a worker thread, fsync every
+  LOG_FSYNC_EVERY lines / LOG_FSYNC_INTERVAL_MS, event log rotation at LOG_ROTATE_BYTES
+- Tracing: /run takes or creates an X-Trace-Id, forwards it to the executor and stores the
+  task's spans (queue wait, executor calls with the executor's own spans, repairs) under
+  result.trace; GET /metrics exposes Prometheus latency histograms and in-flight gauges
 
 Run: uvicorn agent_enhanced_full:app --reload --port 8000
 
 Notes:
 - Requires agent/utils/task_manager.py and agent/config.py present as defined earlier.
 - Requires executor at EXECUTOR_URL (env).
-- Uses OpenAI via LangChain if configured; otherwise falls back to heuristics.
+- Uses OpenAI via LangChain if configured; otherwise falls back to heuristics. LLM calls go
+  through utils/llm_gateway.py (persistent prompt-hash cache, coalescing, worker threads).
 """
 
 import os
 import json
 import asyncio
+import copy
 import aiohttp
 import logging
+import time
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
+from urllib.parse import quote
 from utils.task_manager import TaskManager
+from utils.jsonl_writer import JsonlHandler, JsonlWriter
+from utils.scheduler import JobScheduler, QueueFullError
+from utils.run_dedupe import RunDedupe, run_key
+from utils.sharding import historical_durations, lpt_shard
+from utils.prioritizer import suite_order
+from utils.failure_bank import FailureBank
+from utils.event_bus import EventBus, sse_stream
+from utils.metrics_engine import MetricsEngine
+from utils.latency_stats import LatencyStats
+from utils.selector_ranker import rank_candidates
+from utils.llm_gateway import LLMGateway, make_backend
+from utils.executor_client import CircuitOpenError, DeadlineExceededError, ExecutorClient
+from utils.tracing import (PROMETHEUS_CONTENT_TYPE, TRACE_HEADER, Registry, Trace, current_trace,
+                           instrument_app, reset_trace, span, use_trace)
 from config import Config
 
-# Optional LangChain/OpenAI imports
-try:
-    from langchain import LLMChain, PromptTemplate
-    from langchain.llms import OpenAI
-    LANGCHAIN_AVAILABLE = True
-except Exception:
-    LANGCHAIN_AVAILABLE = False
-
-# Simple similarity
-from difflib import SequenceMatcher
-
 app = FastAPI(title="Agent Enhanced")
 
-# logging
+# logging: JSONL files are appended by batched writers off the event loop
 os.makedirs(Config.DATA_DIR, exist_ok=True)
+
+def jsonl_writer(path: str, **kw) -> JsonlWriter:
+    return JsonlWriter(path, max_queue=Config.LOG_QUEUE_SIZE, fsync_every=Config.LOG_FSYNC_EVERY,
+                       fsync_interval_ms=Config.LOG_FSYNC_INTERVAL_MS, **kw)
+
+event_log_writer = jsonl_writer(Config.LOG_FILE, rotate_bytes=Config.LOG_ROTATE_BYTES,
+                                backups=Config.LOG_ROTATE_BACKUPS)
+task_log_writer = jsonl_writer(Config.TASK_STATE_FILE)
 logger = logging.getLogger("agent")
 logger.setLevel(Config.LOG_LEVEL)
-handler = logging.FileHandler(Config.LOG_FILE, encoding="utf-8")
+handler = JsonlHandler(event_log_writer)
 handler.setFormatter(logging.Formatter('%(message)s'))
 logger.addHandler(handler)
 
-# task manager
-task_manager = TaskManager(Config.TASK_STATE_FILE)
+# task manager (publishes task deltas to the event bus)
+event_bus = EventBus()
+task_manager = TaskManager(
+    Config.TASK_STATE_FILE,
+    snapshot_file=Config.TASK_SNAPSHOT_FILE,
+    compact_every=Config.TASK_COMPACT_EVERY,
+    retention_days=Config.TASK_RETENTION_DAYS,
+    retention_max=Config.TASK_RETENTION_MAX,
+    bus=event_bus,
+    writer=task_log_writer,
+)
+
+# report metrics, maintained incrementally from task/log/failure events
+metrics_engine = MetricsEngine(Config.METRICS_FILE)
+task_manager.add_listener(metrics_engine.on_task)
+
+# job scheduler: bounded worker pool shared by all /run submissions
+def _on_job_error(task_id: str, err: BaseException):
+    # errors of fire-and-forget jobs are already reflected in the task record
+    logger.info(json.dumps({"time": datetime.utcnow().isoformat(), "event": "job_error",
+                            "detail": {"task_id": task_id, "error": str(err)}}, ensure_ascii=False))
+
+scheduler = JobScheduler(Config.MAX_PARALLEL_TASKS, Config.MAX_QUEUE_DEPTH, on_error=_on_job_error)
+
+# identical concurrent /run submissions share one execution (plus an optional result cache)
+run_dedupe = RunDedupe(ttl_seconds=Config.RUN_RESULT_CACHE_SECONDS)
 
 # failure bank (local file-based)
 FAILURE_BANK_PATH = os.path.join(Config.DATA_DIR, "failure_bank.jsonl")
+FAILURE_BANK_SNAPSHOT = os.path.join(Config.DATA_DIR, "failure_bank.snapshot")
+failure_bank_writer = jsonl_writer(FAILURE_BANK_PATH)
+failure_bank = FailureBank(FAILURE_BANK_PATH, FAILURE_BANK_SNAPSHOT, writer=failure_bank_writer)
+
+# shared executor HTTP client: keep-alive pool, backoff with jitter, per-executor circuit breaker
+executor_client = ExecutorClient(
+    limit=Config.EXECUTOR_POOL_LIMIT,
+    limit_per_host=Config.EXECUTOR_POOL_LIMIT_PER_HOST,
+    timeout=Config.EXECUTOR_TIMEOUT,
+    retries=Config.RETRY_COUNT,
+    backoff_base=Config.RETRY_DELAY,
+    backoff_max=Config.RETRY_BACKOFF_MAX,
+    breaker_threshold=Config.BREAKER_THRESHOLD,
+    breaker_reset_seconds=Config.BREAKER_RESET_SECONDS,
+)
+
+# LLM gateway: OpenAI via LangChain when configured (or LLM_BACKEND=stub), cached by prompt hash
+llm_gateway = LLMGateway(
+    make_backend(Config.LLM_BACKEND, Config.OPENAI_API_KEY, stub_latency_ms=Config.LLM_STUB_LATENCY_MS),
+    cache_path=Config.LLM_CACHE_FILE,
+    ttl_seconds=Config.LLM_CACHE_TTL_SECONDS,
+    max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+    max_concurrency=Config.LLM_MAX_CONCURRENCY,
+)
+
+# step latency history -> adaptive timeouts
+latency_stats = LatencyStats(
+    Config.LATENCY_STATS_FILE,
+    min_samples=Config.TIMEOUT_MIN_SAMPLES,
+    p99_factor=Config.TIMEOUT_P99_FACTOR,
+    margin_ms=Config.TIMEOUT_MARGIN_MS,
+    floor_ms=Config.TIMEOUT_FLOOR_MS,
+    ceiling_ms=Config.TIMEOUT_CEILING_MS,
+)
+
+# Prometheus metrics (GET /metrics)
+metrics = Registry()
+instrument_app(app, metrics, "agent")
+TASKS_IN_FLIGHT = metrics.gauge("agent_tasks_in_flight", "Tasks currently executing")
+metrics.gauge("agent_queue_depth", "Tasks waiting for a scheduler worker", fn=lambda: scheduler.depth())
+QUEUE_WAIT_SECONDS = metrics.histogram("agent_queue_wait_seconds", "Time from /run to a worker picking the task up")
+TASK_SECONDS = metrics.histogram("agent_task_seconds", "Task execution time incl. retries", ("status",))
+EXECUTOR_CALL_SECONDS = metrics.histogram("agent_executor_call_seconds", "Executor HTTP round-trip")
+REPAIR_SECONDS = metrics.histogram("agent_repair_seconds", "Fix suggestion time (heuristics + LLM)")
+LLM_SECONDS = metrics.histogram("agent_llm_call_seconds", "LLM call latency", ("purpose",))
+RUNS_DEDUPLICATED = metrics.counter("agent_runs_deduplicated_total", "Runs answered by an identical run",
+                                    ("source",))
 
 class GenerateScenarioRequest(BaseModel):
     nl: str
@@ -59,6 +167,16 @@ class RunRequest(BaseModel):
     test_ir: Dict[str, Any]
     run_id: Optional[str] = None
     auto_repair: Optional[bool] = True
+    wait: Optional[bool] = True
+    priority: Optional[int] = 0
+    dedupe: Optional[bool] = True  # share an identical in-flight (or recently completed) run
+
+class SuiteRequest(BaseModel):
+    tests: List[Dict[str, Any]]
+    executors: Optional[List[str]] = None
+    auto_repair: Optional[bool] = True
+    prioritize: Optional[bool] = True  # likely failures / fast tests first within each shard
+    fail_fast: Optional[int] = None  # cancel the remaining tests once this many have failed
 
 class FailureRecord(BaseModel):
     job_id: str
@@ -66,6 +184,9 @@ class FailureRecord(BaseModel):
     failed_step: Dict[str, Any]
     artifacts: Dict[str, Any]
     timestamp: Optional[str] = None
+    url: Optional[str] = None  # page URL when the step failed
+    executor_url: Optional[str] = None  # where the artifacts live
+    test_id: Optional[str] = None
 
 # helpers
 async def log_event(event_type: str, detail: dict):
@@ -75,49 +196,54 @@ async def log_event(event_type: str, detail: dict):
         "detail": detail
     }
     logger.info(json.dumps(entry, ensure_ascii=False))
-
-async def call_executor(payload: dict, retries: int = Config.RETRY_COUNT):
-    url = Config.EXECUTOR_URL
-    last_exc = None
-    for attempt in range(retries + 1):
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, timeout=120) as resp:
-                    body = await resp.json()
-                    if resp.status == 200:
-                        return body
-                    else:
-                        # executor returned failure info in body
-                        return {"status": "failed", "detail": body}
-        except Exception as e:
-            last_exc = e
-            if attempt < retries:
-                await asyncio.sleep(Config.RETRY_DELAY)
-            else:
-                raise last_exc
+    metrics_engine.on_log(event_type, entry["time"])
+
+async def call_executor(payload: dict, retries: int = Config.RETRY_COUNT, url: Optional[str] = None,
+                        deadline: Optional[float] = None):
+    """POST to the executor over the shared keep-alive client. `deadline` (time.monotonic())
+    bounds each attempt's timeout, which is sent along so the executor can abort the browser work."""
+    url = url or Config.EXECUTOR_URL
+    trace = current_trace()
+    headers = {TRACE_HEADER: trace.trace_id} if trace is not None else None
+    status, body = await executor_client.post(url, payload, deadline=deadline, retries=retries, headers=headers)
+    if status == 200:
+        return body
+    # executor returned failure info in body (FastAPI wraps it in "detail")
+    detail = body.get("detail", body) if isinstance(body, dict) else body
+    return {"status": "failed", "http_status": status, "detail": detail}
+
+def executor_base(executor_url: str) -> str:
+    return executor_url[:-len("/exec")] if executor_url.endswith("/exec") else executor_url.rstrip("/")
+
+def artifact_url(executor_url: str, key: str) -> str:
+    """The executor's GET /artifacts/{key} for the /exec URL the run went to."""
+    return f"{executor_base(executor_url)}/artifacts/{quote(key, safe='')}"
+
+async def release_session(session_id: str, url: Optional[str] = None):
+    """End a leased session once no retry will resume it; the lease would expire anyway."""
+    try:
+        await executor_client.delete(f"{executor_base(url or Config.EXECUTOR_URL)}/sessions/{quote(session_id, safe='')}",
+                                     timeout=Config.ARTIFACT_FETCH_TIMEOUT)
+    except Exception as e:
+        await log_event("session_release_failed", {"session_id": session_id, "error": str(e)})
+
+async def load_artifact_json(failure: FailureRecord, key: str) -> Optional[Any]:
+    """A JSON artifact by store key; paths from executors sharing our filesystem still work."""
+    if os.path.isabs(key) and os.path.exists(key):
+        with open(key, "r", encoding="utf-8") as f:
+            return json.load(f)
+    status, data = await executor_client.get_bytes(artifact_url(failure.executor_url or Config.EXECUTOR_URL, key),
+                                                   timeout=Config.ARTIFACT_FETCH_TIMEOUT)
+    return json.loads(data) if status == 200 else None
 
 # Failure bank functions
 def add_failure_to_bank(failure: FailureRecord):
-    with open(FAILURE_BANK_PATH, "a", encoding="utf-8") as f:
-        record = failure.dict()
-        if not record.get("timestamp"):
-            record["timestamp"] = datetime.utcnow().isoformat()
-        f.write(json.dumps(record, ensure_ascii=False) + "\\n")
+    record = failure_bank.add(failure.dict())
+    metrics_engine.on_failure(record)
+    return record
 
 def retrieve_similar_failures(text: str, limit: int = 3):
-    results = []
-    if not os.path.exists(FAILURE_BANK_PATH):
-        return results
-    with open(FAILURE_BANK_PATH, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                rec = json.loads(line)
-                sim = SequenceMatcher(None, text, json.dumps(rec.get("failed_step", ""))).ratio()
-                results.append((sim, rec))
-            except Exception:
-                continue
-    results.sort(key=lambda x: x[0], reverse=True)
-    return [r for (_, r) in results[:limit]]
+    return failure_bank.search(text, k=limit)
 
 # Repairer (simple heuristics + LLM augmentation)
 async def suggest_fixes_from_failure(failure: FailureRecord) -> List[Dict[str, Any]]:
@@ -128,41 +254,74 @@ async def suggest_fixes_from_failure(failure: FailureRecord) -> List[Dict[str, A
     # heuristic: timeout -> increase timeout or add waitFor
     if "timeout" in err or "timed out" in err:
         new_step = dict(failed_step)
-        if "timeout_ms" in new_step:
-            new_step["timeout_ms"] = int(new_step.get("timeout_ms", 5000) * 2)
-        fixes.append({"type": "adjust_timeout", "patched_step": new_step, "confidence": 0.6, "explanation": "Increased timeout for flaky load"})
-        fixes.append({"type": "insert_waitfor", "patched_step": {"action": "waitfor", "target": failed_step.get("target"), "timeout_ms": 8000}, "confidence": 0.55, "explanation": "Insert explicit waitFor before action"})
-
-    # heuristic: selector not found -> try matching by text in DOM snapshot
-    if "selector" in failed_step.get("target", {}).get("type", "") or "selector" in json.dumps(failed_step.get("target", {})):
+        current = new_step.get("timeout_ms") or 5000
+        action = (failed_step.get("action") or "").lower()
+        selector = (failed_step.get("target") or {}).get("value")
+        if action == "goto":
+            observed = latency_stats.timeout_for(selector, action, None)
+        else:
+            observed = latency_stats.timeout_for(failure.url, action, selector)
+        if observed is not None:
+            # p99-based; never retry with a limit that already failed
+            new_step["timeout_ms"] = max(observed, int(current + Config.TIMEOUT_MARGIN_MS))
+            explanation = f"Timeout set from observed p99 latency ({new_step['timeout_ms']} ms)"
+        else:
+            new_step["timeout_ms"] = int(current * 2)
+            explanation = "Increased timeout for flaky load"
+        fixes.append({"type": "adjust_timeout", "patched_step": new_step, "confidence": 0.6, "explanation": explanation})
+        wait_ms = latency_stats.timeout_for(failure.url, "waitfor", selector) or 8000
+        fixes.append({"type": "insert_waitfor", "patched_step": {"action": "waitfor", "target": failed_step.get("target"), "timeout_ms": wait_ms}, "confidence": 0.55, "explanation": "Insert explicit waitFor before action"})
+
+    # heuristic: selector not found -> rank replacement selectors against the executor's DOM index
+    target = failed_step.get("target") or {}
+    if "selector" in target.get("type", "") or "selector" in json.dumps(target):
+        index_key = failure.artifacts.get("dom_index_key")
         dom_key = failure.artifacts.get("dom_snapshot_key")
-        if dom_key and os.path.exists(dom_key):
+        dom_index = None
+        if index_key:
             try:
-                with open(dom_key, "r", encoding="utf-8") as f:
-                    dom = json.load(f)
-                    html = dom.get("html", "")
-                    # attempt to find button texts nearby
-                    if "text=" in json.dumps(failed_step.get("target", {})):
-                        pass
-                    # naive: search for candidate text tokens from html
-                    for token in ["submit", "确认", "下单", "login", "登录", "加入购物车"]:
-                        if token in html:
-                            fixes.append({"type": "selector_text_match", "patched_step": {"action": failed_step.get("action"), "target": {"type": "text", "value": token}, "timeout_ms": failed_step.get("timeout_ms", 5000)}, "confidence": 0.5, "explanation": f"Found token '{token}' in DOM"})
-                            break
+                with span("artifact_fetch", key="dom_index"):
+                    dom_index = await load_artifact_json(failure, index_key)
+            except Exception:
+                pass
+        if dom_index is not None:
+            try:
+                with span("selector_rank") as attrs:
+                    candidates = rank_candidates(dom_index, target, failed_step.get("action"))
+                    attrs.update(elements=len(dom_index.get("elements") or []), candidates=len(candidates))
+                selector_fixes = [{
+                    "type": "selector_candidate",
+                    "patched_step": {"target": {"type": "selector", "value": c["selector"]}},
+                    "confidence": round(0.3 + 0.5 * c["score"], 2),
+                    "explanation": f"Closest element in DOM index ({c['score']:.2f}): {c['element'].get('name') or c['element'].get('css')}",
+                } for c in candidates]
+                # the selector matches nothing on the page: a longer timeout won't help
+                if dom_index.get("target_count") == 0:
+                    fixes[:0] = selector_fixes
+                else:
+                    fixes.extend(selector_fixes)
+            except Exception:
+                pass
+        elif dom_key:
+            # snapshot from an executor without the DOM index
+            try:
+                html = ((await load_artifact_json(failure, dom_key)) or {}).get("html", "")
+                for token in ["submit", "确认", "下单", "login", "登录", "加入购物车"]:
+                    if token in html:
+                        fixes.append({"type": "selector_text_match", "patched_step": {"action": failed_step.get("action"), "target": {"type": "text", "value": token}, "timeout_ms": failed_step.get("timeout_ms", 5000)}, "confidence": 0.5, "explanation": f"Found token '{token}' in DOM"})
+                        break
             except Exception:
                 pass
 
     # LLM augmentation
-    if LANGCHAIN_AVAILABLE and Config.OPENAI_API_KEY:
+    if llm_gateway.enabled:
         try:
             prompt = (
                 "Given a failed test step and artifacts, propose up to 3 concrete fix patches in JSON array format.\\n"
                 f"Failed step: {json.dumps(failure.failed_step)}\\nArtifacts keys: {list(failure.artifacts.keys())}\\n"
             )
-            template = PromptTemplate.from_template(prompt)
-            llm = OpenAI(openai_api_key=Config.OPENAI_API_KEY, temperature=0.0)
-            chain = LLMChain(llm=llm, prompt=template)
-            out = chain.run({})
+            with span("llm", LLM_SECONDS.labels(purpose="repair")):
+                out = await llm_gateway.complete(prompt)
             parsed = json.loads(out)
             for p in parsed:
                 fixes.append(p)
@@ -176,16 +335,14 @@ async def suggest_fixes_from_failure(failure: FailureRecord) -> List[Dict[str, A
 # Scenario generator
 async def generate_scenario_from_nl(nl: str, target_url: Optional[str] = None) -> Dict[str, Any]:
     # use LLM if available
-    if LANGCHAIN_AVAILABLE and Config.OPENAI_API_KEY:
+    if llm_gateway.enabled:
         prompt = (
             "You are a Scenario Generator. Given a user request, output a TestIR JSON with detailed steps.\\n"
             f"Request: {nl}\\nTarget URL: {target_url or ''}\\nOutput only JSON."
         )
-        template = PromptTemplate.from_template(prompt)
-        llm = OpenAI(openai_api_key=Config.OPENAI_API_KEY, temperature=0.0)
-        chain = LLMChain(llm=llm, prompt=template)
-        out = chain.run({})
         try:
+            with span("llm", LLM_SECONDS.labels(purpose="scenario")):
+                out = await llm_gateway.complete(prompt)
             return json.loads(out)
         except Exception:
             pass
@@ -216,108 +373,307 @@ async def generate_scenario(req: GenerateScenarioRequest):
     await log_event("scenario_generated", {"nl": req.nl, "test_id": scenario.get("test_id")})
     return scenario
 
+@app.on_event("startup")
+async def start_scheduler():
+    scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    await scheduler.stop()
+    await executor_client.close()
+    llm_gateway.close()
+    await task_manager.flush()
+    await failure_bank.save_snapshot_async()
+    metrics_engine.save()
+    latency_stats.save()
+    for writer in (event_log_writer, task_log_writer, failure_bank_writer):
+        await writer.close()
+
 @app.post("/run", summary="Run TestIR with auto-repair loop")
-async def run(req: RunRequest):
+async def run(req: RunRequest, x_trace_id: Optional[str] = Header(None)):
+    key = None
+    if Config.RUN_DEDUPE and req.dedupe:
+        # a caller-chosen run_id names its artifacts, so only runs sharing it can share a result
+        key = run_key(req.test_ir, auto_repair=bool(req.auto_repair), run_id=req.run_id)
+        shared = await dedupe_run(key, req)
+        if shared is not None:
+            return shared
+
+    # admission control before registering anything
+    try:
+        scheduler.ensure_capacity()
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
     # register task
     desc = req.test_ir.get("description", "") if isinstance(req.test_ir, dict) else ""
-    task_id = task_manager.create_task(desc)
+    task_id = task_manager.create_task(desc, test_id=req.test_ir.get("test_id"))
+    trace = Trace(x_trace_id)
+    job = lambda: execute_run(task_id, req, trace=trace)
+    if key is not None:
+        run_dedupe.begin(key, task_id, trace.trace_id)
+        job = lambda: run_dedupe.run(key, lambda: execute_run(task_id, req, trace=trace))
+    fut = scheduler.submit(task_id, job, priority=req.priority or 0, wait=bool(req.wait))
+    await log_event("task_created", {"id": task_id, "desc": desc, "priority": req.priority or 0,
+                                     "trace_id": trace.trace_id})
+
+    if fut is None:
+        return {"task_id": task_id, "status": "pending", "queue_depth": scheduler.depth(), "trace_id": trace.trace_id}
+    return await fut
+
+async def dedupe_run(key: str, req: RunRequest) -> Optional[Dict[str, Any]]:
+    """Answer from a recently completed or in-flight identical run, if there is one."""
+    cached = run_dedupe.cached(key)
+    if cached is not None:
+        RUNS_DEDUPLICATED.labels(source="cache").inc()
+        await log_event("run_deduplicated", {"task_id": cached.get("task_id"), "source": "cache"})
+        return dict(cached, deduplicated="cache")
+    leader = run_dedupe.leader(key)
+    if leader is None:
+        return None
+    task_id, trace_id, fut = leader
+    RUNS_DEDUPLICATED.labels(source="in_flight").inc()
+    await log_event("run_deduplicated", {"task_id": task_id, "source": "in_flight"})
+    if not req.wait:
+        task = task_manager.get_task(task_id) or {}
+        return {"task_id": task_id, "status": task.get("status", "pending"), "queue_depth": scheduler.depth(),
+                "trace_id": trace_id, "deduplicated": "in_flight"}
+    return dict(await run_dedupe.attach(fut), deduplicated="in_flight")
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    return dict(scheduler.stats(), dedupe=run_dedupe.stats())
+
+@app.get("/writers/stats")
+async def writers_stats():
+    return [w.stats() for w in (event_log_writer, task_log_writer, failure_bank_writer)]
+
+@app.get("/llm/stats")
+async def llm_stats():
+    return llm_gateway.stats()
+
+@app.get("/executors/stats")
+async def executors_stats():
+    return executor_client.stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/latency")
+async def latency(limit: int = 50):
+    """Most recently updated step latency sketches and the timeouts they imply."""
+    return {"adaptive_timeouts": Config.ADAPTIVE_TIMEOUTS, "keys": len(latency_stats.sketches),
+            "sketches": latency_stats.summary(min(max(limit, 1), 500))}
+
+def apply_fix(steps: List[Dict[str, Any]], fix: Dict[str, Any], index: Optional[int], failed_step: Dict[str, Any]) -> bool:
+    """Patch steps in place with a proposed fix. `index` is the failed step's position
+    in `steps` when the executor reported it; otherwise the first step with the same
+    action is patched."""
+    patched = fix.get("patched_step")
+    if not patched or fix.get("type") not in ("adjust_timeout", "insert_waitfor", "selector_text_match",
+                                                "selector_candidate"):
+        return False
+    if index is None or not (0 <= index < len(steps)):
+        index = next((i for i, s in enumerate(steps) if s.get("action") == failed_step.get("action")), None)
+        if index is None:
+            return False
+    if fix["type"] == "insert_waitfor":
+        # insert waitfor before failed step
+        steps.insert(index, patched)
+    else:
+        steps[index].update(patched)
+    return True
+
+def with_trace(result: Dict[str, Any]) -> Dict[str, Any]:
+    trace = current_trace()
+    return dict(result, trace=trace.to_dict()) if trace is not None else result
+
+async def execute_run(task_id: str, req: RunRequest, executor_url: Optional[str] = None,
+                      trace: Optional[Trace] = None):
+    """Execute/repair loop for one task; runs on a scheduler worker or a suite shard.
+
+    After a repair, only the patched step and the rest of the test are resent
+    together with the executor's session_id, so the retry continues on the page
+    where the failure happened instead of replaying the whole test.
+
+    `trace` is started when the task is submitted, so its first span is the queue wait.
+    """
+    trace = trace or Trace()
+    token = use_trace(trace)
+    waited = time.monotonic() - trace.started
+    trace.add("queue_wait", trace.started, waited)
+    QUEUE_WAIT_SECONDS.observe(waited)
+    TASKS_IN_FLIGHT.inc()
+    status = "failed"
+    try:
+        out = await _execute_run(task_id, req, executor_url)
+        status = out.get("status", status)
+        return dict(out, trace_id=trace.trace_id)
+    finally:
+        TASKS_IN_FLIGHT.dec()
+        TASK_SECONDS.labels(status=status).observe(time.monotonic() - trace.started - waited)
+        reset_trace(token)
+
+async def _execute_run(task_id: str, req: RunRequest, executor_url: Optional[str] = None):
     await task_manager.update_task(task_id, "running")
-    await log_event("task_created", {"id": task_id, "desc": desc})
 
     run_id = req.run_id or f"run_{task_id[:8]}"
-    payload = {"run_id": run_id, "test_ir": req.test_ir}
+    # timeouts and fixes are applied to our own copy: with dedupe, followers share this request
+    current_ir = copy.deepcopy(req.test_ir)
+    if Config.ADAPTIVE_TIMEOUTS:
+        adjusted = latency_stats.apply_defaults(current_ir.get("steps") or [])
+        if adjusted:
+            await log_event("timeouts_adapted", {"task_id": task_id, "steps": adjusted})
+    payload = {"run_id": run_id, "test_ir": current_ir}
+    # task-level budget shared by every attempt; the executor gets the remainder
+    deadline = time.monotonic() + Config.TASK_DEADLINE_SECONDS
 
     # attempt execution and auto-repair loop
     max_attempts = Config.RETRY_COUNT + 1
     attempt = 0
     last_error = None
-    current_ir = req.test_ir
+    offset = 0  # index in current_ir["steps"] of the first step sent in payload
+    session_id = None  # executor session leased by the latest attempt
     while attempt < max_attempts:
         attempt += 1
-        await log_event("executor_call", {"task_id": task_id, "attempt": attempt})
+        session_id = None
+        # only keep the failed context when a repaired retry may resume on it
+        payload["keep_session"] = bool(req.auto_repair) and attempt < max_attempts
+        await log_event("executor_call", {"task_id": task_id, "attempt": attempt, "from_step": offset,
+                                          "session_id": payload.get("session_id")})
         try:
-            resp = await call_executor(payload)
+            with span("executor_call", EXECUTOR_CALL_SECONDS, attempt=attempt, from_step=offset) as call:
+                resp = await call_executor(payload, url=executor_url, deadline=deadline)
+                body = (resp.get("detail") or resp) if isinstance(resp, dict) else None
+                if isinstance(body, dict) and isinstance(body.get("trace"), dict):
+                    call["executor_spans"] = body["trace"].get("spans")
         except Exception as e:
             last_error = str(e)
             await log_event("executor_error", {"task_id": task_id, "error": last_error})
-            # if executor unreachable, fail
-            await task_manager.update_task(task_id, "failed", {"error": last_error})
+            # if executor unreachable (or shed by its circuit breaker / out of time), fail
+            await task_manager.update_task(task_id, "failed", with_trace({"error": last_error}))
+            if isinstance(e, CircuitOpenError):
+                raise HTTPException(status_code=503, detail=last_error,
+                                    headers={"Retry-After": str(max(1, int(e.retry_after)))})
+            if isinstance(e, DeadlineExceededError):
+                raise HTTPException(status_code=504, detail=last_error)
             raise HTTPException(status_code=502, detail=last_error)
 
         # executor returns body; if includes status failed, inspect detail
         if isinstance(resp, dict) and resp.get("status") in ("failed", "error"):
             detail = resp.get("detail") or resp
+            if isinstance(detail, dict):
+                latency_stats.record(detail.get("step_timings"))
             err = detail.get("error") if isinstance(detail, dict) else str(detail)
             failed_step = detail.get("failed_step") if isinstance(detail, dict) else {}
             artifacts = detail.get("artifacts") if isinstance(detail, dict) else {}
 
+            if err == "session_expired" and payload.get("session_id"):
+                # checkpoint gone: rerun the (already patched) test from the start
+                await log_event("session_expired", {"task_id": task_id, "session_id": payload["session_id"]})
+                payload = {"run_id": run_id, "test_ir": current_ir}
+                offset = 0
+                attempt -= 1
+                continue
+            if err == "deadline_exceeded":
+                # the executor gave up on our behalf; no time left to repair
+                await log_event("deadline_exceeded", {"task_id": task_id, "attempt": attempt})
+                last_error = err
+                break
+            if isinstance(detail, dict) and detail.get("matrix"):
+                # data-driven run: failures are per row (see result matrix), one patch can't target a row
+                await log_event("matrix_failed", {"task_id": task_id, "rows": detail["matrix"].get("rows"),
+                                                  "passed": detail["matrix"].get("passed")})
+                await task_manager.update_task(task_id, "failed", with_trace({"error": err, "matrix": detail["matrix"]}))
+                return {"task_id": task_id, "status": "failed", "error": err, "matrix": detail["matrix"]}
+            perf = detail.get("perf") if isinstance(detail, dict) else None
+            if perf and perf.get("budgets", {}).get("violations") and detail.get("failed_step_index") is None:
+                # every step passed but the page is too slow/heavy: nothing for a selector fix to repair
+                await log_event("budget_failed", {"task_id": task_id, "violations": perf["budgets"]["violations"]})
+                await task_manager.update_task(task_id, "failed", with_trace({"error": err, "perf": perf}))
+                return {"task_id": task_id, "status": "failed", "error": err, "perf": perf}
+
+            rel_index = detail.get("failed_step_index") if isinstance(detail, dict) else None
+            failed_index = offset + rel_index if isinstance(rel_index, int) else None
+            session_id = detail.get("session_id") if isinstance(detail, dict) else None
+
             # record to failure bank
-            failure_record = FailureRecord(job_id=run_id, error=str(err), failed_step=failed_step or {}, artifacts=artifacts or {})
-            add_failure_to_bank(failure_record)
-            await log_event("failure_recorded", {"task_id": task_id, "error": str(err)})
+            with span("failure_bank_add"):
+                failure_record = FailureRecord(job_id=run_id, error=str(err), failed_step=failed_step or {}, artifacts=artifacts or {},
+                                               url=detail.get("failed_step_url") if isinstance(detail, dict) else None,
+                                               executor_url=executor_url or Config.EXECUTOR_URL,
+                                               test_id=req.test_ir.get("test_id"))
+                add_failure_to_bank(failure_record)
+            await log_event("failure_recorded", {"task_id": task_id, "error": str(err), "step_index": failed_index})
 
             # if auto_repair enabled, try to get fixes
             if req.auto_repair:
-                fixes = await suggest_fixes_from_failure(failure_record)
+                with span("repair", REPAIR_SECONDS):
+                    fixes = await suggest_fixes_from_failure(failure_record)
                 await log_event("fixes_proposed", {"task_id": task_id, "fixes": fixes})
                 # apply first applicable fix (very conservative: modify step in current_ir)
-                applied = False
+                applied = None
                 for f in fixes:
-                    if f.get("type") == "adjust_timeout" and f.get("patched_step"):
-                        # find matching step in current_ir and replace
-                        for s in current_ir.get("steps", []):
-                            if s.get("action") == failed_step.get("action"):
-                                s.update(f.get("patched_step"))
-                                applied = True
-                                break
-                    if f.get("type") == "insert_waitfor" and f.get("patched_step"):
-                        # insert waitfor before failed step
-                        new_steps = []
-                        inserted = False
-                        for s in current_ir.get("steps", []):
-                            if not inserted and s.get("action") == failed_step.get("action"):
-                                new_steps.append(f.get("patched_step"))
-                                inserted = True
-                            new_steps.append(s)
-                        if inserted:
-                            current_ir["steps"] = new_steps
-                            applied = True
-                    if f.get("type") == "selector_text_match" and f.get("patched_step"):
-                        for s in current_ir.get("steps", []):
-                            if s.get("action") == failed_step.get("action"):
-                                s.update(f.get("patched_step"))
-                                applied = True
-                                break
-                    if applied:
-                        # update payload for next attempt
-                        payload = {"run_id": run_id, "test_ir": current_ir}
+                    if apply_fix(current_ir.setdefault("steps", []), f, failed_index, failed_step or {}):
+                        applied = f
                         await log_event("fix_applied", {"task_id": task_id, "fix": f})
                         break
-                if not applied:
+                if applied is None:
                     await log_event("no_fix_applied", {"task_id": task_id})
                     last_error = err
                     break
+                # update payload for next attempt: resume from the failed step when possible
+                if session_id and failed_index is not None:
+                    payload = {
+                        "run_id": run_id,
+                        "test_ir": dict(current_ir, steps=current_ir["steps"][failed_index:]),
+                        "session_id": session_id,
+                    }
+                    offset = failed_index
                 else:
-                    # retry loop continues
-                    continue
+                    payload = {"run_id": run_id, "test_ir": current_ir}
+                    offset = 0
+                continue
             else:
                 # not auto repair -> finish as failed
-                await task_manager.update_task(task_id, "failed", {"error": err})
+                await task_manager.update_task(task_id, "failed", with_trace({"error": err}))
                 return {"task_id": task_id, "status": "failed", "error": err}
         else:
             # success
+            if isinstance(resp, dict):
+                latency_stats.record(resp.get("step_timings"))
+            resp = with_trace(resp)
             await task_manager.update_task(task_id, "completed", resp)
             await log_event("task_completed", {"task_id": task_id, "result": resp})
             return {"task_id": task_id, "status": "completed", "result": resp}
 
     # if loop exits with last_error
-    await task_manager.update_task(task_id, "failed", {"error": last_error})
+    if session_id:
+        await release_session(session_id, executor_url)
+    await task_manager.update_task(task_id, "failed", with_trace({"error": last_error}))
     await log_event("task_failed", {"task_id": task_id, "error": last_error})
     raise HTTPException(status_code=500, detail=str(last_error))
 
 @app.get("/tasks")
-async def list_tasks():
-    return task_manager.all_tasks()
+async def list_tasks(status: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+                     q: Optional[str] = None, cursor: Optional[str] = None, limit: int = 50,
+                     order: str = "desc", include_result: bool = False):
+    """Paginated task list. `status` accepts a comma-separated list; pass the returned
+    `next_cursor` as `cursor` to fetch the next page. Results are omitted unless
+    `include_result` is set (use GET /tasks/{id} for a single full record)."""
+    try:
+        page = task_manager.query(
+            statuses=[st for st in status.split(",") if st] if status else None,
+            since=since, until=until, text=q, cursor=cursor,
+            limit=max(1, min(limit, 500)), newest_first=(order != "asc"),
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not include_result:
+        page["items"] = [{k: v for k, v in t.items() if k != "result"} for t in page["items"]]
+    page["counts"] = task_manager.status_counts()
+    return page
 
 @app.get("/tasks/{task_id}")
 async def get_task(task_id: str):
@@ -325,3 +681,133 @@ async def get_task(task_id: str):
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
+
+@app.get("/events/tasks", summary="Stream task state changes as Server-Sent Events")
+async def task_events(last_event_id: Optional[str] = Header(None), since: Optional[str] = None):
+    """Each `task` event carries one changed task (without its result). Reconnects resume
+    from Last-Event-ID (or `?since=<id>`); a `reset` event means the gap could not be
+    replayed and the client should reload GET /tasks."""
+    return StreamingResponse(
+        sse_stream(event_bus, last_event_id or since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/run_suite", summary="Run many TestIRs sharded across executors, streaming results")
+async def run_suite(req: SuiteRequest):
+    """Shard `tests` over `executors` (LPT on historical durations) and stream NDJSON.
+
+    Each executor runs its shard sequentially, so suite concurrency is bounded by the
+    number of executors rather than by the scheduler queue. With `prioritize` a shard
+    runs its likely failures and fast tests first, and `fail_fast: N` cancels the
+    tests still running or queued once N have failed. Lines emitted: one `plan`, one
+    `result` per test as it finishes (status `cancelled` for those fail_fast
+    stopped), and a final `summary`.
+    """
+    executors = req.executors or [Config.EXECUTOR_URL]
+    tasks = task_manager.all_tasks()
+    durations = historical_durations(tasks)
+    shards = lpt_shard(req.tests, durations, len(executors))
+    priority: Dict[int, Dict[str, Any]] = {}
+    if req.prioritize:
+        with span("suite_prioritize", tests=len(req.tests)):
+            ranked = suite_order(req.tests, tasks, failure_bank.records, Config.PRIORITY_HALF_LIFE_HOURS,
+                                 Config.PRIORITY_NEW_TEST_RATE)
+        priority = {id(r["test"]): dict(r, rank=i) for i, r in enumerate(ranked)}
+        for shard in shards:
+            shard["tests"].sort(key=lambda ir: priority[id(ir)]["rank"])
+
+    # register every test up front so clients can track them via /tasks
+    planned = []
+    for url, shard in zip(executors, shards):
+        entries = []
+        for ir in shard["tests"]:
+            task_id = task_manager.create_task(ir.get("description", ""), test_id=ir.get("test_id"))
+            entries.append((task_id, ir))
+        planned.append((url, shard["estimated_seconds"], entries))
+    await log_event("suite_planned", {"tests": len(req.tests), "executors": executors,
+                                      "prioritized": bool(req.prioritize), "fail_fast": req.fail_fast})
+
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def run_shard(url: str, entries):
+        for task_id, ir in entries:
+            started = datetime.utcnow()
+            run_req = RunRequest(test_ir=ir, auto_repair=req.auto_repair)
+            try:
+                out = await execute_run(task_id, run_req, executor_url=url)
+                status, error = out.get("status"), out.get("error")
+            except HTTPException as e:
+                status, error = "failed", e.detail
+            except Exception as e:
+                status, error = "error", str(e)
+                await task_manager.update_task(task_id, "failed", {"error": error})
+            await results.put({
+                "event": "result",
+                "task_id": task_id,
+                "test_id": ir.get("test_id"),
+                "executor": url,
+                "status": status,
+                "error": error,
+                "duration_seconds": (datetime.utcnow() - started).total_seconds(),
+            })
+
+    def plan_entry(ir: Dict[str, Any]) -> Any:
+        p = priority.get(id(ir))
+        if p is None:
+            return ir.get("test_id")
+        return {"test_id": ir.get("test_id"), "p_fail": p["p_fail"], "seconds": p["seconds"]}
+
+    async def stream():
+        yield json.dumps({
+            "event": "plan",
+            "shards": [
+                {"executor": url, "estimated_seconds": est, "tests": [plan_entry(ir) for _, ir in entries]}
+                for url, est, entries in planned
+            ],
+        }, ensure_ascii=False) + "\n"
+        started = datetime.utcnow()
+        workers = [asyncio.create_task(run_shard(url, entries)) for url, _, entries in planned if entries]
+        counts: Dict[str, int] = {}
+        reported = set()
+        first_failure = None
+        stopped = False
+        try:
+            for _ in range(len(req.tests)):
+                item = await results.get()
+                reported.add(item["task_id"])
+                counts[item["status"]] = counts.get(item["status"], 0) + 1
+                if item["status"] != "completed" and first_failure is None:
+                    first_failure = (datetime.utcnow() - started).total_seconds()
+                yield json.dumps(item, ensure_ascii=False, default=str) + "\n"
+                failed = len(reported) - counts.get("completed", 0)
+                if req.fail_fast and failed >= req.fail_fast:
+                    stopped = True
+                    break
+        finally:
+            for w in workers:
+                w.cancel()
+        if stopped:
+            await asyncio.gather(*workers, return_exceptions=True)
+            while not results.empty():
+                # finished while the workers were being cancelled
+                item = results.get_nowait()
+                reported.add(item["task_id"])
+                counts[item["status"]] = counts.get(item["status"], 0) + 1
+                yield json.dumps(item, ensure_ascii=False, default=str) + "\n"
+            for url, _, entries in planned:
+                for task_id, ir in entries:
+                    if task_id in reported:
+                        continue
+                    await task_manager.update_task(task_id, "cancelled", {"error": "fail_fast"})
+                    counts["cancelled"] = counts.get("cancelled", 0) + 1
+                    yield json.dumps({"event": "result", "task_id": task_id, "test_id": ir.get("test_id"),
+                                      "executor": url, "status": "cancelled", "error": "fail_fast"},
+                                     ensure_ascii=False) + "\n"
+        summary = {"event": "summary", "total": len(req.tests), "counts": counts,
+                   "wall_seconds": (datetime.utcnow() - started).total_seconds(),
+                   "first_failure_seconds": first_failure, "fail_fast": stopped}
+        await log_event("suite_completed", summary)
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -1,65 +1,48 @@
 """
 Enhanced Agent Server with /report endpoint
-- Uses report_generator.compute_metrics and generate_summary
-- Exposes GET /report returning metrics + summary
+- Uses the enhanced agent's incrementally maintained MetricsEngine and report_generator.generate_summary
+- Exposes GET /report returning metrics + summary (constant time; see scripts/rebuild_metrics.py to backfill)
 """
 
 import os
 import json
 import asyncio
 import logging
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Response
 from datetime import datetime
-from pydantic import BaseModel
-from typing import Any, Dict, Optional
-from utils.task_manager import TaskManager
 from config import Config
-from report_generator import compute_metrics, generate_summary
+from report_generator import generate_summary_async
+from utils.tracing import PROMETHEUS_CONTENT_TYPE
 
 # Optional LangChain/OpenAI presence used inside report_generator
 
 app = FastAPI(title="Agent Enhanced with Reports")
 
-# logging
-os.makedirs(Config.DATA_DIR, exist_ok=True)
-logger = logging.getLogger("agent")
-logger.setLevel(Config.LOG_LEVEL)
-handler = logging.FileHandler(Config.LOG_FILE, encoding="utf-8")
-handler.setFormatter(logging.Formatter('%(message)s'))
-logger.addHandler(handler)
+# logging and task manager: share the instances owned by the enhanced agent
+# (a second log writer would interleave lines, and two managers compacting
+# the same tail log would corrupt each other's snapshot)
+from agent_enhanced_full import (event_bus, get_task, list_tasks, llm_gateway, logger, metrics, metrics_engine, run,
+                                 start_scheduler, stop_scheduler, task_events, task_manager)
 
-# task manager
-task_manager = TaskManager(Config.TASK_STATE_FILE)
-
-class RunRequest(BaseModel):
-    test_ir: Dict[str, Any]
-    run_id: Optional[str] = None
-    auto_repair: Optional[bool] = True
+# same lifecycle as the enhanced agent: start the scheduler; on exit flush the JSONL writers,
+# the task log, the FailureBank snapshot, metrics and latency stats
+app.on_event("startup")(start_scheduler)
+app.on_event("shutdown")(stop_scheduler)
 
 @app.get("/report")
 async def get_report():
-    metrics = compute_metrics(Config.DATA_DIR)
-    summary = generate_summary(metrics, openai_api_key=Config.OPENAI_API_KEY)
+    metrics = metrics_engine.snapshot()
+    metrics["recent_tasks"] = task_manager.query(limit=20)["items"]
+    summary = await generate_summary_async(metrics, llm_gateway)
     return {"metrics": metrics, "summary": summary}
 
-# re-export run endpoints from enhanced agent (simple wrapper)
-@app.post("/run")
-async def run(req: RunRequest):
-    # delegate to previous enhanced run implementation if exists
-    # To avoid duplicating code, import the original run from agent_enhanced_full if available
-    try:
-        from agent_enhanced_full import run as original_run
-        return await original_run(req)
-    except Exception:
-        raise HTTPException(status_code=500, detail="Original run implementation not found. Please ensure agent_enhanced_full.py is present.")
-
-@app.get("/tasks")
-async def list_tasks():
-    return task_manager.all_tasks()
+# re-export the run and task endpoints from the enhanced agent (one implementation to fix)
+app.post("/run", summary="Run TestIR with auto-repair loop")(run)
+app.get("/tasks")(list_tasks)
+app.get("/tasks/{task_id}")(get_task)
+app.get("/events/tasks", summary="Stream task state changes as Server-Sent Events")(task_events)
 
-@app.get("/tasks/{task_id}")
-async def get_task(task_id: str):
-    task = task_manager.get_task(task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    return task
+@app.get("/metrics")
+async def prometheus_metrics():
+    # task/executor metrics live in the enhanced agent's registry
+    return Response(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -2,16 +2,54 @@ import os
 
 class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "")  # openai | stub | none; empty = openai when a key is set
+    LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "800"))
+    LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 86400)))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
     EXECUTOR_URL = os.getenv("EXECUTOR_URL", "http://executor:3000/exec")
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    # JSONL writers (event log, task tail log, failure bank): queued, batched, fsynced off the event loop
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_FSYNC_EVERY = int(os.getenv("LOG_FSYNC_EVERY", "100"))  # lines; 0 = no count trigger
+    LOG_FSYNC_INTERVAL_MS = float(os.getenv("LOG_FSYNC_INTERVAL_MS", "1000"))  # 0 = no time trigger
+    LOG_ROTATE_BYTES = int(os.getenv("LOG_ROTATE_BYTES", str(50 * 1024 * 1024)))  # event log only
+    LOG_ROTATE_BACKUPS = int(os.getenv("LOG_ROTATE_BACKUPS", "5"))
     ENABLE_MONITORING = os.getenv("ENABLE_MONITORING", "false").lower() == "true"
     ENABLE_AUTH = os.getenv("ENABLE_AUTH", "false").lower() == "true"
     DATA_DIR = os.getenv("DATA_DIR", "./data")
     TASK_STATE_FILE = os.path.join(DATA_DIR, "tasks.jsonl")
+    TASK_SNAPSHOT_FILE = os.path.join(DATA_DIR, "tasks.snapshot.db")
+    TASK_COMPACT_EVERY = int(os.getenv("TASK_COMPACT_EVERY", "1000"))
+    TASK_RETENTION_DAYS = float(os.getenv("TASK_RETENTION_DAYS", "30"))
+    TASK_RETENTION_MAX = int(os.getenv("TASK_RETENTION_MAX", "100000"))
     LOG_FILE = os.path.join(DATA_DIR, "agent.log.jsonl")
+    METRICS_FILE = os.path.join(DATA_DIR, "metrics.json")
+    LLM_CACHE_FILE = os.path.join(DATA_DIR, "llm_cache.db")
+    LATENCY_STATS_FILE = os.path.join(DATA_DIR, "latency_stats.json")
+    ADAPTIVE_TIMEOUTS = os.getenv("ADAPTIVE_TIMEOUTS", "true").lower() == "true"
+    TIMEOUT_MIN_SAMPLES = int(os.getenv("TIMEOUT_MIN_SAMPLES", "20"))
+    TIMEOUT_P99_FACTOR = float(os.getenv("TIMEOUT_P99_FACTOR", "1.5"))
+    TIMEOUT_MARGIN_MS = float(os.getenv("TIMEOUT_MARGIN_MS", "500"))
+    TIMEOUT_FLOOR_MS = float(os.getenv("TIMEOUT_FLOOR_MS", "1000"))
+    TIMEOUT_CEILING_MS = float(os.getenv("TIMEOUT_CEILING_MS", "60000"))
     MAX_PARALLEL_TASKS = int(os.getenv("MAX_PARALLEL_TASKS", "3"))
+    MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", "100"))
+    RUN_DEDUPE = os.getenv("RUN_DEDUPE", "true").lower() in ("1", "true", "yes")
+    RUN_RESULT_CACHE_SECONDS = float(os.getenv("RUN_RESULT_CACHE_SECONDS", "0"))  # 0 = only share in-flight runs
     RETRY_COUNT = int(os.getenv("RETRY_COUNT", "2"))
-    RETRY_DELAY = float(os.getenv("RETRY_DELAY", "3.0"))
+    RETRY_DELAY = float(os.getenv("RETRY_DELAY", "3.0"))  # backoff base for executor retries
+    RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "30"))
+    EXECUTOR_TIMEOUT = float(os.getenv("EXECUTOR_TIMEOUT", "120"))
+    ARTIFACT_FETCH_TIMEOUT = float(os.getenv("ARTIFACT_FETCH_TIMEOUT", "10"))
+    EXECUTOR_POOL_LIMIT = int(os.getenv("EXECUTOR_POOL_LIMIT", "100"))
+    EXECUTOR_POOL_LIMIT_PER_HOST = int(os.getenv("EXECUTOR_POOL_LIMIT_PER_HOST", "20"))
+    BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "5"))
+    BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+    TASK_DEADLINE_SECONDS = float(os.getenv("TASK_DEADLINE_SECONDS", "900"))
+    # /run_suite ordering from failure history (utils/prioritizer.py)
+    PRIORITY_HALF_LIFE_HOURS = float(os.getenv("PRIORITY_HALF_LIFE_HOURS", "72"))
+    PRIORITY_NEW_TEST_RATE = float(os.getenv("PRIORITY_NEW_TEST_RATE", "0.3"))  # assumed failure rate without history
 
 # ensure data dir exists
 os.makedirs(Config.DATA_DIR, exist_ok=True)
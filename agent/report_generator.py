@@ -1,11 +1,10 @@
 import os
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 # Optional LLM
 try:
-    from langchain import LLMChain, PromptTemplate
     from langchain.llms import OpenAI
     LANGCHAIN_AVAILABLE = True
 except Exception:
@@ -28,14 +27,30 @@ def read_jsonl(path: str) -> List[Dict[str, Any]]:
     return items
 
 
-def compute_metrics(data_dir: str) -> Dict[str, Any]:
-    """Compute basic metrics from agent logs, tasks and failure bank."""
+def latest_per_task(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """tasks.jsonl holds one line per update; keep only the last version of each task."""
+    latest: Dict[str, Dict[str, Any]] = {}
+    for r in records:
+        if r.get('id'):
+            latest[r['id']] = r
+    return list(latest.values())
+
+
+def compute_metrics(data_dir: str, tasks: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Compute basic metrics from agent logs, tasks and failure bank by scanning the files.
+
+    Full-scan reference implementation; the agent serves /report from the
+    incremental utils.metrics_engine.MetricsEngine instead. `tasks` should come
+    from the TaskManager when available: tasks.jsonl is only the short tail log
+    since the last snapshot compaction.
+    """
     log_file = os.path.join(data_dir, 'agent.log.jsonl')
     tasks_file = os.path.join(data_dir, 'tasks.jsonl')
     failure_file = os.path.join(data_dir, 'failure_bank.jsonl')
 
     logs = read_jsonl(log_file)
-    tasks = read_jsonl(tasks_file)
+    if tasks is None:
+        tasks = latest_per_task(read_jsonl(tasks_file))
     failures = read_jsonl(failure_file)
 
     total_tasks = len(tasks)
@@ -62,6 +77,32 @@ def compute_metrics(data_dir: str) -> Dict[str, Any]:
         err = f.get('error') or 'unknown'
         err_counts[err] = err_counts.get(err, 0) + 1
 
+    # page performance of runs with meta.perf/budgets (worst navigation + HAR totals per run)
+    perf_values: Dict[str, List[float]] = {}
+    perf_runs = budget_failures = 0
+    violation_counts: Dict[str, int] = {}
+    for t in tasks:
+        result = t.get('result')
+        perf = result.get('perf') if isinstance(result, dict) else None
+        if t.get('status') not in ('completed', 'failed') or not isinstance(perf, dict) \
+                or not isinstance(perf.get('summary'), dict):
+            continue
+        perf_runs += 1
+        for name, value in perf['summary'].items():
+            if name != 'navigations' and isinstance(value, (int, float)):
+                perf_values.setdefault(name, []).append(value)
+        violations = (perf.get('budgets') or {}).get('violations') or []
+        budget_failures += bool(violations)
+        for v in violations:
+            violation_counts[v['metric']] = violation_counts.get(v['metric'], 0) + 1
+    performance = {
+        'runs': perf_runs,
+        'budget_failures': budget_failures,
+        'metrics': {name: {'count': len(vs), 'avg': round(sum(vs) / len(vs), 2), 'max': max(vs)}
+                    for name, vs in sorted(perf_values.items())},
+        'violations': violation_counts,
+    }
+
     # recent tasks
     recent = sorted(tasks, key=lambda x: x.get('created_at', ''), reverse=True)[:20]
 
@@ -75,42 +116,59 @@ def compute_metrics(data_dir: str) -> Dict[str, Any]:
         'recent_tasks': recent,
         'log_count': len(logs),
         'failure_count': len(failures),
+        'performance': performance,
     }
     return metrics
 
 
-def generate_summary(metrics: Dict[str, Any], openai_api_key: str = None) -> str:
-    """Generate a short natural-language summary using an LLM if available, otherwise heuristic."""
-    # Heuristic summary
-    def heuristic():
-        total = metrics.get('total_tasks', 0)
-        comp = metrics.get('completed', 0)
-        failed = metrics.get('failed', 0)
-        avg = metrics.get('avg_duration_seconds')
-        top_err = None
-        if metrics.get('failure_distribution'):
-            top_err = max(metrics['failure_distribution'].items(), key=lambda x: x[1])[0]
-        parts = []
-        parts.append(f"Total tasks: {total}. Completed: {comp}. Failed: {failed}.")
-        if avg:
-            parts.append(f"Average task duration: {avg:.1f}s.")
-        if top_err:
-            parts.append(f"Most common failure: {top_err}.")
-        return ' '.join(parts)
+def heuristic_summary(metrics: Dict[str, Any]) -> str:
+    total = metrics.get('total_tasks', 0)
+    comp = metrics.get('completed', 0)
+    failed = metrics.get('failed', 0)
+    avg = metrics.get('avg_duration_seconds')
+    top_err = None
+    if metrics.get('failure_distribution'):
+        top_err = max(metrics['failure_distribution'].items(), key=lambda x: x[1])[0]
+    parts = []
+    parts.append(f"Total tasks: {total}. Completed: {comp}. Failed: {failed}.")
+    if avg:
+        parts.append(f"Average task duration: {avg:.1f}s.")
+    if top_err:
+        parts.append(f"Most common failure: {top_err}.")
+    return ' '.join(parts)
+
 
+def summary_prompt(metrics: Dict[str, Any]) -> str:
+    """LLM prompt for a metrics summary. Per-task and per-minute detail is left out,
+    so the prompt (and its cache key) only changes when the aggregates do."""
+    facts = {k: v for k, v in metrics.items() if k not in ('recent_tasks', 'trends')}
+    facts['daily_trend'] = (metrics.get('trends') or {}).get('day', [])[-7:]
+    return (
+        "You are an assistant that summarizes QA test run metrics.\n"
+        f"Metrics JSON: {json.dumps(facts, sort_keys=True, default=str)}\n"
+        "Produce a 3-4 sentence summary highlighting success rate, trends, and top failure reasons."
+    )
+
+
+async def generate_summary_async(metrics: Dict[str, Any], gateway=None) -> str:
+    """Summary via the agent's LLM gateway (cached, off the event loop); heuristic
+    when no backend is configured or the call fails."""
+    if gateway is not None and gateway.enabled:
+        try:
+            return (await gateway.complete(summary_prompt(metrics))).strip()
+        except Exception:
+            pass
+    return heuristic_summary(metrics)
+
+
+def generate_summary(metrics: Dict[str, Any], openai_api_key: str = None) -> str:
+    """Generate a short natural-language summary using an LLM if available, otherwise heuristic.
+    Blocking; async callers should use generate_summary_async."""
     if LANGCHAIN_AVAILABLE and openai_api_key:
         try:
-            prompt = (
-                "You are an assistant that summarizes QA test run metrics.\n"
-                f"Metrics JSON: {json.dumps(metrics)}\n"
-                "Produce a 3-4 sentence summary highlighting success rate, trends, and top failure reasons."
-            )
-            template = PromptTemplate.from_template(prompt)
             llm = OpenAI(openai_api_key=openai_api_key, temperature=0.0)
-            chain = LLMChain(llm=llm, prompt=template)
-            out = chain.run({})
-            return out.strip()
+            return llm(summary_prompt(metrics)).strip()
         except Exception:
-            return heuristic()
+            return heuristic_summary(metrics)
     else:
-        return heuristic()
+        return heuristic_summary(metrics)
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# agent modules import each other as top-level modules (`from utils.x import ...`, `from config import Config`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Config reads DATA_DIR at import time; keep the app's files out of the working tree
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="agent-tests-"))
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agent_enhanced_full as agent
+import agent_enhanced_full_with_report as report_app
+from utils.run_dedupe import RunDedupe, run_key
+
+
+@pytest.fixture
+def fake_executor(monkeypatch):
+    calls = []
+
+    async def execute_run(task_id, req, executor_url=None, trace=None):
+        calls.append(req)
+        result = {"status": "success", "steps": len(req.test_ir.get("steps", []))}
+        await agent.task_manager.update_task(task_id, "completed", result)
+        return {"task_id": task_id, "status": "completed", "result": result}
+
+    monkeypatch.setattr(agent, "execute_run", execute_run)
+    return calls
+
+
+@pytest.mark.parametrize("app", [agent.app, report_app.app], ids=["agent", "report"])
+def test_lifecycle_starts_scheduler_and_saves_state_on_shutdown(app):
+    if os.path.exists(agent.Config.METRICS_FILE):
+        os.remove(agent.Config.METRICS_FILE)
+    with TestClient(app) as client:
+        assert agent.scheduler.workers
+        assert client.get("/tasks").status_code == 200
+    assert not agent.scheduler.workers
+    assert os.path.exists(agent.Config.METRICS_FILE)
+    assert all(w.pending() == 0 for w in (agent.event_log_writer, agent.task_log_writer, agent.failure_bank_writer))
+
+
+@pytest.mark.parametrize("app", [agent.app, report_app.app], ids=["agent", "report"])
+def test_run_endpoint(app, fake_executor):
+    ir = {"test_id": "checkout", "steps": [{"action": "goto", "target": {"value": "https://shop.test"}}]}
+    with TestClient(app) as client:
+        res = client.post("/run", json={"test_ir": ir, "dedupe": False})
+        assert res.status_code == 200, res.text
+        body = res.json()
+        assert body["status"] == "completed" and body["result"]["steps"] == 1
+        assert agent.task_manager.get_task(body["task_id"])["status"] == "completed"
+
+        # the wrapper delegates to the agent's run(), which reads every RunRequest field
+        res = client.post("/run", json={"test_ir": ir})
+        assert res.status_code == 200, res.text
+    assert [bool(r.dedupe) for r in fake_executor] == [False, True]
+
+
+def test_run_key_ignores_labels_and_key_order():
+    a = {"test_id": "a", "description": "x", "steps": [{"action": "click", "target": {"value": "#b"}}], "meta": {}}
+    b = {"meta": {}, "steps": [{"target": {"value": "#b"}, "action": "click"}], "test_id": "b"}
+    assert run_key(a, auto_repair=True) == run_key(b, auto_repair=True)
+    assert run_key(a, auto_repair=True) != run_key(a, auto_repair=False)
+    assert run_key(a) != run_key(dict(a, steps=[]))
+    assert run_key(a, auto_repair=True, run_id="r1") != run_key(b, auto_repair=True, run_id="r2")
+
+
+def test_runs_with_different_run_ids_are_not_deduplicated(monkeypatch, fake_executor):
+    monkeypatch.setattr(agent, "run_dedupe", RunDedupe(ttl_seconds=60))
+    ir = {"test_id": "checkout", "steps": [{"action": "goto", "target": {"value": "https://shop.test"}}]}
+    with TestClient(agent.app) as client:
+        bodies = [client.post("/run", json={"test_ir": ir, "run_id": run_id}).json() for run_id in ("r1", "r1", "r2")]
+    assert [b.get("deduplicated") for b in bodies] == [None, "cache", None]
+    assert [r.run_id for r in fake_executor] == ["r1", "r2"]
+
+
+def test_repair_loop_leaves_the_shared_request_untouched(monkeypatch):
+    sent = []
+
+    async def call_executor(payload, url=None, deadline=None):
+        sent.append(payload["test_ir"])
+        if len(sent) == 1:
+            return {"status": "failed", "detail": {"error": "timeout", "failed_step_index": 0}}
+        return {"status": "success"}
+
+    async def suggest_fixes_from_failure(failure):
+        return [{"type": "adjust_timeout", "patched_step": {"timeout": 9000}}]
+
+    monkeypatch.setattr(agent, "call_executor", call_executor)
+    monkeypatch.setattr(agent, "suggest_fixes_from_failure", suggest_fixes_from_failure)
+    ir = {"test_id": "checkout", "steps": [{"action": "click", "target": {"value": "#buy"}}]}
+    req = agent.RunRequest(test_ir=ir)
+    original = json.loads(json.dumps(req.test_ir))
+
+    task_id = agent.task_manager.create_task("copy", test_id="checkout")
+    assert asyncio.run(agent._execute_run(task_id, req))["status"] == "completed"
+    assert sent[1]["steps"][0]["timeout"] == 9000 and req.test_ir == original
+
+
+def test_failed_run_keeps_the_session_only_for_a_retry_and_releases_it(monkeypatch):
+    sent, released = [], []
+
+    async def call_executor(payload, url=None, deadline=None):
+        sent.append(dict(payload))
+        return {"status": "failed", "detail": {"error": "element not found", "failed_step_index": 0,
+                                               "session_id": "sess_1" if payload["keep_session"] else None}}
+
+    async def suggest_fixes_from_failure(failure):
+        return []
+
+    async def release_session(session_id, url=None):
+        released.append(session_id)
+
+    monkeypatch.setattr(agent, "call_executor", call_executor)
+    monkeypatch.setattr(agent, "suggest_fixes_from_failure", suggest_fixes_from_failure)
+    monkeypatch.setattr(agent, "release_session", release_session)
+    ir = {"test_id": "checkout", "steps": [{"action": "click", "target": {"value": "#buy"}}]}
+
+    task_id = agent.task_manager.create_task("lease", test_id="checkout")
+    with pytest.raises(agent.HTTPException):
+        asyncio.run(agent._execute_run(task_id, agent.RunRequest(test_ir=ir)))
+    assert sent[0]["keep_session"] and released == ["sess_1"]
+
+    task_id = agent.task_manager.create_task("no lease", test_id="checkout")
+    asyncio.run(agent._execute_run(task_id, agent.RunRequest(test_ir=ir, auto_repair=False)))
+    assert not sent[1]["keep_session"] and released == ["sess_1"]
@@ -0,0 +1,64 @@
+import asyncio
+
+from utils.event_bus import EventBus
+
+
+async def take(gen, n):
+    return [await gen.__anext__() for _ in range(n)]
+
+
+def test_resume_replays_events_after_last_event_id():
+    async def main():
+        bus = EventBus(history=10)
+        ids = [bus.publish("task", {"n": i}) for i in range(5)]
+        gen = bus.subscribe(ids[1])
+        replayed = await take(gen, 3)
+        assert [(e, d["n"]) for _, e, d in replayed] == [("task", 2), ("task", 3), ("task", 4)]
+        bus.publish("task", {"n": 5})
+        (event_id, _, data), = await take(gen, 1)
+        assert data == {"n": 5} and event_id == bus.event_id(6)
+        await gen.aclose()
+        assert not bus.subscribers
+
+    asyncio.run(main())
+
+
+def test_reset_when_the_gap_cannot_be_replayed():
+    async def main():
+        bus = EventBus(history=3)
+        first = bus.publish("task", {"n": 0})
+        for i in range(1, 6):
+            bus.publish("task", {"n": i})
+        for last_id in (first, "otherepoch-2", bus.event_id(99)):
+            gen = bus.subscribe(last_id)
+            (_, event, _), = await take(gen, 1)
+            assert event == "reset"
+            await gen.aclose()
+
+    asyncio.run(main())
+
+
+def test_slow_subscriber_is_disconnected_on_overflow():
+    async def main():
+        bus = EventBus(subscriber_queue=2)
+        gen = bus.subscribe()
+        pending = asyncio.ensure_future(gen.__anext__())
+        await asyncio.sleep(0)  # subscribed, waiting on its queue
+        assert len(bus.subscribers) == 1
+        for i in range(4):
+            bus.publish("task", {"n": i})
+        assert not bus.subscribers
+        assert (await pending)[2] == {"n": 0}
+        await gen.aclose()
+
+    asyncio.run(main())
+
+
+def test_keepalive_tick_yields_none():
+    async def main():
+        bus = EventBus()
+        gen = bus.subscribe(keepalive=0.01)
+        assert await gen.__anext__() is None
+        await gen.aclose()
+
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from utils.executor_client import DEADLINE_HEADER, CircuitOpenError, DeadlineExceededError, ExecutorClient, _Breaker
+
+
+def serve(statuses, seen):
+    """Executor stand-in answering /exec with the given statuses in turn (then 200)."""
+    async def exec_(request):
+        seen.append((await request.json(), request.headers.get(DEADLINE_HEADER)))
+        status = statuses.pop(0) if statuses else 200
+        return web.json_response({"status": "failed" if status == 500 else "ok"}, status=status)
+
+    app = web.Application()
+    app.router.add_post("/exec", exec_)
+    return app
+
+
+async def start(app):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}/exec"
+
+
+def test_retries_transient_statuses_and_sends_the_deadline():
+    async def main():
+        seen = []
+        runner, url = await start(serve([503, 502, 200, 500], seen))
+        client = ExecutorClient(retries=2, backoff_base=0.01)
+        try:
+            status, body = await client.post(url, {"run_id": "r1"}, deadline=time.monotonic() + 30)
+            assert (status, body) == (200, {"status": "ok"}) and len(seen) == 3
+            assert int(seen[0][1]) > 25000 and seen[0][0] == {"run_id": "r1"}
+            # a 500 is the executor reporting a failed test: answered, not retried
+            status, body = await client.post(url, {"run_id": "r2"})
+            assert (status, body["status"]) == (500, "failed")
+            assert client.stats()["retries"] == 2 and client.breaker(url).state == "closed"
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+def test_deadline_header_is_the_attempt_timeout():
+    async def main():
+        seen = []
+        runner, url = await start(serve([], seen))
+        client = ExecutorClient(timeout=5)
+        try:
+            await client.post(url, {})  # no task deadline: the client timeout still bounds the run
+            await client.post(url, {}, deadline=time.monotonic() + 30)  # capped by the client timeout
+            await client.post(url, {}, deadline=time.monotonic() + 2)  # capped by the task deadline
+            assert [int(h) for _, h in seen[:2]] == [5000, 5000]
+            assert 1500 < int(seen[2][1]) <= 2000
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes_once():
+    async def main():
+        runner, url = await start(serve([503] * 10, []))
+        client = ExecutorClient(retries=0, breaker_threshold=2, breaker_reset_seconds=0.2)
+        try:
+            for _ in range(2):
+                assert (await client.post(url, {}))[0] == 503
+            with pytest.raises(CircuitOpenError) as exc:
+                await client.post(url, {})
+            assert 0 < exc.value.retry_after <= 0.2
+            await asyncio.sleep(0.25)
+            assert (await client.post(url, {}))[0] == 503  # the half-open probe fails: open again
+            with pytest.raises(CircuitOpenError):
+                await client.post(url, {})
+            stats = client.stats()
+            assert stats["rejected_by_breaker"] == 2 and stats["breakers"][url]["trips"] == 2
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+def test_deadline_is_not_exceeded_by_backoff():
+    async def main():
+        runner, url = await start(serve([503] * 5, []))
+        client = ExecutorClient(retries=3, backoff_base=10, backoff_max=10)
+        try:
+            with pytest.raises(DeadlineExceededError):
+                await client.post(url, {}, deadline=time.monotonic() + 1)
+            with pytest.raises(DeadlineExceededError):
+                await client.post(url, {}, deadline=time.monotonic() - 1)
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+def test_breaker_half_open_lets_one_probe_through():
+    b = _Breaker(threshold=1, reset_seconds=0)
+    b.failure()
+    assert b.state == "half_open" and b.allow() is None and b.allow() is not None
+    b.success()
+    assert b.state == "closed" and b.allow() is None
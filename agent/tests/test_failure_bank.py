@@ -0,0 +1,66 @@
+import asyncio
+import json
+import os
+import pickle
+
+from utils.failure_bank import FailureBank, featurize
+
+
+def record(i, error, selector="#submit"):
+    return {"job_id": f"run_{i}", "error": error, "failed_step": {"action": "click", "target": {"value": selector}},
+            "artifacts": {}}
+
+
+def test_featurize_collapses_digits_and_adds_bigrams():
+    assert featurize("Timeout 5000ms exceeded") == featurize("timeout 8000ms EXCEEDED")
+    assert "timeout 0ms" in featurize("Timeout 5000ms")
+
+
+def test_search_ranks_the_most_similar_failure_first(tmp_path):
+    bank = FailureBank(str(tmp_path / "fb.jsonl"))
+    bank.add(record(1, "Timeout 5000ms exceeded waiting for locator", "#checkout"))
+    bank.add(record(2, "net::ERR_CONNECTION_REFUSED at https://staging.example.com"))
+    bank.add(record(3, "Element is not visible", "#menu"))
+    hits = bank.search_failure("Timeout 30000ms exceeded waiting for locator",
+                               {"action": "click", "target": {"value": "#checkout"}}, k=2)
+    assert hits[0]["job_id"] == "run_1"
+    assert bank.search("completely unrelated words") == []
+
+
+def test_snapshot_plus_tail_replay_restores_the_index(tmp_path):
+    path, snap = str(tmp_path / "fb.jsonl"), str(tmp_path / "fb.snapshot")
+    bank = FailureBank(path, snap, snapshot_every=3)
+    for i in range(7):  # snapshots after 3 and 6 records; the 7th is only in the tail
+        bank.add(record(i, f"Timeout exceeded on step {i}" if i % 2 else "strict mode violation"))
+    reloaded = FailureBank(path, snap, snapshot_every=3)
+    assert len(reloaded) == 7
+    assert reloaded.offset == os.path.getsize(path)
+    assert reloaded.search("strict mode violation", k=10) == bank.search("strict mode violation", k=10)
+
+
+def test_async_snapshot_is_consistent_while_records_keep_arriving(tmp_path):
+    path, snap = str(tmp_path / "fb.jsonl"), str(tmp_path / "fb.snapshot")
+
+    async def main():
+        bank = FailureBank(path, snap, snapshot_every=1000)
+        for i in range(50):
+            bank.add(record(i, f"error kind {i % 5}", f"#sel-{i % 7}"))
+        pending = asyncio.ensure_future(bank.save_snapshot_async())
+        await asyncio.sleep(0)  # the cut is taken; the pickle runs on a thread
+        for i in range(50, 80):
+            bank.add(record(i, f"brand new error {i}", "#other"))
+        await pending
+        return bank
+
+    bank = asyncio.run(main())
+    with open(snap, "rb") as f:
+        state = pickle.load(f)
+    assert len(state["records"]) == 50
+    assert all(doc < len(state["doc_features"]) for docs in state["postings"].values() for doc in docs)
+    with open(path, "rb") as f:
+        assert len(f.read(state["offset"]).splitlines()) == 50
+
+    reloaded = FailureBank(path, snap)
+    assert len(reloaded) == 80
+    assert reloaded.search("brand new error", k=3) == bank.search("brand new error", k=3)
+    assert json.loads(open(path).read().splitlines()[-1])["job_id"] == "run_79"
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+
+from utils.jsonl_writer import JsonlWriter
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["i"] for line in f]
+
+
+def test_lines_keep_write_order_across_batches_and_inline_drains(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+
+    async def main():
+        writer = JsonlWriter(path, max_queue=50, fsync_every=0, fsync_interval_ms=0)
+        for i in range(1000):
+            writer.write({"i": i})
+            if i % 97 == 0:
+                await asyncio.sleep(0)  # let the worker take a batch
+        await writer.close()
+        return writer.stats()
+
+    stats = asyncio.run(main())
+    assert read(path) == list(range(1000))
+    assert stats["lines"] == 1000 and stats["inline_drains"] > 0 and stats["pending"] == 0
+
+
+def test_rename_moves_everything_queued_before_it(tmp_path):
+    path, moved = str(tmp_path / "tasks.jsonl"), str(tmp_path / "tasks.jsonl.compacting")
+
+    async def main():
+        writer = JsonlWriter(path)
+        for i in range(100):
+            writer.write({"i": i})
+        rename = asyncio.ensure_future(writer.rename(moved))
+        await asyncio.sleep(0)
+        await rename
+        for i in range(100, 150):
+            writer.write({"i": i})
+        await writer.close()
+
+    asyncio.run(main())
+    assert read(moved) == list(range(100))
+    assert read(path) == list(range(100, 150))
+
+
+def test_rotation_and_synchronous_writes_without_a_loop(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    writer = JsonlWriter(path, rotate_bytes=60, backups=2)
+    for i in range(40):
+        writer.write(json.dumps({"i": i}))  # no running loop: written inline
+    asyncio.run(writer.close())
+    kept = read(path + ".2") + read(path + ".1") + read(path)
+    assert kept == list(range(40 - len(kept), 40))  # oldest backups dropped, order intact
+    assert writer.stats()["rotations"] > 2
+
+
+def test_task_compaction_through_the_writer_keeps_every_update(tmp_path):
+    from utils.task_manager import TaskManager
+
+    state = str(tmp_path / "tasks.jsonl")
+
+    async def main():
+        writer = JsonlWriter(state)
+        tm = TaskManager(state, compact_every=25, writer=writer)
+        ids = [tm.create_task(f"t{i}") for i in range(30)]
+        for i, task_id in enumerate(ids):
+            await tm.update_task(task_id, "completed" if i % 2 else "failed", {"n": i})
+        await tm.flush()
+        await writer.close()
+        return {t: tm.get_task(t)["status"] for t in ids}
+
+    statuses = asyncio.run(main())
+    assert os.path.exists(state + ".snapshot.db")  # at least one compaction ran
+    reloaded = TaskManager(state)
+    assert {t: reloaded.get_task(t)["status"] for t in statuses} == statuses
+    assert reloaded.get_task(next(iter(statuses)))["result"] == {"n": 0}
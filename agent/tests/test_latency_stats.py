@@ -0,0 +1,68 @@
+import random
+
+from utils.latency_stats import LatencyStats, QuantileSketch, url_pattern
+
+
+def exact(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    rnd = random.Random(7)
+    values = [rnd.lognormvariate(5, 1.2) for _ in range(20000)]
+    sketch = QuantileSketch(relative_accuracy=0.02)
+    for v in values:
+        sketch.add(v)
+    for q in (0.5, 0.9, 0.99, 0.999):
+        assert abs(sketch.quantile(q) - exact(values, q)) <= 0.02 * exact(values, q)
+    assert sketch.quantile(0.0) == min(values) and sketch.quantile(1.0) == max(values)
+    assert len(sketch.buckets) < 500  # log-spaced: grows with the value range, not the count
+
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert restored.quantile(0.99) == sketch.quantile(0.99)
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_url_pattern_collapses_ids():
+    assert url_pattern("https://Shop.test/orders/12345/items?x=1#top") == "shop.test/orders/:id/items"
+    assert url_pattern("https://shop.test/u/3f2a9c1e-8b7d-4e6f-9a0b") == "shop.test/u/:id"
+    assert url_pattern(None) == ""
+
+
+def timing(ms, ok=True, url="shop.test/cart", action="click", selector="#buy"):
+    return {"ms": ms, "ok": ok, "url_pattern": url, "action": action, "selector": selector}
+
+
+def test_timeouts_need_min_samples_and_fall_back_to_any_page():
+    stats = LatencyStats(min_samples=20, p99_factor=1.5, margin_ms=500, floor_ms=1000, ceiling_ms=60000)
+    assert stats.record([timing(30000, ok=False)]) == 0  # a timeout isn't a latency sample
+    stats.record([timing(1000 + 10 * i) for i in range(19)])
+    assert stats.timeout_for("https://shop.test/cart", "click", "#buy") is None
+    stats.record([timing(1190)])
+
+    p99 = stats.sketches[("shop.test/cart", "click", "#buy")].quantile(0.99)
+    assert stats.timeout_for("https://shop.test/cart", "click", "#buy") == int(p99 * 1.5 + 500)
+    # an unseen page uses the page-independent sketch of the same action + selector
+    assert stats.timeout_for("https://shop.test/other", "click", "#buy") == int(p99 * 1.5 + 500)
+
+    fast = LatencyStats(min_samples=1)
+    fast.record([timing(5)])
+    assert fast.timeout_for(None, "click", "#buy") == 1000  # floor
+
+
+def test_apply_defaults_predicts_the_page_from_goto(tmp_path):
+    path = str(tmp_path / "latency.json")
+    stats = LatencyStats(path=path, min_samples=1)
+    stats.record([timing(400, url="shop.test/cart"), timing(2000, url="shop.test/checkout")])
+    stats.save()
+
+    steps = [
+        {"action": "goto", "target": {"value": "https://shop.test/checkout"}},
+        {"action": "click", "target": {"value": "#buy"}},
+        {"action": "click", "target": {"value": "#buy"}, "timeout_ms": 123},
+        {"action": "scroll", "target": {"value": "#buy"}},
+    ]
+    assert LatencyStats(path=path, min_samples=1).apply_defaults(steps) == 1
+    assert steps[1]["timeout_ms"] == int(2000 * 1.5 + 500)
+    assert steps[2]["timeout_ms"] == 123 and "timeout_ms" not in steps[3]
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from utils.llm_gateway import LLMGateway, StubBackend
+
+
+def test_identical_prompts_share_one_call_and_persist(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    backend = StubBackend(latency_ms=50, responder=lambda p: p.upper())
+
+    async def main():
+        gw = LLMGateway(backend, cache_path=path, max_concurrency=2)
+        answers = await asyncio.gather(*(gw.complete("fix #buy") for _ in range(5)))
+        assert answers == ["FIX #BUY"] * 5 and backend.calls == 1
+        assert await gw.complete("fix #buy") == "FIX #BUY" and backend.calls == 1
+        assert await gw.complete("fix #buy", use_cache=False) == "FIX #BUY" and backend.calls == 2
+        stats = (gw.hits, gw.coalesced, gw.misses)
+        gw.close()
+        return stats
+
+    assert asyncio.run(main()) == (1, 4, 2)
+
+    async def restarted():
+        gw = LLMGateway(backend, cache_path=path)
+        answer = await gw.complete("fix #buy")
+        gw.close()
+        return answer
+
+    assert asyncio.run(restarted()) == "FIX #BUY" and backend.calls == 2
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    calls = []
+
+    def responder(prompt):
+        calls.append(prompt)
+        if len(calls) == 1:
+            raise TimeoutError("model timed out")
+        return "ok"
+
+    async def main():
+        gw = LLMGateway(StubBackend(latency_ms=20, responder=responder))
+        results = await asyncio.gather(*(gw.complete("p") for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, TimeoutError) for r in results) and len(calls) == 1
+        assert await gw.complete("p") == "ok" and gw.errors == 1
+
+    asyncio.run(main())
+
+
+def test_lru_and_ttl():
+    async def main():
+        gw = LLMGateway(StubBackend(latency_ms=0), max_entries=2, ttl_seconds=60)
+        for p in ("a", "b", "c"):
+            await gw.complete(p)
+        assert gw._get(gw.key("a")) is None and gw._get(gw.key("c")) is not None
+        key = gw.key("b")
+        gw._cache[key] = (gw._cache[key][0], 0.0)  # created long ago
+        assert gw._get(key) is None
+
+    asyncio.run(main())
+    with pytest.raises(RuntimeError):
+        asyncio.run(LLMGateway().complete("p"))
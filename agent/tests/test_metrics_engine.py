@@ -0,0 +1,54 @@
+from report_generator import compute_metrics
+from utils.metrics_engine import MetricsEngine
+
+
+def task(task_id, status, created, updated, result=None):
+    return {"id": task_id, "status": status, "created_at": f"2026-03-01T{created}",
+            "updated_at": f"2026-03-01T{updated}", "result": result or {}}
+
+
+TASKS = [
+    task("a", "completed", "10:00:00", "10:00:04"),
+    task("b", "failed", "10:05:00", "10:05:40", {"perf": {"summary": {"navigations": 1, "lcp_ms": 3000},
+                                                          "budgets": {"violations": [{"metric": "lcp_ms"}]}}}),
+    task("c", "running", "11:00:00", "11:00:01"),
+]
+DURATION_BUCKET_5S = 2  # buckets 1, 2, 5, ...: a 4 s run lands in "5"
+FAILURES = [{"error": "Timeout 5000ms exceeded.\ncall log...", "timestamp": "2026-03-01T10:05:30"},
+            {"error": "Timeout 5000ms exceeded.\nother log", "timestamp": "2026-03-01T10:05:35"}]
+
+
+def test_rebuild_matches_the_full_scan(tmp_path):
+    engine = MetricsEngine()
+    engine.rebuild(TASKS, [{"event": "task_created", "time": "2026-03-01T10:00:00"}], FAILURES)
+    snap = engine.snapshot()
+    scan = compute_metrics(str(tmp_path), TASKS)
+    for key in ("total_tasks", "completed", "failed", "pending", "performance"):
+        assert snap[key] == scan[key], key
+    # only finished tasks count towards the average (the scan also averages running ones)
+    assert snap["avg_duration_seconds"] == 22.0
+    # multi-line Playwright errors are grouped by their first line
+    assert snap["failure_distribution"] == {"Timeout 5000ms exceeded.": 2}
+    assert snap["duration_histogram"]["counts"][DURATION_BUCKET_5S] == 1
+
+
+def test_live_updates_and_rollups():
+    engine = MetricsEngine()
+    t = task("a", "pending", "10:00:00", "10:00:00")
+    engine.on_task(t, None)
+    engine.on_task(dict(t, status="running", started_at="2026-03-01T10:00:10", updated_at="2026-03-01T10:00:10"),
+                   "pending")
+    engine.on_task(dict(t, status="completed", started_at="2026-03-01T10:00:10",
+                        updated_at="2026-03-01T10:00:40"), "running")
+    snap = engine.snapshot()
+    assert (snap["total_tasks"], snap["completed"], snap["pending"]) == (1, 1, 0)
+    assert snap["avg_duration_seconds"] == 30  # queueing before started_at is excluded
+    (minute,) = snap["trends"]["minute"]
+    assert minute["bucket"] == "2026-03-01T10:00" and minute["created"] == 1 and minute["completed"] == 1
+
+
+def test_state_survives_save_and_load(tmp_path):
+    path = str(tmp_path / "metrics.json")
+    engine = MetricsEngine(path)
+    engine.rebuild(TASKS, [], FAILURES)
+    assert MetricsEngine(path).snapshot() == engine.snapshot()
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from utils.prioritizer import failure_history, prioritize, suite_order
+
+NOW = datetime(2026, 5, 1, 12, 0)
+
+
+def task(tid, test_id, status, hours_ago, seconds=10):
+    ended = NOW - timedelta(hours=hours_ago)
+    return {"id": tid, "test_id": test_id, "status": status, "updated_at": ended.isoformat(),
+            "started_at": (ended - timedelta(seconds=seconds)).isoformat()}
+
+
+def test_failure_history_decays_and_matches_bank_records_by_run_id():
+    tasks = [task("aaaaaaaa-1", "login", "failed", 72), task("bbbbbbbb-1", "login", "completed", 0),
+             task("cccccccc-1", "cart", "running", 0)]
+    failures = [{"job_id": "run_bbbbbbbb", "timestamp": (NOW - timedelta(hours=1)).isoformat()},
+                {"test_id": "search", "timestamp": NOW.isoformat()}]
+    stats = failure_history(tasks, failures, half_life_hours=72, now=NOW)
+    assert round(stats["login"]["runs"], 3) == 1.5 and round(stats["login"]["failed"], 3) == 0.5
+    # a failure the repair later fixed still counts as the last failure
+    assert stats["login"]["last_failure"] == (NOW - timedelta(hours=1)).isoformat()
+    assert "cart" not in stats  # unfinished runs don't count
+    assert stats["search"] == {"runs": 0.0, "failed": 0.0, "last_failure": NOW.isoformat()}
+
+
+def test_likely_and_fast_failures_go_first():
+    tests = [{"test_id": t} for t in ("stable_slow", "flaky_fast", "broken_slow", "new")]
+    history = {
+        "stable_slow": {"runs": 20.0, "failed": 0.0, "last_failure": None},
+        "flaky_fast": {"runs": 20.0, "failed": 4.0, "last_failure": (NOW - timedelta(days=5)).isoformat()},
+        "broken_slow": {"runs": 20.0, "failed": 3.0, "last_failure": (NOW - timedelta(hours=2)).isoformat()},
+    }
+    durations = {"stable_slow": 120.0, "flaky_fast": 5.0, "broken_slow": 60.0}
+    ranked = prioritize(tests, history, durations, now=NOW)
+    assert [r["test"]["test_id"] for r in ranked] == ["flaky_fast", "broken_slow", "new", "stable_slow"]
+    new = next(r for r in ranked if r["test"]["test_id"] == "new")
+    assert new["p_fail"] == 0.3 and new["seconds"] == 60.0  # prior rate, median duration
+    assert all(a["score"] >= b["score"] for a, b in zip(ranked, ranked[1:]))
+
+
+def test_suite_order_keeps_input_order_on_ties():
+    tests = [{"test_id": f"t{i}"} for i in range(4)]
+    assert [r["test"]["test_id"] for r in suite_order(tests, [], [])] == ["t0", "t1", "t2", "t3"]
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from utils.scheduler import JobScheduler, QueueFullError
+
+
+def test_rejects_beyond_queue_depth_with_retry_after():
+    async def main():
+        sched = JobScheduler(max_workers=1, max_queue_depth=2)
+        release = asyncio.Event()
+
+        async def blocked():
+            await release.wait()
+            return "done"
+
+        first = sched.submit("t0", blocked)
+        await asyncio.sleep(0)  # the worker picks t0 up
+        queued = [sched.submit(f"t{i}", blocked) for i in (1, 2)]
+        assert sched.depth() == 2
+        with pytest.raises(QueueFullError) as exc:
+            sched.submit("t3", blocked)
+        assert exc.value.depth == 2 and exc.value.retry_after >= 1
+        assert sched.stats()["rejected"] == 1
+
+        release.set()
+        assert await asyncio.gather(first, *queued) == ["done"] * 3
+        await sched.stop()
+
+    asyncio.run(main())
+
+
+def test_higher_priority_runs_first_fifo_within_priority():
+    async def main():
+        sched = JobScheduler(max_workers=1, max_queue_depth=10)
+        order, gate = [], asyncio.Event()
+
+        def job(name):
+            async def run():
+                await gate.wait()
+                order.append(name)
+            return run
+
+        futs = [sched.submit("block", job("block"))]
+        await asyncio.sleep(0)
+        futs += [sched.submit("low1", job("low1")), sched.submit("high", job("high"), priority=5),
+                 sched.submit("low2", job("low2"))]
+        gate.set()
+        await asyncio.gather(*futs)
+        assert order == ["block", "high", "low1", "low2"]
+        await sched.stop()
+
+    asyncio.run(main())
+
+
+def test_fire_and_forget_errors_go_to_on_error():
+    async def main():
+        errors = []
+        sched = JobScheduler(max_workers=2, max_queue_depth=5, on_error=lambda tid, e: errors.append((tid, str(e))))
+
+        async def boom():
+            raise RuntimeError("boom")
+
+        assert sched.submit("t1", boom, wait=False) is None
+        waited = sched.submit("t2", boom)
+        with pytest.raises(RuntimeError):
+            await waited
+        await sched.queue.join()
+        assert errors == [("t1", "boom")]
+        await sched.stop()
+
+    asyncio.run(main())
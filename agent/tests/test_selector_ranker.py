@@ -0,0 +1,46 @@
+from utils.selector_ranker import rank_candidates, selector_for, target_terms, tokens
+
+INDEX = {"elements": [
+    {"tag": "button", "role": "button", "name": "Log in", "id": "loginBtn", "testid": "login-submit",
+     "css": "form > button"},
+    {"tag": "a", "role": "link", "name": "Forgot login?", "css": "a.forgot"},
+    {"tag": "button", "role": "button", "name": "Sign up", "id": "ember1234", "css": "button.signup"},
+    {"tag": "input", "role": "textbox", "name": "Email", "id": "user-email", "css": "#user-email"},
+    {"tag": "button", "role": "button", "name": "Log in", "visible": False, "css": "div.hidden button"},
+]}
+
+
+def test_tokens_and_target_terms():
+    assert tokens("submitLoginForm") == ["submit", "login", "form"]
+    assert tokens("log_in-now") == ["log", "in", "now"]
+    terms, tag = target_terms({"type": "selector", "value": "form >> button#login-btn.primary"})
+    assert {(t.kind, t.norm) for t in terms} == {("id", "login btn"), ("class", "primary")} and tag == "button"
+    terms, _ = target_terms({"type": "selector", "value": "[data-testid='login-button']"})
+    assert [(t.kind, t.norm) for t in terms] == [("testid", "login button")]
+    terms, _ = target_terms({"type": "selector", "value": "text=Log in"})
+    assert [(t.kind, t.norm) for t in terms] == [("text", "log in")]
+    assert target_terms({"value": ""}) == ([], None)
+
+
+def test_renamed_id_finds_the_same_button():
+    ranked = rank_candidates(INDEX, {"type": "selector", "value": "button#login"}, action="click")
+    assert ranked[0]["selector"] == '[data-testid="login-submit"]'
+    assert all(r["score"] >= 0.45 for r in ranked)
+    # the hidden twin scores lower than the visible button
+    scores = {r["element"]["css"]: r["score"] for r in ranked}
+    assert scores.get("div.hidden button", 0) < scores["form > button"]
+
+
+def test_text_target_and_role_boost():
+    ranked = rank_candidates(INDEX, {"type": "text", "value": "Login"}, action="click", limit=2)
+    assert ranked[0]["element"]["name"] == "Log in"
+    ranked = rank_candidates(INDEX, {"type": "selector", "value": "#email"}, action="type")
+    assert ranked[0]["selector"] == "#user-email"
+    assert rank_candidates(INDEX, {"type": "selector", "value": "#zzzz"}) == []
+
+
+def test_selector_for_prefers_stable_attributes():
+    assert selector_for({"testid": "a", "testid_attr": "data-qa", "id": "b"}) == '[data-qa="a"]'
+    assert selector_for({"id": "ember1234", "role": "button", "name": "Sign up"}) == 'role=button[name="Sign up"]'
+    assert selector_for({"id": "checkout"}) == "#checkout"
+    assert selector_for({"tag": "div", "css": "main > div:nth-child(2)"}) == "main > div:nth-child(2)"
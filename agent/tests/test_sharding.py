@@ -0,0 +1,35 @@
+from utils.sharding import historical_durations, lpt_shard
+
+
+def task(test_id, status, start, end):
+    return {"test_id": test_id, "status": status, "started_at": f"2026-01-01T00:{start}",
+            "updated_at": f"2026-01-01T00:{end}"}
+
+
+def test_historical_durations_median_of_finished_runs():
+    tasks = [
+        task("a", "completed", "00:00", "00:10"),
+        task("a", "failed", "01:00", "01:30"),
+        task("a", "completed", "02:00", "02:20"),
+        task("b", "running", "00:00", "05:00"),      # unfinished: ignored
+        {"test_id": "c", "status": "completed", "created_at": "2026-01-01T00:00:00",
+         "updated_at": "2026-01-01T00:00:04"},      # no started_at: falls back to created_at
+    ]
+    assert historical_durations(tasks) == {"a": 20.0, "c": 4.0}
+
+
+def test_lpt_balances_shards_longest_first():
+    durations = {"t1": 6, "t2": 5, "t3": 4, "t4": 3, "t5": 2, "t6": 2}
+    tests = [{"test_id": t} for t in durations]
+    shards = lpt_shard(tests, durations, 2)
+    assert sorted(s["estimated_seconds"] for s in shards) == [11, 11]
+    assert sorted(ir["test_id"] for s in shards for ir in s["tests"]) == sorted(durations)
+    for s in shards:
+        assert [durations[ir["test_id"]] for ir in s["tests"]] == sorted(
+            (durations[ir["test_id"]] for ir in s["tests"]), reverse=True)
+
+
+def test_unknown_tests_cost_the_median_and_empty_shards_are_kept():
+    shards = lpt_shard([{"test_id": "new"}, {"test_id": "a"}], {"a": 3.0, "b": 5.0}, 3)
+    assert len(shards) == 3
+    assert sorted(s["estimated_seconds"] for s in shards) == [0.0, 3.0, 4.0]
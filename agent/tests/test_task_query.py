@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from utils.task_manager import TaskManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    tm = TaskManager(str(tmp_path / "tasks.jsonl"), compact_every=10_000)
+    for i in range(40):
+        tm.create_task(f"checkout flow {i}" if i % 4 == 0 else f"search {i}")
+    return tm
+
+
+def created_order(tm):
+    return [k[1] for k in sorted((t["created_at"], t["id"]) for t in tm.tasks.values())]
+
+
+def pages(tm, **kw):
+    seen, cursor = [], None
+    while True:
+        page = tm.query(cursor=cursor, **kw)
+        seen.append([t["id"] for t in page["items"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize("newest_first", [True, False])
+def test_cursor_pages_cover_every_task_once_in_order(manager, newest_first):
+    got = pages(manager, limit=7, newest_first=newest_first)
+    assert [len(p) for p in got] == [7, 7, 7, 7, 7, 5]
+    flat = [i for p in got for i in p]
+    expected = created_order(manager)
+    assert flat == (expected[::-1] if newest_first else expected)
+
+
+def test_tasks_created_between_pages_do_not_shift_a_newest_first_listing(manager):
+    first = manager.query(limit=10)
+    for _ in range(5):
+        manager.create_task("late arrival")
+    second = manager.query(limit=100, cursor=first["next_cursor"])
+    ids = [t["id"] for t in first["items"]] + [t["id"] for t in second["items"]]
+    assert len(ids) == len(set(ids)) == 40
+
+
+def test_status_and_text_filters(manager):
+    ids = created_order(manager)
+
+    async def finish():
+        for task_id in ids[:3]:
+            await manager.update_task(task_id, "running")
+
+    asyncio.run(finish())
+    # few running tasks: served from the status index
+    running = manager.query(statuses=["running"], newest_first=False)
+    assert [t["id"] for t in running["items"]] == ids[:3]
+    # most tasks pending: served by scanning the created_at index
+    assert len(pages(manager, statuses=["pending"], limit=9)) == 5
+    checkout = manager.query(text="CHECKOUT", limit=100)["items"]
+    assert len(checkout) == 10 and all("checkout" in t["description"] for t in checkout)
+
+
+def test_created_at_bounds(manager):
+    ids = created_order(manager)
+    lo, hi = manager.tasks[ids[10]]["created_at"], manager.tasks[ids[20]]["created_at"]
+    window = {t["id"] for t in manager.query(since=lo, until=hi, limit=100)["items"]}
+    assert window == {i for i in ids if lo <= manager.tasks[i]["created_at"] < hi}
+
+
+def test_malformed_cursor_raises_value_error(manager):
+    with pytest.raises(ValueError):
+        manager.query(cursor="not-a-cursor")
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from utils.tracing import Registry, Trace, reset_trace, span, use_trace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_agent_and_executor_copies_are_identical():
+    # each service's image is built from its own directory, so the module is copied, not shared
+    with open(os.path.join(ROOT, "agent", "utils", "tracing.py"), "rb") as a, \
+            open(os.path.join(ROOT, "executor", "tracing.py"), "rb") as b:
+        assert a.read() == b.read(), "agent/utils/tracing.py and executor/tracing.py have diverged"
+
+
+def test_span_records_into_the_active_trace_and_histogram():
+    registry = Registry()
+    seconds = registry.histogram("step_seconds", "Step latency", buckets=(0.5, 1))
+    trace = Trace("t1")
+    token = use_trace(trace)
+    try:
+        with span("ok", seconds, step=0) as attrs:
+            attrs["selector"] = "#buy"
+        with pytest.raises(KeyError):
+            with span("boom"):
+                raise KeyError("x")
+    finally:
+        reset_trace(token)
+    with span("untraced"):
+        pass
+
+    names = [(s["name"], s.get("selector"), s.get("error")) for s in trace.to_dict()["spans"]]
+    assert names == [("ok", "#buy", None), ("boom", None, "KeyError")]
+    assert seconds.values[()][-1] == 1
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    runs = registry.counter("runs_total", "Runs", ("status",))
+    runs.labels(status="ok").inc()
+    runs.labels(status='a "b"').inc(2)
+    registry.gauge("queue_depth", "Queued jobs", fn=lambda: 3)
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    latency.observe(0.05)
+    latency.observe(5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE runs_total counter" in lines
+    assert 'runs_total{status="ok"} 1.0' in lines
+    assert 'runs_total{status="a \\"b\\""} 2.0' in lines
+    assert "queue_depth 3.0" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "latency_seconds_count 2" in lines and "latency_seconds_sum 5.05" in lines
@@ -0,0 +1,92 @@
+import asyncio, json, uuid
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+
+class _Subscriber:
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+
+class EventBus:
+    """In-process pub/sub for task deltas with resumable event ids.
+
+    Event ids are "<epoch>-<seq>"; the epoch changes on every process start so a
+    client resuming across a restart gets a `reset` event and reloads. The last
+    `history` events are kept for Last-Event-ID replay. Slow subscribers are
+    disconnected (their bounded queue overflows) and resume by id on reconnect.
+    """
+
+    def __init__(self, history: int = 1000, subscriber_queue: int = 256):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.history: Deque[Tuple[int, str, Dict[str, Any]]] = deque(maxlen=history)
+        self.subscriber_queue = subscriber_queue
+        self.subscribers: Set[_Subscriber] = set()
+
+    def publish(self, event: str, data: Dict[str, Any]) -> str:
+        self.seq += 1
+        item = (self.seq, event, data)
+        self.history.append(item)
+        for sub in list(self.subscribers):
+            try:
+                sub.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                sub.overflowed = True
+                self.subscribers.discard(sub)
+        return self.event_id(self.seq)
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def _parse_id(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Seq to resume after, -1 to force a reset, None for a fresh subscription."""
+        if not last_event_id:
+            return None
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.seq:
+            return -1
+        return int(seq)
+
+    async def subscribe(self, last_event_id: Optional[str] = None,
+                        keepalive: float = 15.0) -> AsyncIterator[Optional[Tuple[str, str, Dict[str, Any]]]]:
+        """Yield (id, event, data) tuples; yields None on idle keepalive ticks."""
+        sub = _Subscriber(self.subscriber_queue)
+        self.subscribers.add(sub)
+        # taken together with subscribing: everything newer arrives via the queue
+        replay = list(self.history)
+        try:
+            after = self._parse_id(last_event_id)
+            if after is not None:
+                oldest = replay[0][0] if replay else self.seq + 1
+                if after == -1 or after + 1 < oldest:
+                    # gap we cannot fill: tell the client to reload its list
+                    yield (self.event_id(self.seq), "reset", {})
+                else:
+                    for seq, event, data in replay:
+                        if seq > after:
+                            yield (self.event_id(seq), event, data)
+            while not sub.overflowed:
+                try:
+                    seq, event, data = await asyncio.wait_for(sub.queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield (self.event_id(seq), event, data)
+        finally:
+            self.subscribers.discard(sub)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"epoch": self.epoch, "seq": self.seq, "subscribers": len(self.subscribers), "history": len(self.history)}
+
+
+async def sse_stream(bus: EventBus, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+    """Format bus events as a text/event-stream body."""
+    yield "retry: 2000\n\n"
+    async for item in bus.subscribe(last_event_id):
+        if item is None:
+            yield ": keepalive\n\n"
+            continue
+        event_id, event, data = item
+        yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
@@ -0,0 +1,203 @@
+import asyncio, random, time
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+DEADLINE_HEADER = "X-Deadline-Ms"  # the attempt's timeout, relative so clock skew doesn't matter
+
+# transport-level trouble worth retrying (and counting against the breaker);
+# a 500 carrying a failed test is a normal answer, not an executor fault
+RETRY_STATUSES = {502, 503, 504}
+
+
+def _deadline_answer(body: Any) -> bool:
+    """The executor's own 504 for a run that hit the propagated deadline."""
+    detail = body.get("detail", body) if isinstance(body, dict) else None
+    return isinstance(detail, dict) and detail.get("error") == "deadline_exceeded"
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, url: str, retry_after: float):
+        super().__init__(f"circuit open for {url}; retry in {retry_after:.1f}s")
+        self.url = url
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(Exception):
+    pass
+
+
+class _Breaker:
+    """Consecutive-failure circuit breaker: closed -> open after `threshold`
+    failures; after `reset_seconds` one probe is let through (half-open)."""
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> Optional[float]:
+        """None if a request may go out, else seconds until the next probe."""
+        state = self.state
+        if state == "closed":
+            return None
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return None
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)) or 1.0
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            if self.opened_at is None or self.probing:
+                self.trips += 1
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+class ExecutorClient:
+    """Long-lived aiohttp client for executor calls.
+
+    One ClientSession (keep-alive connection pool with per-host limits) is shared
+    by every task. Transport errors and 502/503/504 are retried with capped
+    exponential backoff and full jitter (honouring Retry-After), never past the
+    caller's deadline; each executor URL has its own circuit breaker.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 20, timeout: float = 120.0,
+                 retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 breaker_threshold: int = 5, breaker_reset_seconds: float = 30.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._breakers: Dict[str, _Breaker] = {}
+        self._requests = 0
+        self._retries = 0
+        self._rejected = 0
+
+    def _client(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def breaker(self, url: str) -> _Breaker:
+        b = self._breakers.get(url)
+        if b is None:
+            b = self._breakers[url] = _Breaker(self.breaker_threshold, self.breaker_reset_seconds)
+        return b
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        return max(delay, retry_after or 0.0)
+
+    async def post(self, url: str, payload: Dict[str, Any], deadline: Optional[float] = None,
+                   retries: Optional[int] = None, headers: Optional[Dict[str, str]] = None) -> Tuple[int, Any]:
+        """POST JSON; returns (status, body). `deadline` is a time.monotonic() value.
+        Raises CircuitOpenError, DeadlineExceededError, or the last transport error."""
+        retries = self.retries if retries is None else retries
+        breaker = self.breaker(url)
+        for attempt in range(retries + 1):
+            wait = breaker.allow()
+            if wait is not None:
+                self._rejected += 1
+                raise CircuitOpenError(url, wait)
+
+            timeout = self.timeout
+            send_headers = dict(headers or {})
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    breaker.probing = False
+                    raise DeadlineExceededError("task deadline exceeded before calling the executor")
+                timeout = min(timeout, remaining)
+            # the executor must give up before this attempt's client timeout does
+            send_headers[DEADLINE_HEADER] = str(int(timeout * 1000))
+
+            self._requests += 1
+            retry_after = None
+            try:
+                async with self._client().post(url, json=payload, headers=send_headers,
+                                               timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                    try:
+                        body = await resp.json(content_type=None)
+                    except Exception:
+                        body = {"error": (await resp.text())[:500]}
+                    if resp.status not in RETRY_STATUSES or _deadline_answer(body):
+                        breaker.success()
+                        return resp.status, body
+                    breaker.failure()
+                    if attempt == retries:
+                        return resp.status, body
+                    try:
+                        retry_after = float(resp.headers.get("Retry-After", ""))
+                    except ValueError:
+                        pass
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                breaker.failure()
+                if attempt == retries:
+                    raise
+            except BaseException:
+                breaker.probing = False
+                raise
+
+            delay = self.backoff(attempt, retry_after)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise DeadlineExceededError("task deadline exceeded while backing off")
+            self._retries += 1
+            await asyncio.sleep(delay)
+
+    async def get_bytes(self, url: str, headers: Optional[Dict[str, str]] = None,
+                        timeout: Optional[float] = None) -> Tuple[int, bytes]:
+        """GET a small resource (e.g. an artifact) over the shared pool; one try, and
+        the outcome doesn't count towards the /exec breakers."""
+        self._requests += 1
+        async with self._client().get(url, headers=headers,
+                                      timeout=aiohttp.ClientTimeout(total=timeout or self.timeout)) as resp:
+            return resp.status, await resp.read()
+
+    async def delete(self, url: str, headers: Optional[Dict[str, str]] = None,
+                     timeout: Optional[float] = None) -> int:
+        """DELETE a resource (e.g. a leased session); one try, outside the /exec breakers."""
+        self._requests += 1
+        async with self._client().delete(url, headers=headers,
+                                         timeout=aiohttp.ClientTimeout(total=timeout or self.timeout)) as resp:
+            return resp.status
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self._requests,
+            "retries": self._retries,
+            "rejected_by_breaker": self._rejected,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "breakers": {
+                url: {"state": b.state, "consecutive_failures": b.failures, "trips": b.trips}
+                for url, b in self._breakers.items()
+            },
+        }
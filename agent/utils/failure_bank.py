@@ -0,0 +1,270 @@
+import asyncio, bisect, json, math, os, pickle, re, heapq, threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_DIGITS_RE = re.compile(r"\d+")
+_SNAPSHOT_VERSION = 1
+
+
+def featurize(*texts: str, max_chars: int = 500) -> Tuple[str, ...]:
+    """Word unigrams + bigrams, lowercased, digits collapsed so '5000ms' == '8000ms'."""
+    feats = set()
+    for text in texts:
+        if not text:
+            continue
+        words = [_DIGITS_RE.sub("0", w) for w in _WORD_RE.findall(text[:max_chars].lower())]
+        feats.update(words)
+        feats.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return tuple(sorted(feats))
+
+
+def record_features(record: Dict[str, Any]) -> Tuple[str, ...]:
+    step = record.get("failed_step") or {}
+    target = step.get("target") or {}
+    return featurize(
+        str(record.get("error") or ""),
+        str(step.get("action") or ""),
+        str(target.get("type") or ""),
+        str(target.get("value") or ""),
+    )
+
+
+def _decode_line(line: str) -> List[Dict[str, Any]]:
+    """Decode one JSONL line. The legacy writer separated records with a literal
+    backslash-n instead of a newline, so a single line may hold many records."""
+    line = line.strip()
+    try:
+        return [json.loads(line)]
+    except Exception:
+        pass
+    out, pos, decoder = [], 0, json.JSONDecoder()
+    while pos < len(line):
+        try:
+            rec, pos = decoder.raw_decode(line, pos)
+        except Exception:
+            break
+        if isinstance(rec, dict):
+            out.append(rec)
+        while line.startswith("\\n", pos) or line[pos:pos + 1].isspace():
+            pos += 2 if line.startswith("\\n", pos) else 1
+    return out
+
+
+class FailureBank:
+    """Failure records with an incrementally maintained similarity index.
+
+    Records with identical feature sets share one index document, so repeated
+    failures (the common case) cost nothing extra to query. Queries walk the
+    postings of the rarest query features first, accumulate IDF-weighted overlap,
+    then rank the best candidates by weighted Jaccard similarity.
+
+    The JSONL file stays the source of truth; a pickle snapshot holds the index
+    plus the byte offset it covers, so startup only replays the tail of the file.
+    Under a running event loop the periodic snapshot is pickled on a worker thread.
+    """
+
+    def __init__(self, path: str, snapshot_path: Optional[str] = None, snapshot_every: int = 1000,
+                 candidate_budget: int = 20000, writer=None):
+        self.path = path
+        self.writer = writer  # utils.jsonl_writer.JsonlWriter for `path`; None = write synchronously
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+        self.candidate_budget = candidate_budget
+
+        self._reset()
+        self._since_snapshot = 0
+        self._snapshot_lock = threading.Lock()  # one snapshot file write at a time
+        self._snapshot_task: Optional[asyncio.Task] = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.load()
+
+    # -----------------------------
+    # persistence
+    # -----------------------------
+
+    def load(self):
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "rb") as f:
+                    snap = pickle.load(f)
+                if snap.get("version") == _SNAPSHOT_VERSION and snap["offset"] <= self._file_size():
+                    self.records = snap["records"]
+                    self.record_doc = snap["record_doc"]
+                    self.doc_features = snap["doc_features"]
+                    self.doc_records = snap["doc_records"]
+                    self.postings = snap["postings"]
+                    self.offset = snap["offset"]
+                    self.doc_by_features = {feats: i for i, feats in enumerate(self.doc_features)}
+            except Exception:
+                self._reset()
+        replayed = self._replay_tail()
+        if replayed >= self.snapshot_every:
+            self.save_snapshot()
+
+    def _reset(self):
+        self.records: List[Dict[str, Any]] = []
+        self.record_doc: List[int] = []
+        self.doc_features: List[Tuple[str, ...]] = []
+        self.doc_records: List[List[int]] = []
+        self.doc_by_features: Dict[Tuple[str, ...], int] = {}
+        self.postings: Dict[str, List[int]] = {}
+        self.offset = 0
+
+    def _file_size(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def _replay_tail(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        count = 0
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            for raw in f:
+                if not raw.endswith(b"\n") and not raw.endswith(b"\\n"):
+                    break  # partial trailing write; pick it up next time
+                self.offset += len(raw)
+                for rec in _decode_line(raw.decode("utf-8", errors="replace")):
+                    self._index(rec)
+                    count += 1
+        return count
+
+    def _snapshot_cut(self) -> Dict[str, Any]:
+        """What a snapshot covers, taken on the loop. Every index list is append-only
+        with increasing ids, so the sizes taken here (plus a shallow copy of the
+        postings dict) let a worker thread cut a consistent state while adds go on."""
+        return {"offset": self.offset, "records": len(self.records), "docs": len(self.doc_features),
+                "postings": dict(self.postings)}
+
+    def _write_snapshot(self, cut: Dict[str, Any]):
+        n, d = cut["records"], cut["docs"]
+        with self._snapshot_lock:
+            if self.writer is not None:
+                self.writer.drain()  # the snapshot's offset must not run ahead of the file
+            snap = {
+                "version": _SNAPSHOT_VERSION,
+                "offset": cut["offset"],
+                "records": self.records[:n],
+                "record_doc": self.record_doc[:n],
+                "doc_features": self.doc_features[:d],
+                "doc_records": [rids[:bisect.bisect_left(rids, n)] for rids in self.doc_records[:d]],
+                "postings": {f: docs[:bisect.bisect_left(docs, d)] for f, docs in cut["postings"].items()},
+            }
+            tmp = self.snapshot_path + ".tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(snap, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.snapshot_path)
+
+    def save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        self._since_snapshot = 0
+        self._write_snapshot(self._snapshot_cut())
+
+    async def save_snapshot_async(self):
+        """save_snapshot() with the pickling and file writes on a worker thread."""
+        if not self.snapshot_path:
+            return
+        self._since_snapshot = 0
+        await asyncio.to_thread(self._write_snapshot, self._snapshot_cut())
+
+    def _schedule_snapshot(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save_snapshot()  # no loop (startup, scripts)
+            return
+        if self._snapshot_task is None or self._snapshot_task.done():
+            self._snapshot_task = loop.create_task(self.save_snapshot_async())
+
+    # -----------------------------
+    # write path
+    # -----------------------------
+
+    def add(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        record = dict(record)
+        if not record.get("timestamp"):
+            record["timestamp"] = datetime.utcnow().isoformat()
+        text = json.dumps(record, ensure_ascii=False)
+        line = (text + "\n").encode("utf-8")
+        if self.writer is not None:
+            self.writer.write(text)
+        else:
+            with open(self.path, "ab") as f:
+                f.write(line)
+        self.offset += len(line)
+        self._index(record)
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self._schedule_snapshot()
+        return record
+
+    def _index(self, record: Dict[str, Any]):
+        rid = len(self.records)
+        self.records.append(record)
+        feats = record_features(record)
+        doc = self.doc_by_features.get(feats)
+        if doc is None:
+            doc = len(self.doc_features)
+            self.doc_by_features[feats] = doc
+            self.doc_features.append(feats)
+            self.doc_records.append([])
+            for feat in feats:
+                self.postings.setdefault(feat, []).append(doc)
+        self.doc_records[doc].append(rid)
+        self.record_doc.append(doc)
+
+    # -----------------------------
+    # query path
+    # -----------------------------
+
+    def _idf(self, feat: str) -> float:
+        df = len(self.postings.get(feat, ()))
+        return math.log(1.0 + len(self.doc_features) / (1 + df))
+
+    def search(self, text: str, k: int = 3) -> List[Dict[str, Any]]:
+        return [rec for _, rec in self.search_scored(featurize(text), k)]
+
+    def search_failure(self, error: str, failed_step: Dict[str, Any], k: int = 3) -> List[Dict[str, Any]]:
+        feats = record_features({"error": error, "failed_step": failed_step})
+        return [rec for _, rec in self.search_scored(feats, k)]
+
+    def search_scored(self, feats: Iterable[str], k: int = 3) -> List[Tuple[float, Dict[str, Any]]]:
+        weights = {f: self._idf(f) for f in set(feats) if f in self.postings}
+        if not weights:
+            return []
+        q_weight = sum(weights.values())
+
+        # accumulate overlap, rarest features first, within a postings budget
+        overlap: Dict[int, float] = {}
+        scanned = 0
+        for feat in sorted(weights, key=lambda f: len(self.postings[f])):
+            plist = self.postings[feat]
+            if scanned and scanned + len(plist) > self.candidate_budget:
+                break
+            scanned += len(plist)
+            w = weights[feat]
+            for doc in plist:
+                overlap[doc] = overlap.get(doc, 0.0) + w
+
+        # rerank the strongest candidates by weighted Jaccard
+        best = heapq.nlargest(max(k * 4, 32), overlap.items(), key=lambda kv: kv[1])
+        scored = []
+        for doc, ov in best:
+            d_weight = sum(self._idf(f) for f in self.doc_features[doc])
+            union = q_weight + d_weight - ov
+            scored.append((ov / union if union > 0 else 0.0, doc))
+        scored.sort(reverse=True)
+
+        out = []
+        for score, doc in scored:
+            # newest matching records first within a document
+            for rid in reversed(self.doc_records[doc]):
+                out.append((score, self.records[rid]))
+                if len(out) >= k:
+                    return out
+        return out
+
+    def __len__(self):
+        return len(self.records)
@@ -0,0 +1,180 @@
+import asyncio, json, logging, os, threading, time
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class JsonlWriter:
+    """Append-only JSONL file written off the event loop.
+
+    `write()` only enqueues; a background task drains everything queued so far
+    on a worker thread in one write (group commit), so request handlers never
+    wait on the disk. Lines are newline-framed here, not by callers.
+
+    - fsync after `fsync_every` lines or `fsync_interval_ms` since the last
+      fsync, whichever comes first (0 disables that trigger; both 0 = never).
+    - The queue is bounded by `max_queue`: past it, `write()` drains inline,
+      which slows the caller down instead of dropping lines or growing memory.
+    - With `rotate_bytes`, the file is rotated to path.1 .. path.<backups>.
+    - Without a running event loop (startup, scripts) writes are synchronous.
+    """
+
+    def __init__(self, path: str, max_queue: int = 10000, fsync_every: int = 100, fsync_interval_ms: float = 1000,
+                 rotate_bytes: Optional[int] = None, backups: int = 5):
+        self.path = path
+        self.max_queue = max(1, max_queue)
+        self.fsync_every = fsync_every
+        self.fsync_interval_ms = fsync_interval_ms
+        self.rotate_bytes = rotate_bytes
+        self.backups = max(1, backups)
+        self._queue: deque = deque()
+        self._lock = threading.Lock()  # file handle + queue draining, shared with the worker thread
+        self._f = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+        self.counts = {"lines": 0, "batches": 0, "fsyncs": 0, "inline_drains": 0, "rotations": 0, "errors": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    # -----------------------------
+    # enqueue
+    # -----------------------------
+
+    def write(self, record: Any):
+        """Queue a record (dict, or an already-serialized line without newline)."""
+        line = record if isinstance(record, str) else json.dumps(record, ensure_ascii=False)
+        self._queue.append(line.rstrip("\n").encode("utf-8") + b"\n")
+        if not self._ensure_worker() or len(self._queue) >= self.max_queue:
+            if self._task is not None:
+                self.counts["inline_drains"] += 1
+            self.drain()
+            return
+        self._wake.set()
+
+    def _ensure_worker(self) -> bool:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return True
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._task = loop.create_task(self._run())
+        return True
+
+    async def _run(self):
+        while True:
+            timeout = self.fsync_interval_ms / 1000 if self._unsynced and self.fsync_interval_ms else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await asyncio.to_thread(self.drain)
+            except Exception as e:
+                self.counts["errors"] += 1
+                print(f"[JsonlWriter] {self.path}: write failed: {e}")
+
+    # -----------------------------
+    # file side (worker thread, or inline)
+    # -----------------------------
+
+    def _file(self):
+        if self._f is None:
+            self._f = open(self.path, "ab")
+        return self._f
+
+    def _sync(self, f):
+        os.fsync(f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.counts["fsyncs"] += 1
+
+    def drain(self, fsync: bool = False):
+        """Write everything queued (in order) and apply the fsync policy; `fsync` forces one."""
+        with self._lock:
+            lines = []
+            while self._queue:
+                lines.append(self._queue.popleft())
+            f = self._file() if lines or (fsync and self._f is not None) else None
+            if f is None:
+                return
+            if lines:
+                f.write(b"".join(lines))
+                f.flush()
+                self._unsynced += len(lines)
+                self.counts["lines"] += len(lines)
+                self.counts["batches"] += 1
+            due = (self.fsync_every and self._unsynced >= self.fsync_every) or \
+                  (self.fsync_interval_ms and (time.monotonic() - self._last_sync) * 1000 >= self.fsync_interval_ms)
+            if self._unsynced and (fsync or due):
+                self._sync(f)
+            if self.rotate_bytes and f.tell() >= self.rotate_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        self._close_file()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        self.counts["rotations"] += 1
+
+    def _close_file(self):
+        if self._f is not None:
+            if self._unsynced:
+                self._sync(self._f)
+            self._f.close()
+            self._f = None
+
+    def _rename(self, dest: str):
+        self.drain()
+        with self._lock:
+            self._close_file()
+            if os.path.exists(self.path):
+                os.replace(self.path, dest)
+
+    # -----------------------------
+    # lifecycle
+    # -----------------------------
+
+    async def flush(self):
+        """Wait until everything queued so far is written and fsynced."""
+        await asyncio.to_thread(self.drain, True)
+
+    async def rename(self, dest: str):
+        """Flush queued lines, then move the file aside (e.g. for compaction); later
+        writes start a new file at `path`."""
+        await asyncio.to_thread(self._rename, dest)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self.drain, True)
+        with self._lock:
+            self._close_file()
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counts, path=os.path.basename(self.path), pending=len(self._queue), unsynced=self._unsynced)
+
+
+class JsonlHandler(logging.Handler):
+    """logging handler that hands formatted records to a JsonlWriter."""
+
+    def __init__(self, writer: JsonlWriter):
+        super().__init__()
+        self.writer = writer
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.writer.write(self.format(record))
+        except Exception:
+            self.handleError(record)
@@ -0,0 +1,187 @@
+import json, math, os, re
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# actions whose Playwright call takes a timeout
+TIMED_ACTIONS = ("goto", "click", "type", "waitfor", "assert", "assert_text", "assert_visible", "assert_hidden",
+                 "assert_count", "assert_attribute", "assert_url", "assert_title")
+
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F-]{16,}|[0-9a-zA-Z_-]{24,})$")
+
+
+def url_pattern(url: Optional[str]) -> str:
+    """Same normalization as the executor's step_timings: host + path with
+    id-like segments collapsed, e.g. shop.test/orders/:id"""
+    if not url or "://" not in url:
+        return url or ""
+    rest = url.split("://", 1)[1].split("#", 1)[0].split("?", 1)[0]
+    host, _, path = rest.partition("/")
+    segments = [":id" if _ID_SEGMENT.match(seg) else seg for seg in path.split("/") if seg]
+    return "/".join([host.lower()] + segments)
+
+
+class QuantileSketch:
+    """Streaming quantiles with bounded relative error (log-spaced buckets, as in
+    DDSketch). Values are milliseconds; memory grows with log(max/min), not count."""
+
+    def __init__(self, relative_accuracy: float = 0.02):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, value: float):
+        value = max(value, 0.1)
+        i = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen > rank:
+                # bucket midpoint, kept within the observed range
+                value = 2 * self.gamma ** i / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"buckets": list(self.buckets.items()), "count": self.count, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], relative_accuracy: float = 0.02) -> "QuantileSketch":
+        s = cls(relative_accuracy)
+        s.buckets = {int(i): n for i, n in d.get("buckets", [])}
+        s.count = d.get("count", 0)
+        s.min = d.get("min", math.inf)
+        s.max = d.get("max", 0.0)
+        return s
+
+
+class LatencyStats:
+    """Per-step latency sketches keyed by (url_pattern, action, selector).
+
+    Every sample also feeds a ("*", action, selector) sketch, used when a step's
+    page can't be predicted or hasn't been seen yet. `timeout_for()` returns
+    p99 * p99_factor + margin_ms (clamped) once a key has `min_samples`.
+    """
+
+    def __init__(self, path: Optional[str] = None, min_samples: int = 20, p99_factor: float = 1.5,
+                 margin_ms: float = 500, floor_ms: float = 1000, ceiling_ms: float = 60000,
+                 max_keys: int = 5000, save_every: int = 200):
+        self.path = path
+        self.min_samples = min_samples
+        self.p99_factor = p99_factor
+        self.margin_ms = margin_ms
+        self.floor_ms = floor_ms
+        self.ceiling_ms = ceiling_ms
+        self.max_keys = max_keys
+        self.save_every = save_every
+        self._dirty = 0
+        self.sketches: "OrderedDict[Tuple[str, str, str], QuantileSketch]" = OrderedDict()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for item in json.load(f):
+                        self.sketches[tuple(item["key"])] = QuantileSketch.from_dict(item["sketch"])
+            except Exception:
+                self.sketches.clear()
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump([{"key": list(k), "sketch": s.to_dict()} for k, s in self.sketches.items()], f)
+        os.replace(tmp, self.path)
+        self._dirty = 0
+
+    # -----------------------------
+    # write side
+    # -----------------------------
+
+    def _add(self, key: Tuple[str, str, str], ms: float):
+        sketch = self.sketches.get(key)
+        if sketch is None:
+            sketch = self.sketches[key] = QuantileSketch()
+            while len(self.sketches) > self.max_keys:
+                self.sketches.popitem(last=False)
+        else:
+            self.sketches.move_to_end(key)
+        sketch.add(ms)
+
+    def record(self, timings: Optional[Iterable[Dict[str, Any]]]) -> int:
+        """Add the executor's step_timings. Failed steps are skipped: a timeout
+        only says the real latency was longer than the limit."""
+        added = 0
+        for t in timings or []:
+            if not t.get("ok") or t.get("ms") is None:
+                continue
+            action, selector = (t.get("action") or "").lower(), t.get("selector") or ""
+            self._add((t.get("url_pattern") or "", action, selector), float(t["ms"]))
+            self._add(("*", action, selector), float(t["ms"]))
+            added += 1
+        if added:
+            self._dirty += 1
+            if self._dirty >= self.save_every:
+                self.save()
+        return added
+
+    # -----------------------------
+    # read side
+    # -----------------------------
+
+    def _sketch(self, url: Optional[str], action: str, selector: Optional[str]) -> Optional[QuantileSketch]:
+        action = (action or "").lower()
+        keys = [("*", action, selector or "")]
+        if url:
+            keys.insert(0, (url_pattern(url), action, selector or ""))
+        for key in keys:
+            sketch = self.sketches.get(key)
+            if sketch is not None and sketch.count >= self.min_samples:
+                return sketch
+        return None
+
+    def _timeout(self, sketch: QuantileSketch) -> int:
+        ms = sketch.quantile(0.99) * self.p99_factor + self.margin_ms
+        return int(min(max(ms, self.floor_ms), self.ceiling_ms))
+
+    def timeout_for(self, url: Optional[str], action: str, selector: Optional[str]) -> Optional[int]:
+        """History-based timeout in ms, or None without enough samples."""
+        sketch = self._sketch(url, action, selector)
+        return self._timeout(sketch) if sketch is not None else None
+
+    def apply_defaults(self, steps: List[Dict[str, Any]]) -> int:
+        """Fill timeout_ms on steps that don't set one; returns how many were set.
+        A step's page is predicted as the most recent goto target."""
+        url, changed = None, 0
+        for step in steps:
+            action = (step.get("action") or "").lower()
+            value = (step.get("target") or {}).get("value")
+            selector = None if action == "goto" else value
+            if action in TIMED_ACTIONS and step.get("timeout_ms") is None:
+                timeout = self.timeout_for(value if action == "goto" else url, action, selector)
+                if timeout is not None:
+                    step["timeout_ms"] = timeout
+                    changed += 1
+            if action == "goto":
+                url = value
+        return changed
+
+    def summary(self, limit: int = 50) -> List[Dict[str, Any]]:
+        out = []
+        for (url, action, selector), s in list(self.sketches.items())[-limit:]:
+            out.append({
+                "url_pattern": url, "action": action, "selector": selector, "count": s.count,
+                "p50_ms": s.quantile(0.5), "p99_ms": s.quantile(0.99), "max_ms": s.max,
+                "timeout_ms": self._timeout(s) if s.count >= self.min_samples else None,
+            })
+        return out
@@ -0,0 +1,216 @@
+import asyncio, hashlib, os, sqlite3, threading, time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Optional LangChain/OpenAI
+try:
+    from langchain.llms import OpenAI
+    LANGCHAIN_AVAILABLE = True
+except Exception:
+    LANGCHAIN_AVAILABLE = False
+
+
+# -----------------------------
+# backends (blocking; the gateway runs them on worker threads)
+# -----------------------------
+
+class OpenAIBackend:
+    """LangChain OpenAI completion model, built once and reused."""
+
+    def __init__(self, api_key: str, temperature: float = 0.0):
+        self.model_id = f"langchain-openai:t={temperature}"
+        self.llm = OpenAI(openai_api_key=api_key, temperature=temperature)
+
+    def complete(self, prompt: str) -> str:
+        if hasattr(self.llm, "predict"):
+            return self.llm.predict(prompt)
+        return self.llm(prompt)
+
+
+class StubBackend:
+    """Offline stand-in: fixed latency and a deterministic answer per prompt."""
+
+    def __init__(self, latency_ms: float = 800, responder: Optional[Callable[[str], str]] = None):
+        self.model_id = "stub"
+        self.latency_ms = latency_ms
+        self.responder = responder
+        self.calls = 0
+
+    def complete(self, prompt: str) -> str:
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000)
+        if self.responder is not None:
+            return self.responder(prompt)
+        return f"stub response {hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]}"
+
+
+def make_backend(name: str, api_key: str = "", stub_latency_ms: float = 800):
+    """'openai' | 'stub' | 'none' | '' (auto: openai when LangChain and a key are present)."""
+    name = (name or "").lower()
+    if name == "stub":
+        return StubBackend(stub_latency_ms)
+    if name in ("", "openai") and LANGCHAIN_AVAILABLE and api_key:
+        return OpenAIBackend(api_key)
+    return None
+
+
+# -----------------------------
+# gateway
+# -----------------------------
+
+class LLMGateway:
+    """Single entry point for LLM completions.
+
+    - Responses are cached by sha256(model id + prompt) in memory (LRU, TTL) and in
+      a SQLite file, so identical prompts are answered without a model call across
+      restarts.
+    - Concurrent identical prompts share one in-flight call.
+    - Backend calls run on worker threads (at most `max_concurrency` at once), so
+      the event loop never blocks on the model.
+    """
+
+    def __init__(self, backend=None, cache_path: Optional[str] = None, ttl_seconds: float = 7 * 86400,
+                 max_entries: int = 5000, max_concurrency: int = 4):
+        self.backend = backend
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_concurrency = max_concurrency
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # key -> (response, created_at)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.backend_seconds = 0.0
+        if cache_path:
+            self._open_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    # -----------------------------
+    # persistence
+    # -----------------------------
+
+    def _open_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        self._db = sqlite3.connect(self.cache_path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response TEXT, created_at REAL)")
+        cutoff = time.time() - self.ttl_seconds
+        self._db.execute("DELETE FROM llm_cache WHERE created_at < ?", (cutoff,))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, response, created_at FROM llm_cache ORDER BY created_at DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for key, response, created_at in reversed(rows):
+            self._cache[key] = (response, created_at)
+
+    def _db_put(self, key: str, response: str, created_at: float, evicted):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)", (key, response, created_at))
+            if evicted:
+                self._db.executemany("DELETE FROM llm_cache WHERE key = ?", [(k,) for k in evicted])
+            self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+    # -----------------------------
+    # cache
+    # -----------------------------
+
+    def key(self, prompt: str) -> str:
+        model = getattr(self.backend, "model_id", "none")
+        return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[str]:
+        item = self._cache.get(key)
+        if item is None:
+            return None
+        if time.time() - item[1] > self.ttl_seconds:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return item[0]
+
+    def _put(self, key: str, response: str) -> Tuple[float, list]:
+        created_at = time.time()
+        self._cache[key] = (response, created_at)
+        self._cache.move_to_end(key)
+        evicted = []
+        while len(self._cache) > self.max_entries:
+            evicted.append(self._cache.popitem(last=False)[0])
+        return created_at, evicted
+
+    # -----------------------------
+    # completions
+    # -----------------------------
+
+    def _call_backend(self, prompt: str) -> Tuple[str, float]:
+        started = time.monotonic()
+        response = self.backend.complete(prompt)
+        return response, time.monotonic() - started
+
+    async def complete(self, prompt: str, use_cache: bool = True) -> str:
+        """Completion for prompt; raises RuntimeError when no backend is configured."""
+        if self.backend is None:
+            raise RuntimeError("no LLM backend configured")
+        key = self.key(prompt)
+        if use_cache:
+            cached = self._get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self.coalesced += 1
+                return await asyncio.shield(pending)
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        if use_cache:
+            self._inflight[key] = fut
+        try:
+            async with self._sem:
+                response, elapsed = await asyncio.to_thread(self._call_backend, prompt)
+            self.backend_seconds += elapsed
+            created_at, evicted = self._put(key, response)
+            if self._db is not None:
+                await asyncio.to_thread(self._db_put, key, response, created_at, evicted)
+            fut.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            self.errors += 1
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.misses - self.errors
+        return {
+            "backend": getattr(self.backend, "model_id", None),
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+            "max_concurrency": self.max_concurrency,
+            "avg_backend_seconds": (self.backend_seconds / calls) if calls > 0 else None,
+        }
@@ -0,0 +1,281 @@
+import json, os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+# upper bounds (seconds) of the task duration histogram; the last bucket is +Inf
+DURATION_BUCKETS = [1, 2, 5, 10, 30, 60, 120, 300, 600, 1800]
+
+# granularity -> (timestamp prefix length, buckets kept)
+ROLLUPS = {
+    "minute": (16, 180),   # 3 hours
+    "hour": (13, 24 * 14),  # 2 weeks
+    "day": (10, 180),      # ~6 months
+}
+
+FINISHED = ("completed", "failed")
+MAX_ERROR_KEYS = 500
+
+
+def _error_key(error: Any) -> str:
+    # Playwright errors carry a multi-line call log; group by the first line
+    text = str(error or "unknown").strip().splitlines()
+    return (text[0] if text else "unknown")[:200]
+
+
+def _perf(task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The executor's `perf` block of a finished task (meta.perf / meta.budgets), if any."""
+    result = task.get("result")
+    perf = result.get("perf") if isinstance(result, dict) else None
+    return perf if isinstance(perf, dict) and isinstance(perf.get("summary"), dict) else None
+
+
+def _seconds(start: Optional[str], end: Optional[str]) -> Optional[float]:
+    try:
+        return (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+    except Exception:
+        return None
+
+
+class MetricsEngine:
+    """Materialized report metrics, updated as tasks, log events and failures happen.
+
+    Holds lifetime counters, a duration histogram, the failure distribution and
+    minute/hour/day rollups, so `snapshot()` costs the same at any history size.
+    State is saved to `path` as JSON every `save_every` updates and on shutdown;
+    `rebuild()` backfills it from the existing data files.
+    """
+
+    def __init__(self, path: Optional[str] = None, save_every: int = 200):
+        self.path = path
+        self.save_every = save_every
+        self._dirty = 0
+        self.reset()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._load(json.load(f))
+            except Exception:
+                self.reset()
+
+    def reset(self):
+        self.total_tasks = 0
+        self.status_counts: Dict[str, int] = {}
+        self.duration_sum = 0.0
+        self.duration_count = 0
+        self.duration_hist = [0] * (len(DURATION_BUCKETS) + 1)
+        self.failure_distribution: Dict[str, int] = {}
+        self.failure_count = 0
+        self.log_count = 0
+        self.event_counts: Dict[str, int] = {}
+        self.rollups: Dict[str, "OrderedDict[str, Dict[str, float]]"] = {g: OrderedDict() for g in ROLLUPS}
+        # page performance of runs with meta.perf/budgets: metric -> [count, sum, max]
+        self.perf_runs = 0
+        self.perf_budget_failures = 0
+        self.perf_metrics: Dict[str, List[float]] = {}
+        self.perf_violations: Dict[str, int] = {}
+
+    # -----------------------------
+    # persistence
+    # -----------------------------
+
+    def _state(self) -> Dict[str, Any]:
+        return {
+            "total_tasks": self.total_tasks,
+            "status_counts": self.status_counts,
+            "duration_sum": self.duration_sum,
+            "duration_count": self.duration_count,
+            "duration_hist": self.duration_hist,
+            "failure_distribution": self.failure_distribution,
+            "failure_count": self.failure_count,
+            "log_count": self.log_count,
+            "event_counts": self.event_counts,
+            "rollups": {g: list(b.items()) for g, b in self.rollups.items()},
+            "perf": {"runs": self.perf_runs, "budget_failures": self.perf_budget_failures,
+                     "metrics": self.perf_metrics, "violations": self.perf_violations},
+        }
+
+    def _load(self, state: Dict[str, Any]):
+        self.total_tasks = state.get("total_tasks", 0)
+        self.status_counts = state.get("status_counts", {})
+        self.duration_sum = state.get("duration_sum", 0.0)
+        self.duration_count = state.get("duration_count", 0)
+        hist = state.get("duration_hist") or []
+        if len(hist) == len(self.duration_hist):
+            self.duration_hist = hist
+        self.failure_distribution = state.get("failure_distribution", {})
+        self.failure_count = state.get("failure_count", 0)
+        self.log_count = state.get("log_count", 0)
+        self.event_counts = state.get("event_counts", {})
+        for g, items in (state.get("rollups") or {}).items():
+            if g in self.rollups:
+                self.rollups[g] = OrderedDict((k, v) for k, v in items)
+        perf = state.get("perf") or {}
+        self.perf_runs = perf.get("runs", 0)
+        self.perf_budget_failures = perf.get("budget_failures", 0)
+        self.perf_metrics = perf.get("metrics", {})
+        self.perf_violations = perf.get("violations", {})
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state(), f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self._dirty = 0
+
+    def _touched(self):
+        self._dirty += 1
+        if self._dirty >= self.save_every:
+            self.save()
+
+    # -----------------------------
+    # rollups
+    # -----------------------------
+
+    def _bump(self, at: Optional[str], field: str, amount: float = 1):
+        at = at or datetime.utcnow().isoformat()
+        for g, (width, keep) in ROLLUPS.items():
+            buckets = self.rollups[g]
+            key = at[:width]
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {}
+                if len(buckets) > 1 and key < next(reversed(buckets)):
+                    # backfilled out of order: keep keys sorted
+                    self.rollups[g] = buckets = OrderedDict(sorted(buckets.items()))
+                while len(buckets) > keep:
+                    buckets.popitem(last=False)
+            bucket[field] = bucket.get(field, 0) + amount
+
+    # -----------------------------
+    # event hooks
+    # -----------------------------
+
+    def on_task(self, task: Dict[str, Any], old_status: Optional[str]):
+        """TaskManager listener: called with the task after every create/update."""
+        status = task.get("status")
+        if old_status is None:
+            self.total_tasks += 1
+            self._bump(task.get("created_at"), "created")
+        elif old_status == status:
+            return
+        else:
+            self.status_counts[old_status] = max(0, self.status_counts.get(old_status, 0) - 1)
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+        if status in FINISHED:
+            at = task.get("updated_at")
+            self._bump(at, status)
+            d = _seconds(task.get("started_at") or task.get("created_at"), at)
+            if d is not None and d >= 0:
+                self.duration_sum += d
+                self.duration_count += 1
+                i = next((i for i, ub in enumerate(DURATION_BUCKETS) if d <= ub), len(DURATION_BUCKETS))
+                self.duration_hist[i] += 1
+                self._bump(at, "duration_sum", d)
+                self._bump(at, "duration_count")
+            perf = _perf(task)
+            if perf is not None:
+                self._add_perf(perf)
+        self._touched()
+
+    def _add_perf(self, perf: Dict[str, Any]):
+        self.perf_runs += 1
+        for name, value in perf["summary"].items():
+            if name == "navigations" or not isinstance(value, (int, float)):
+                continue
+            m = self.perf_metrics.setdefault(name, [0, 0.0, value])
+            m[0] += 1
+            m[1] += value
+            m[2] = max(m[2], value)
+        violations = (perf.get("budgets") or {}).get("violations") or []
+        if violations:
+            self.perf_budget_failures += 1
+        for v in violations:
+            self.perf_violations[v["metric"]] = self.perf_violations.get(v["metric"], 0) + 1
+
+    def on_log(self, event: str, at: Optional[str] = None):
+        self.log_count += 1
+        self.event_counts[event] = self.event_counts.get(event, 0) + 1
+        self._bump(at, "logs")
+        self._touched()
+
+    def on_failure(self, record: Dict[str, Any]):
+        self.failure_count += 1
+        key = _error_key(record.get("error"))
+        if key in self.failure_distribution or len(self.failure_distribution) < MAX_ERROR_KEYS:
+            self.failure_distribution[key] = self.failure_distribution.get(key, 0) + 1
+        else:
+            self.failure_distribution["(other)"] = self.failure_distribution.get("(other)", 0) + 1
+        self._bump(record.get("timestamp"), "failures")
+        self._touched()
+
+    # -----------------------------
+    # read side
+    # -----------------------------
+
+    def trends(self, granularity: str = "hour", limit: int = 48) -> List[Dict[str, Any]]:
+        out = []
+        for key, b in list(self.rollups.get(granularity, {}).items())[-limit:]:
+            count = b.get("duration_count", 0)
+            out.append({
+                "bucket": key,
+                "created": int(b.get("created", 0)),
+                "completed": int(b.get("completed", 0)),
+                "failed": int(b.get("failed", 0)),
+                "failures": int(b.get("failures", 0)),
+                "logs": int(b.get("logs", 0)),
+                "avg_duration_seconds": (b.get("duration_sum", 0) / count) if count else None,
+            })
+        return out
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Report metrics in the shape returned by report_generator.compute_metrics."""
+        return {
+            "total_tasks": self.total_tasks,
+            "completed": self.status_counts.get("completed", 0),
+            "failed": self.status_counts.get("failed", 0),
+            "pending": self.status_counts.get("pending", 0) + self.status_counts.get("running", 0),
+            "avg_duration_seconds": (self.duration_sum / self.duration_count) if self.duration_count else None,
+            "duration_histogram": {
+                "buckets": [str(ub) for ub in DURATION_BUCKETS] + ["+Inf"],
+                "counts": list(self.duration_hist),
+            },
+            "failure_distribution": dict(self.failure_distribution),
+            "log_count": self.log_count,
+            "event_counts": dict(self.event_counts),
+            "failure_count": self.failure_count,
+            "performance": {
+                "runs": self.perf_runs,
+                "budget_failures": self.perf_budget_failures,
+                "metrics": {name: {"count": c, "avg": round(total / c, 2), "max": worst}
+                            for name, (c, total, worst) in sorted(self.perf_metrics.items()) if c},
+                "violations": dict(self.perf_violations),
+            },
+            "trends": {
+                "minute": self.trends("minute", 60),
+                "hour": self.trends("hour", 48),
+                "day": self.trends("day", 30),
+            },
+        }
+
+    # -----------------------------
+    # backfill
+    # -----------------------------
+
+    def rebuild(self, tasks: Iterable[Dict[str, Any]], log_entries: Iterable[Dict[str, Any]],
+                failures: Iterable[Dict[str, Any]]):
+        """Recompute all state from existing records (one task dict per task id)."""
+        self.reset()
+        for t in tasks:
+            status = t.get("status")
+            self.on_task(dict(t, status="pending", updated_at=t.get("created_at")), None)
+            if status != "pending":
+                self.on_task(t, "pending")
+        for e in log_entries:
+            self.on_log(e.get("event") or "unknown", e.get("time"))
+        for f in failures:
+            self.on_failure(f)
+        self.save()
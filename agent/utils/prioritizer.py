@@ -0,0 +1,103 @@
+import math
+from datetime import datetime
+from statistics import median
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.sharding import historical_durations
+
+# weight of "failed recently" against the decayed failure rate in a test's failure likelihood
+RECENCY_WEIGHT = 0.5
+# pseudo-runs pulling a short history towards the prior rate (one failure in one run isn't 100%)
+PRIOR_RUNS = 2.0
+MIN_SECONDS = 0.5
+
+
+def _age_hours(at: Optional[str], now: datetime) -> Optional[float]:
+    try:
+        return max(0.0, (now - datetime.fromisoformat(at)).total_seconds() / 3600)
+    except Exception:
+        return None
+
+
+def failure_history(tasks: Iterable[Dict[str, Any]], failures: Iterable[Dict[str, Any]],
+                    half_life_hours: float = 72.0, now: Optional[datetime] = None) -> Dict[str, Dict[str, Any]]:
+    """Per test_id: time-decayed runs and failed runs (finished tasks) and the last
+    failure seen in either the task history or the failure bank.
+
+    The failure bank also holds failures that a repair later fixed, so a flaky
+    test that keeps passing on retry still counts as recently failed. Records
+    written before failures carried a test_id are matched by their default run id
+    (run_<task id[:8]>).
+    """
+    now = now or datetime.utcnow()
+    decay = math.log(2) / max(half_life_hours, 1e-6)
+    stats: Dict[str, Dict[str, Any]] = {}
+    run_ids: Dict[str, str] = {}
+
+    def entry(test_id: str) -> Dict[str, Any]:
+        return stats.setdefault(test_id, {"runs": 0.0, "failed": 0.0, "last_failure": None})
+
+    def failed_at(s: Dict[str, Any], at: Optional[str]):
+        if at and (s["last_failure"] is None or at > s["last_failure"]):
+            s["last_failure"] = at
+
+    for t in tasks:
+        test_id = t.get("test_id")
+        if not test_id:
+            continue
+        run_ids[f"run_{t.get('id', '')[:8]}"] = test_id
+        if t.get("status") not in ("completed", "failed"):
+            continue
+        age = _age_hours(t.get("updated_at"), now)
+        if age is None:
+            continue
+        w = math.exp(-decay * age)
+        s = entry(test_id)
+        s["runs"] += w
+        if t.get("status") == "failed":
+            s["failed"] += w
+            failed_at(s, t.get("updated_at"))
+
+    for f in failures:
+        test_id = f.get("test_id") or run_ids.get(f.get("job_id") or "")
+        if test_id:
+            failed_at(entry(test_id), f.get("timestamp"))
+    return stats
+
+
+def prioritize(tests: List[Dict[str, Any]], history: Dict[str, Dict[str, Any]], durations: Dict[str, float],
+               half_life_hours: float = 72.0, new_test_rate: float = 0.3,
+               now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Order TestIRs so that likely failures and fast tests run first.
+
+    Each test gets a failure likelihood p (smoothed decayed failure rate blended
+    with how recently it last failed) and an expected duration t; sorting by p / t
+    descending minimizes the expected time until the first failure is reported
+    (Smith's rule). Tests without history get `new_test_rate` and the median
+    duration. Returns one {"test", "score", "p_fail", "seconds"} per test, best first.
+    """
+    now = now or datetime.utcnow()
+    default_seconds = median(durations.values()) if durations else 1.0
+    ranked = []
+    for i, ir in enumerate(tests):
+        test_id = ir.get("test_id")
+        s = history.get(test_id) if test_id else None
+        if s is None or (not s["runs"] and s["last_failure"] is None):
+            p = new_test_rate
+        else:
+            rate = (s["failed"] + PRIOR_RUNS * new_test_rate) / (s["runs"] + PRIOR_RUNS)
+            age = _age_hours(s["last_failure"], now)
+            recency = 0.5 ** (age / max(half_life_hours, 1e-6)) if age is not None else 0.0
+            p = (1 - RECENCY_WEIGHT) * rate + RECENCY_WEIGHT * recency
+        seconds = max(durations.get(test_id, default_seconds), MIN_SECONDS)
+        ranked.append((-p / seconds, i, {"test": ir, "score": round(p / seconds, 6),
+                                         "p_fail": round(p, 4), "seconds": round(seconds, 2)}))
+    ranked.sort(key=lambda r: r[:2])
+    return [r[2] for r in ranked]
+
+
+def suite_order(tests: List[Dict[str, Any]], tasks: Iterable[Dict[str, Any]], failures: Iterable[Dict[str, Any]],
+                half_life_hours: float = 72.0, new_test_rate: float = 0.3) -> List[Dict[str, Any]]:
+    tasks = list(tasks)
+    return prioritize(tests, failure_history(tasks, failures, half_life_hours), historical_durations(tasks),
+                      half_life_hours, new_test_rate)
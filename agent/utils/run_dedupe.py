@@ -0,0 +1,87 @@
+import asyncio, hashlib, json, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# labels that don't change what a run does
+_IGNORED_IR_KEYS = ("test_id", "description")
+
+
+def run_key(test_ir: Dict[str, Any], **options) -> str:
+    """Canonical hash of a TestIR (key order and labels ignored) plus run options."""
+    ir = {k: v for k, v in (test_ir or {}).items() if k not in _IGNORED_IR_KEYS}
+    doc = json.dumps({"ir": ir, "options": options}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(doc.encode("utf-8")).hexdigest()
+
+
+class RunDedupe:
+    """Single-flight for identical runs.
+
+    `begin()` registers a submitted run under its key; identical submissions that
+    arrive before it finishes `attach()` to its future instead of running again.
+    With `ttl_seconds` > 0, completed runs are also answered from a short-lived
+    cache (failures never are, so a retry always runs).
+    """
+
+    def __init__(self, ttl_seconds: float = 0, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._inflight: Dict[str, Tuple[str, Optional[str], asyncio.Future]] = {}  # key -> (task_id, trace_id, fut)
+        self._recent: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()  # key -> (expires, result)
+        self.counts = {"leaders": 0, "in_flight": 0, "cache": 0}
+
+    def cached(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self._recent.get(key)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del self._recent[key]
+            return None
+        self.counts["cache"] += 1
+        return item[1]
+
+    def leader(self, key: str) -> Optional[Tuple[str, Optional[str], asyncio.Future]]:
+        """(task_id, trace_id, future) of the in-flight run for key, if any."""
+        item = self._inflight.get(key)
+        if item is not None:
+            self.counts["in_flight"] += 1
+        return item
+
+    async def attach(self, fut: asyncio.Future) -> Any:
+        # shield: a follower disconnecting must not cancel the leader's run
+        return await asyncio.shield(fut)
+
+    def begin(self, key: str, task_id: str, trace_id: Optional[str] = None):
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (task_id, trace_id, fut)
+        self.counts["leaders"] += 1
+
+    async def run(self, key: str, job: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Run the leader's job and hand its outcome to every attached follower."""
+        item = self._inflight.get(key)
+        fut = item[2] if item is not None else None
+        try:
+            result = await job()
+        except asyncio.CancelledError:
+            if fut is not None:
+                fut.cancel()
+            raise
+        except BaseException as e:
+            if fut is not None and not fut.done():
+                fut.set_exception(e)
+                fut.exception()  # mark retrieved when nobody attached
+            raise
+        else:
+            if fut is not None and not fut.done():
+                fut.set_result(result)
+            if self.ttl_seconds > 0 and isinstance(result, dict) and result.get("status") == "completed":
+                self._recent[key] = (time.monotonic() + self.ttl_seconds, result)
+                self._recent.move_to_end(key)
+                while len(self._recent) > self.max_entries:
+                    self._recent.popitem(last=False)
+            return result
+        finally:
+            if item is not None and self._inflight.get(key) is item:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counts, running=len(self._inflight), cached=len(self._recent), ttl_seconds=self.ttl_seconds)
@@ -0,0 +1,102 @@
+import asyncio, itertools, time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler refuses a job; carries a retry-after hint in seconds."""
+
+    def __init__(self, retry_after: int, depth: int):
+        super().__init__(f"Job queue full ({depth} queued), retry after {retry_after}s")
+        self.retry_after = retry_after
+        self.depth = depth
+
+
+class JobScheduler:
+    """Bounded priority scheduler for agent jobs.
+
+    Jobs are coroutine factories keyed by task_id. At most `max_workers` run at once;
+    at most `max_queue_depth` may wait. Higher `priority` runs first, FIFO within a
+    priority. Rejected submissions raise QueueFullError with a retry-after estimate
+    derived from the moving average job duration.
+    """
+
+    def __init__(self, max_workers: int, max_queue_depth: int, on_error: Optional[Callable[[str, BaseException], Any]] = None):
+        self.max_workers = max(1, max_workers)
+        self.max_queue_depth = max(1, max_queue_depth)
+        self.on_error = on_error
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self.workers = []
+        self.running: Dict[str, float] = {}
+        self._seq = itertools.count()
+        self._avg_duration = 30.0
+        self._completed = 0
+        self._rejected = 0
+
+    def start(self):
+        if self.workers:
+            return
+        self.queue = asyncio.PriorityQueue()
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+
+    async def stop(self):
+        for w in self.workers:
+            w.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue else 0
+
+    def retry_after(self) -> int:
+        # expected time until a slot frees up for a newcomer at the back of the queue
+        waves = (self.depth() + len(self.running)) / self.max_workers
+        return max(1, int(waves * self._avg_duration))
+
+    def ensure_capacity(self):
+        if self.depth() >= self.max_queue_depth:
+            self._rejected += 1
+            raise QueueFullError(self.retry_after(), self.depth())
+
+    def submit(self, task_id: str, job: Callable[[], Awaitable[Any]], priority: int = 0,
+               wait: bool = True) -> Optional[asyncio.Future]:
+        """Enqueue a job. Returns a future for its result when `wait` is set."""
+        self.start()
+        self.ensure_capacity()
+        fut = asyncio.get_running_loop().create_future() if wait else None
+        self.queue.put_nowait((-priority, next(self._seq), task_id, job, fut))
+        return fut
+
+    async def _worker(self):
+        while True:
+            _, _, task_id, job, fut = await self.queue.get()
+            started = time.monotonic()
+            self.running[task_id] = started
+            try:
+                result = await job()
+                if fut is not None and not fut.done():
+                    fut.set_result(result)
+            except asyncio.CancelledError:
+                if fut is not None and not fut.done():
+                    fut.cancel()
+                raise
+            except BaseException as e:
+                if fut is not None and not fut.done():
+                    fut.set_exception(e)
+                elif self.on_error:
+                    self.on_error(task_id, e)
+            finally:
+                self.running.pop(task_id, None)
+                self._completed += 1
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * (time.monotonic() - started)
+                self.queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue_depth": self.max_queue_depth,
+            "queued": self.depth(),
+            "running": len(self.running),
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_job_seconds": round(self._avg_duration, 3),
+        }
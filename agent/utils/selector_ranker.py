@@ -0,0 +1,151 @@
+import heapq, json, re
+from typing import Any, Dict, List, Optional, Tuple
+
+# fields of an indexed element compared against the failed target, by the kind
+# of selector part they correspond to
+_FIELDS = {"testid": ("testid",), "id": ("id",), "class": ("classes",), "text": ("name", "text"),
+           "attr": ("name", "testid", "id"), "raw": ("testid", "id", "name", "text")}
+CROSS_WEIGHT = 0.8  # a renamed id matching the button's text is a weaker signal
+
+_ACTION_ROLES = {
+    "click": {"button", "link", "checkbox", "radio", "switch", "tab", "menuitem", "option"},
+    "type": {"textbox", "combobox"},
+    "waitfor": None,
+}
+_ID_LIKE = re.compile(r"\d{4,}|[0-9a-f]{8,}", re.I)
+
+_TEXT_PATTERNS = [re.compile(p) for p in (
+    r"^text\s*=\s*[\"']?(.+?)[\"']?$",
+    r":has-text\(\s*[\"'](.+?)[\"']\s*\)",
+    r":text(?:-is)?\(\s*[\"'](.+?)[\"']\s*\)",
+)]
+_ATTR = re.compile(r"\[([\w-]+)\s*[*^$|~]?=\s*[\"']?([^\"'\]]+)[\"']?\s*\]")
+_TESTID_ATTRS = {"data-testid", "data-test-id", "data-test", "data-qa", "data-cy"}
+
+
+def tokens(s: str) -> List[str]:
+    """Lower-case words; camelCase and snake/kebab-case are split, CJK runs kept whole."""
+    s = re.sub(r"([a-z])([A-Z])", r"\1 \2", s or "")
+    return re.findall(r"[a-z0-9]+|[^\x00-\x7f\s]+", s.lower())
+
+
+def _grams(s: str) -> set:
+    s = f" {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)} if len(s) > 3 else {s}
+
+
+class _Term:
+    __slots__ = ("kind", "norm", "words", "grams")
+
+    def __init__(self, kind: str, value: str):
+        self.kind = kind
+        self.words = set(tokens(value))
+        self.norm = " ".join(tokens(value))
+        self.grams = _grams(self.norm)
+
+    def similarity(self, value: str) -> float:
+        """max(trigram Dice, word Jaccard) on normalized strings."""
+        words = tokens(value)
+        norm = " ".join(words)
+        if not norm or not self.norm:
+            return 0.0
+        if norm == self.norm:
+            return 1.0
+        if norm.replace(" ", "") == self.norm.replace(" ", ""):
+            return 0.95  # "login" vs "Log in"
+        grams = _grams(norm)
+        dice = 2 * len(self.grams & grams) / (len(self.grams) + len(grams))
+        wset = set(words)
+        jaccard = len(self.words & wset) / len(self.words | wset)
+        return max(dice, jaccard)
+
+
+def target_terms(target: Dict[str, Any]) -> Tuple[List[_Term], Optional[str]]:
+    """Split a failed step's target into comparable terms, plus its tag if any."""
+    value = str((target or {}).get("value") or "").strip()
+    if not value:
+        return [], None
+    if (target or {}).get("type") == "text":
+        return [_Term("text", value)], None
+    # in a chained selector (a >> b) the earlier parts only scope the search
+    last = value.split(">>")[-1].strip()
+    raw, tag, terms = last, None, []
+    for p in _TEXT_PATTERNS:
+        m = p.search(last)
+        if m:
+            terms.append(_Term("text", m.group(1)))
+    for name, val in _ATTR.findall(last):
+        kind = "testid" if name in _TESTID_ATTRS else "id" if name == "id" else "attr"
+        terms.append(_Term(kind, val))
+    if not re.match(r"^[\w-]+\s*=", last):  # CSS, not text=/role=/xpath= engines
+        css = raw = _ATTR.sub("", last.split(":", 1)[0])
+        terms += [_Term("id", v) for v in re.findall(r"#([\w-]+)", css)]
+        terms += [_Term("class", v) for v in re.findall(r"\.([\w-]+)", css)]
+        m = re.match(r"^([a-z][a-z0-9]*)", css.split()[-1]) if css.split() else None
+        tag = m.group(1) if m else None
+    if not terms:
+        terms.append(_Term("raw", raw))
+    return terms, tag
+
+
+def _field_values(el: Dict[str, Any], field: str) -> List[str]:
+    v = el.get(field)
+    if not v:
+        return []
+    return v if isinstance(v, list) else [v]
+
+
+def _quote(s: str) -> str:
+    return json.dumps(s, ensure_ascii=False)
+
+
+def selector_for(el: Dict[str, Any]) -> str:
+    """Most stable Playwright selector the index offers for an element."""
+    if el.get("testid"):
+        return f"[{el.get('testid_attr') or 'data-testid'}={_quote(el['testid'])}]"
+    if el.get("id") and not _ID_LIKE.search(el["id"]) and re.fullmatch(r"[A-Za-z][\w-]*", el["id"]):
+        return f"#{el['id']}"
+    name = el.get("name")
+    if el.get("role") and name and len(name) <= 40:
+        return f"role={el['role']}[name={_quote(name)}]"
+    return el.get("css") or el.get("tag") or "*"
+
+
+def rank_candidates(index: Dict[str, Any], target: Dict[str, Any], action: Optional[str] = None,
+                    limit: int = 3, min_score: float = 0.45) -> List[Dict[str, Any]]:
+    """Score every indexed element against the failed target (one pass, bounded work
+    per element) and return the best distinct replacement selectors."""
+    terms, tag = target_terms(target)
+    if not terms:
+        return []
+    roles = _ACTION_ROLES.get((action or "").lower())
+    scored = []
+    for el in index.get("elements") or []:
+        best = 0.0
+        for term in terms:
+            own = _FIELDS[term.kind]
+            for field in ("testid", "id", "name", "text", "classes"):
+                weight = 1.0 if field in own else CROSS_WEIGHT
+                for v in _field_values(el, field):
+                    best = max(best, weight * term.similarity(v))
+        if best <= 0:
+            continue
+        if tag and el.get("tag") == tag:
+            best += 0.05
+        if roles and el.get("role") in roles:
+            best += 0.05
+        if not el.get("visible", True):
+            best -= 0.2
+        scored.append((min(best, 1.0), el))
+
+    out, seen = [], set()
+    for score, el in heapq.nlargest(limit * 4, scored, key=lambda x: x[0]):
+        if score < min_score or len(out) >= limit:
+            break
+        sel = selector_for(el)
+        if sel in seen or sel == (target or {}).get("value"):
+            continue
+        seen.add(sel)
+        out.append({"selector": sel, "score": round(score, 3),
+                    "element": {k: el.get(k) for k in ("tag", "role", "name", "id", "testid", "css")}})
+    return out
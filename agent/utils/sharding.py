@@ -0,0 +1,53 @@
+import heapq
+from datetime import datetime
+from statistics import median
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def _seconds_between(start: Optional[str], end: Optional[str]) -> Optional[float]:
+    try:
+        return (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+    except Exception:
+        return None
+
+
+def historical_durations(tasks: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+    """Median run time per test_id over completed/failed tasks.
+
+    Uses started_at (set when a worker picks the task up) so queueing time is
+    excluded; falls back to created_at for older records.
+    """
+    samples: Dict[str, List[float]] = {}
+    for t in tasks:
+        test_id = t.get("test_id")
+        if not test_id or t.get("status") not in ("completed", "failed"):
+            continue
+        d = _seconds_between(t.get("started_at") or t.get("created_at"), t.get("updated_at"))
+        if d is not None and d >= 0:
+            samples.setdefault(test_id, []).append(d)
+    return {k: median(v) for k, v in samples.items()}
+
+
+def lpt_shard(tests: List[Dict[str, Any]], durations: Dict[str, float], n_shards: int,
+              default_duration: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Longest-processing-time-first bin packing of TestIRs onto n_shards.
+
+    Tests without history get `default_duration` (median of known durations, or 1s).
+    Returns one entry per shard: {"tests": [...], "estimated_seconds": float}.
+    """
+    n_shards = max(1, n_shards)
+    if default_duration is None:
+        default_duration = median(durations.values()) if durations else 1.0
+
+    def cost(ir: Dict[str, Any]) -> float:
+        return durations.get(ir.get("test_id"), default_duration)
+
+    shards = [{"tests": [], "estimated_seconds": 0.0} for _ in range(n_shards)]
+    heap = [(0.0, i) for i in range(n_shards)]
+    for ir in sorted(tests, key=cost, reverse=True):
+        load, i = heapq.heappop(heap)
+        c = cost(ir)
+        shards[i]["tests"].append(ir)
+        shards[i]["estimated_seconds"] = load + c
+        heapq.heappush(heap, (load + c, i))
+    return shards
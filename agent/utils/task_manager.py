@@ -1,57 +1,344 @@
-import asyncio, json, os, uuid
-from datetime import datetime
-from typing import Dict, Any
+import asyncio, base64, bisect, json, os, sqlite3, uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set, Tuple
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
 
 class TaskManager:
-    def __init__(self, state_file: str):
+    """In-memory task table persisted as a SQLite snapshot plus a short JSONL tail log.
+
+    Every change is appended to `state_file`. Once the tail holds `compact_every`
+    lines it is rotated to `<state_file>.compacting` and folded into the snapshot
+    on a worker thread (latest version per task wins), so neither the log nor
+    startup replay grows with history. Finished tasks older than `retention_days`,
+    or beyond the newest `retention_max`, are dropped during compaction.
+
+    Secondary indexes (status -> ids, and (created_at, id) in sorted order) back
+    the paginated `query()` so list requests never touch the whole table.
+
+    When a `bus` (utils.event_bus.EventBus) is given, every create/update is
+    published as a `task` event carrying the task without its result. Listeners
+    added with `add_listener` are called synchronously with (task, old_status);
+    old_status is None for a newly created task.
+    """
+
+    def __init__(self, state_file: str, snapshot_file: Optional[str] = None, compact_every: int = 1000,
+                 retention_days: Optional[float] = None, retention_max: Optional[int] = None, bus=None,
+                 writer=None):
         self.state_file = state_file
+        self.snapshot_file = snapshot_file or state_file + ".snapshot.db"
+        self.compacting_file = state_file + ".compacting"
+        self.compact_every = max(1, compact_every)
+        self.retention_days = retention_days
+        self.retention_max = retention_max
+        self.bus = bus
+        self.writer = writer  # utils.jsonl_writer.JsonlWriter for state_file; None = write synchronously
+        self.listeners: List[Callable[[Dict[str, Any], Optional[str]], None]] = []
         self.tasks: Dict[str, Any] = {}
+        self.by_status: Dict[str, Set[str]] = {}
+        self.by_created: List[Tuple[str, str]] = []
         self.lock = asyncio.Lock()
+        self._tail_lines = 0
+        self._compaction: Optional[asyncio.Task] = None
         os.makedirs(os.path.dirname(state_file) or '.', exist_ok=True)
         self._load_state()
 
+    # -----------------------------
+    # load
+    # -----------------------------
+
     def _load_state(self):
-        if os.path.exists(self.state_file):
+        if os.path.exists(self.snapshot_file):
             try:
-                with open(self.state_file, "r", encoding="utf-8") as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        data = json.loads(line)
-                        self.tasks[data["id"]] = data
+                con = sqlite3.connect(self.snapshot_file)
+                try:
+                    for (data,) in con.execute("SELECT data FROM tasks"):
+                        task = json.loads(data)
+                        self.tasks[task["id"]] = task
+                finally:
+                    con.close()
             except Exception:
                 pass
+        self._replay(self.compacting_file)
+        self._tail_lines = self._replay(self.state_file)
+        self._rebuild_indexes()
+
+        # a compaction interrupted by a restart is finished synchronously (bounded size)
+        if os.path.exists(self.compacting_file):
+            self._drop_expired(self._compact_file())
+        if self._tail_lines >= self.compact_every:
+            os.replace(self.state_file, self.compacting_file)
+            self._tail_lines = 0
+            self._drop_expired(self._compact_file())
+
+    def _replay(self, path: str) -> int:
+        count = 0
+        if not os.path.exists(path):
+            return count
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except Exception:
+                        continue
+                    self.tasks[data["id"]] = data
+                    count += 1
+        except Exception:
+            pass
+        return count
+
+    # -----------------------------
+    # compaction
+    # -----------------------------
+
+    def _retention_cutoff(self) -> Optional[str]:
+        if not self.retention_days:
+            return None
+        return (datetime.utcnow() - timedelta(days=self.retention_days)).isoformat()
+
+    def _compact_file(self) -> Dict[str, str]:
+        """Fold the rotated log into the snapshot; returns {id: updated_at} dropped by retention.
+
+        Runs on a worker thread: touches only files, never `self.tasks`.
+        """
+        latest: Dict[str, Dict[str, Any]] = {}
+        with open(self.compacting_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                    latest[data["id"]] = data
+                except Exception:
+                    continue
+
+        con = sqlite3.connect(self.snapshot_file)
+        try:
+            con.execute("CREATE TABLE IF NOT EXISTS tasks (id TEXT PRIMARY KEY, status TEXT, updated_at TEXT, data TEXT)")
+            con.execute("CREATE INDEX IF NOT EXISTS tasks_status_updated ON tasks (status, updated_at)")
+            con.executemany(
+                "INSERT OR REPLACE INTO tasks (id, status, updated_at, data) VALUES (?, ?, ?, ?)",
+                [(t["id"], t.get("status"), t.get("updated_at"), json.dumps(t, ensure_ascii=False)) for t in latest.values()],
+            )
+            finished = ",".join("?" * len(FINISHED_STATUSES))
+            expired: Dict[str, str] = {}
+            cutoff = self._retention_cutoff()
+            if cutoff:
+                expired.update(con.execute(
+                    f"SELECT id, updated_at FROM tasks WHERE status IN ({finished}) AND updated_at < ?",
+                    (*FINISHED_STATUSES, cutoff)))
+            if self.retention_max:
+                expired.update(con.execute(
+                    f"SELECT id, updated_at FROM tasks WHERE status IN ({finished}) ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                    (*FINISHED_STATUSES, self.retention_max)))
+            con.executemany("DELETE FROM tasks WHERE id = ?", [(i,) for i in expired])
+            con.commit()
+        finally:
+            con.close()
+        os.remove(self.compacting_file)
+        return expired
+
+    def _drop_expired(self, expired: Dict[str, str]):
+        for task_id, updated_at in expired.items():
+            task = self.tasks.get(task_id)
+            # keep tasks that were touched again after the rotation
+            if task and task.get("updated_at") == updated_at:
+                self.tasks.pop(task_id, None)
+                self.by_status.get(task.get("status"), set()).discard(task_id)
+                self._created_remove(task)
+
+    def _maybe_compact(self):
+        if self._compaction is not None:
+            return
+        # a leftover rotated log (failed compaction) is retried before rotating again
+        rotate = not os.path.exists(self.compacting_file)
+        if rotate:
+            if self._tail_lines < self.compact_every:
+                return
+            self._tail_lines = 0
+        self._compaction = asyncio.create_task(self._compact(rotate))
+
+    async def _compact(self, rotate: bool):
+        try:
+            if rotate:
+                # lines queued before the move land in the rotated log, later ones in a new tail
+                if self.writer is not None:
+                    await self.writer.rename(self.compacting_file)
+                else:
+                    await asyncio.to_thread(os.replace, self.state_file, self.compacting_file)
+            expired = await asyncio.to_thread(self._compact_file)
+            self._drop_expired(expired)
+        except Exception as e:
+            print(f"[TaskManager] compaction failed: {e}")
+        finally:
+            self._compaction = None
+
+    # -----------------------------
+    # secondary indexes
+    # -----------------------------
+
+    @staticmethod
+    def _created_key(task: Dict[str, Any]) -> Tuple[str, str]:
+        return (task.get("created_at") or "", task["id"])
+
+    def _rebuild_indexes(self):
+        self.by_status = {}
+        for task_id, task in self.tasks.items():
+            self.by_status.setdefault(task.get("status"), set()).add(task_id)
+        self.by_created = sorted(self._created_key(t) for t in self.tasks.values())
+
+    def _created_insert(self, task: Dict[str, Any]):
+        key = self._created_key(task)
+        if not self.by_created or self.by_created[-1] <= key:
+            self.by_created.append(key)  # common case: newest task
+        else:
+            bisect.insort(self.by_created, key)
+
+    def _created_remove(self, task: Dict[str, Any]):
+        key = self._created_key(task)
+        i = bisect.bisect_left(self.by_created, key)
+        if i < len(self.by_created) and self.by_created[i] == key:
+            del self.by_created[i]
+
+    @staticmethod
+    def encode_cursor(key: Tuple[str, str]) -> str:
+        return base64.urlsafe_b64encode(f"{key[0]}|{key[1]}".encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, str]:
+        created_at, task_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return created_at, task_id
+
+    def query(self, statuses: Optional[Iterable[str]] = None, since: Optional[str] = None,
+              until: Optional[str] = None, text: Optional[str] = None, cursor: Optional[str] = None,
+              limit: int = 50, newest_first: bool = True) -> Dict[str, Any]:
+        """Cursor-paginated task listing ordered by created_at.
+
+        `since`/`until` bound created_at (ISO strings, inclusive/exclusive), `text` is a
+        case-insensitive description substring. Returns {"items", "next_cursor"}.
+        Raises ValueError on a malformed cursor.
+        """
+        # key bounds: lo_key <= key (or < when resuming ascending), key < hi_key
+        lo_key, lo_open = (since or "", ""), False
+        hi_key = (until, "") if until else None
+        if cursor:
+            key = self.decode_cursor(cursor)
+            if newest_first:
+                hi_key = min(hi_key, key) if hi_key else key
+            elif key >= lo_key:
+                lo_key, lo_open = key, True
+
+        def in_range(k):
+            return (k > lo_key if lo_open else k >= lo_key) and (hi_key is None or k < hi_key)
+
+        lo = (bisect.bisect_right if lo_open else bisect.bisect_left)(self.by_created, lo_key)
+        hi = bisect.bisect_left(self.by_created, hi_key) if hi_key else len(self.by_created)
+
+        wanted = set(statuses) if statuses else None
+        matching = sum(len(self.by_status.get(st, ())) for st in wanted) if wanted else 0
+        if wanted and matching * 8 < hi - lo:
+            # rare statuses (pending/running): sort the small status sets instead of scanning
+            keys = sorted(k for k in (self._created_key(self.tasks[i]) for st in wanted
+                                      for i in self.by_status.get(st, ())) if in_range(k))
+            candidates = reversed(keys) if newest_first else iter(keys)
+        else:
+            order = range(hi - 1, lo - 1, -1) if newest_first else range(lo, hi)
+            candidates = (self.by_created[i] for i in order)
+
+        needle = text.lower() if text else None
+        items, last_key = [], None
+        for key in candidates:
+            task = self.tasks.get(key[1])
+            if task is None:
+                continue
+            if wanted is not None and task.get("status") not in wanted:
+                continue
+            if needle and needle not in (task.get("description") or "").lower():
+                continue
+            if len(items) == limit:
+                return {"items": items, "next_cursor": self.encode_cursor(last_key)}
+            items.append(task)
+            last_key = key
+        return {"items": items, "next_cursor": None}
+
+    def status_counts(self) -> Dict[str, int]:
+        return {st: len(ids) for st, ids in self.by_status.items() if ids}
+
+    # -----------------------------
+    # public API
+    # -----------------------------
+
+    def _append(self, task: Dict[str, Any]):
+        if self.writer is not None:
+            self.writer.write(task)
+        else:
+            with open(self.state_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(task, ensure_ascii=False) + "\n")
+        self._tail_lines += 1
 
     async def _persist(self, task_id: str):
         async with self.lock:
-            with open(self.state_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(self.tasks[task_id], ensure_ascii=False) + "\n")
+            self._append(self.tasks[task_id])
+            self._maybe_compact()
 
-    def create_task(self, description: str) -> str:
+    def create_task(self, description: str, test_id: Optional[str] = None) -> str:
         task_id = str(uuid.uuid4())
         task = {
             "id": task_id,
             "description": description,
+            "test_id": test_id,
             "status": "pending",
             "created_at": datetime.utcnow().isoformat(),
             "updated_at": datetime.utcnow().isoformat()
         }
         self.tasks[task_id] = task
-        # persist initial record synchronously
-        with open(self.state_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(task, ensure_ascii=False) + "\n")
+        self.by_status.setdefault(task["status"], set()).add(task_id)
+        self._created_insert(task)
+        self._append(task)
+        self._publish(task, None)
         return task_id
 
     async def update_task(self, task_id: str, status: str, result: Any = None):
         if task_id not in self.tasks:
             return
+        old_status = self.tasks[task_id].get("status")
+        if old_status != status:
+            self.by_status.get(old_status, set()).discard(task_id)
+            self.by_status.setdefault(status, set()).add(task_id)
         self.tasks[task_id]["status"] = status
         self.tasks[task_id]["updated_at"] = datetime.utcnow().isoformat()
+        if status == "running":
+            self.tasks[task_id]["started_at"] = self.tasks[task_id]["updated_at"]
         if result is not None:
             self.tasks[task_id]["result"] = result
+        self._publish(self.tasks[task_id], old_status)
         await self._persist(task_id)
 
+    def add_listener(self, fn: Callable[[Dict[str, Any], Optional[str]], None]):
+        self.listeners.append(fn)
+
+    def _publish(self, task: Dict[str, Any], old_status: Optional[str]):
+        for fn in self.listeners:
+            try:
+                fn(task, old_status)
+            except Exception as e:
+                print(f"[TaskManager] listener failed: {e}")
+        if self.bus is not None:
+            self.bus.publish("task", {k: v for k, v in task.items() if k != "result"})
+
+    async def flush(self):
+        """Wait for an in-flight compaction and queued writes (e.g. on shutdown)."""
+        if self._compaction is not None:
+            await self._compaction
+        if self.writer is not None:
+            await self.writer.flush()
+
     def get_task(self, task_id: str):
         return self.tasks.get(task_id)
 
@@ -0,0 +1,294 @@
+"""
+Content-addressed artifact store.
+
+Artifacts (screenshots, DOM snapshots/indexes, HARs) are addressed by a key
+(`{run}_{test}_dom.json`, ...) that points at a blob named by the sha256 of the
+content, so a retry or a rerun that produces byte-identical data stores it once.
+
+    store = ArtifactStore(root, max_bytes=5 << 30, max_age_seconds=7 * 86400)
+    await store.put("run_1_t1_shot.png", png_bytes, "image/png")
+    await store.put_json("run_1_t1_dom.json", {"html": html})   # serialized on the pool
+    meta, chunk = await store.read("run_1_t1_dom.json", start=0, end=1023)
+
+- Text artifacts (JSON, HAR, HTML) are compressed with zstd when `zstandard` is
+  installed, else gzip; images are stored as they come (PNG is already deflated).
+- Hashing, compression and disk I/O run on a small thread pool, never on the
+  event loop.
+- The index (SQLite, root/index.sqlite) maps keys to blobs. `gc()` drops keys older
+  than `max_age_seconds`, then the oldest keys until the blobs fit in `max_bytes`,
+  and deletes blobs no key refers to.
+- Reads take a byte range of the original content; compressed blobs are decoded
+  as a stream up to the end of the range.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+CHUNK = 1 << 20
+COMPRESS_MIN_BYTES = 512
+_TEXT_TYPES = ("application/json", "text/", "application/har+json", "application/xml")
+
+
+def compressible(content_type: str) -> bool:
+    return (content_type or "").startswith(_TEXT_TYPES)
+
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+
+class ArtifactStore:
+    def __init__(self, root: str, max_bytes: int = 5 << 30, max_age_seconds: float = 7 * 86400,
+                 workers: int = 4, codec: Optional[str] = None, level: Optional[int] = None):
+        codec = codec or default_codec()
+        if codec == "zstd" and zstandard is None:
+            print("[ArtifactStore] zstandard not installed, using gzip")
+            codec = "gzip"
+        if codec not in ("zstd", "gzip", "none"):
+            raise ValueError(f"unknown artifact codec: {codec}")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.codec = codec
+        self.level = level if level is not None else (3 if codec == "zstd" else 6)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="artifacts")
+        self._lock = threading.Lock()  # the sqlite connection is shared by the pool threads
+        self.counts = {"writes": 0, "dedup_hits": 0, "bytes_in": 0, "bytes_written": 0,
+                       "reads": 0, "evicted": 0, "io_seconds": 0.0}
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY, size INTEGER, stored INTEGER, encoding TEXT, created REAL);
+            CREATE TABLE IF NOT EXISTS artifacts (
+                key TEXT PRIMARY KEY, digest TEXT, content_type TEXT, created REAL);
+            CREATE INDEX IF NOT EXISTS artifacts_created ON artifacts(created);
+            CREATE INDEX IF NOT EXISTS artifacts_digest ON artifacts(digest);
+        """)
+
+    # -----------------------------
+    # write side (pool threads)
+    # -----------------------------
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def _encoder(self, f, encoding: str):
+        if encoding == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).stream_writer(f, closefd=False)
+        if encoding == "gzip":
+            return gzip.GzipFile(fileobj=f, mode="wb", compresslevel=self.level, mtime=0)
+        return None
+
+    @staticmethod
+    def _chunks(source) -> Iterable[bytes]:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            yield bytes(source)
+            return
+        with open(source, "rb") as f:
+            while True:
+                chunk = f.read(CHUNK)
+                if not chunk:
+                    return
+                yield chunk
+
+    def put_sync(self, key: str, source, content_type: str = "application/octet-stream") -> Dict[str, Any]:
+        """Store `source` (bytes, or a file path) under `key`: hash and compress it into
+        a temp file in one pass, keep that as the blob unless the digest is already
+        stored, and point the key at the blob."""
+        started = time.monotonic()
+        size = len(source) if isinstance(source, (bytes, bytearray, memoryview)) else os.path.getsize(source)
+        encoding = self.codec if compressible(content_type) and size >= COMPRESS_MIN_BYTES else "none"
+        tmp = os.path.join(self.root, "blobs", f".tmp_{uuid.uuid4().hex}")
+        digest = hashlib.sha256()
+        try:
+            with open(tmp, "wb") as f:
+                enc = self._encoder(f, encoding)
+                for chunk in self._chunks(source):
+                    digest.update(chunk)
+                    (enc or f).write(chunk)
+                if enc is not None:
+                    enc.close()
+                stored = f.tell()
+            digest = digest.hexdigest()
+
+            with self._lock:
+                row = self._db.execute("SELECT stored FROM blobs WHERE digest = ?", (digest,)).fetchone()
+                if row is None:
+                    path = self._blob_path(digest)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp, path)
+                    self._db.execute("INSERT INTO blobs VALUES (?, ?, ?, ?, ?)",
+                                     (digest, size, stored, encoding, time.time()))
+                    self.counts["bytes_written"] += stored
+                else:
+                    stored = row[0]
+                    self.counts["dedup_hits"] += 1
+                self._db.execute("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?)",
+                                 (key, digest, content_type, time.time()))
+                self._db.commit()
+                self.counts["writes"] += 1
+                self.counts["bytes_in"] += size
+                self.counts["io_seconds"] += time.monotonic() - started
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return {"key": key, "digest": digest, "size": size, "stored": stored, "dedup": row is not None}
+
+    async def put(self, key: str, source, content_type: str = "application/octet-stream") -> Dict[str, Any]:
+        return await asyncio.get_running_loop().run_in_executor(self._pool, self.put_sync, key, source, content_type)
+
+    async def put_json(self, key: str, obj: Any) -> Dict[str, Any]:
+        def encode_and_put():
+            return self.put_sync(key, json.dumps(obj, ensure_ascii=False).encode("utf-8"), "application/json")
+        return await asyncio.get_running_loop().run_in_executor(self._pool, encode_and_put)
+
+    async def put_file(self, key: str, path: str, content_type: str, remove: bool = True) -> Dict[str, Any]:
+        """Move a file written by someone else (e.g. Playwright's HAR) into the store."""
+        info = await self.put(key, path, content_type)
+        if remove:
+            await asyncio.get_running_loop().run_in_executor(self._pool, os.remove, path)
+        return info
+
+    # -----------------------------
+    # read side
+    # -----------------------------
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT a.digest, a.content_type, a.created, b.size, b.stored, b.encoding "
+                "FROM artifacts a JOIN blobs b ON a.digest = b.digest WHERE a.key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        names = ("digest", "content_type", "created", "size", "stored", "encoding")
+        return dict(zip(names, row), key=key, path=self._blob_path(row[0]))
+
+    def _decoder(self, f, encoding: str):
+        if encoding == "zstd":
+            if zstandard is None:
+                raise RuntimeError("blob is zstd-compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().stream_reader(f)
+        if encoding == "gzip":
+            return gzip.GzipFile(fileobj=f, mode="rb")
+        return f
+
+    def read_sync(self, key: str, start: int = 0, end: Optional[int] = None) -> Tuple[Dict[str, Any], bytes]:
+        """(metadata, content[start:end + 1]) of the original, uncompressed bytes."""
+        meta = self.lookup(key)
+        if meta is None:
+            raise KeyError(key)
+        started = time.monotonic()
+        end = meta["size"] - 1 if end is None else min(end, meta["size"] - 1)
+        want = max(0, end - start + 1)
+        try:
+            f = open(meta["path"], "rb")
+        except FileNotFoundError:
+            raise KeyError(key)  # gc deleted the blob after the lookup
+        with f:
+            if meta["encoding"] == "none":
+                f.seek(start)
+                data = f.read(want)
+            else:
+                src = self._decoder(f, meta["encoding"])
+                skip = start
+                while skip > 0:  # compressed streams can't seek; decode and drop
+                    dropped = len(src.read(min(skip, CHUNK)))
+                    if not dropped:
+                        break
+                    skip -= dropped
+                data = src.read(want)
+        self.counts["reads"] += 1
+        self.counts["io_seconds"] += time.monotonic() - started
+        return meta, data
+
+    async def read(self, key: str, start: int = 0, end: Optional[int] = None) -> Tuple[Dict[str, Any], bytes]:
+        return await asyncio.get_running_loop().run_in_executor(self._pool, self.read_sync, key, start, end)
+
+    # -----------------------------
+    # retention
+    # -----------------------------
+
+    def gc_sync(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Apply the age limit, then the size limit (oldest keys first), then delete
+        blobs no key refers to any more."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = self._db.execute("DELETE FROM artifacts WHERE created < ?",
+                                       (now - self.max_age_seconds,)).rowcount if self.max_age_seconds else 0
+            evicted = 0
+            if self.max_bytes:
+                total = self._referenced_bytes()
+                if total > self.max_bytes:
+                    cutoff = self._size_cutoff(total - self.max_bytes)
+                    evicted = self._db.execute("DELETE FROM artifacts WHERE (created, rowid) <= (?, ?)",
+                                               cutoff).rowcount
+            orphans = [d for (d,) in self._db.execute(
+                "SELECT digest FROM blobs WHERE digest NOT IN (SELECT digest FROM artifacts)").fetchall()]
+            for digest in orphans:
+                try:
+                    os.remove(self._blob_path(digest))
+                except FileNotFoundError:
+                    pass
+            self._db.execute("DELETE FROM blobs WHERE digest NOT IN (SELECT digest FROM artifacts)")
+            self._db.commit()
+            self.counts["evicted"] += expired + evicted
+        return {"expired": expired, "evicted": evicted, "blobs_deleted": len(orphans)}
+
+    async def gc(self) -> Dict[str, int]:
+        return await asyncio.get_running_loop().run_in_executor(self._pool, self.gc_sync)
+
+    def _size_cutoff(self, excess: int) -> Tuple[float, int]:
+        """(created, rowid) of the newest key to evict so that `excess` bytes are freed
+        evicting oldest first. A blob is freed by the eviction of its newest key, so
+        the running sum of blob sizes in that order gives the cutoff in one query."""
+        return self._db.execute("""
+            WITH ordered AS (
+                SELECT created, rowid AS id, digest, ROW_NUMBER() OVER (ORDER BY created, rowid) AS pos
+                FROM artifacts),
+            last AS (
+                SELECT *, MAX(pos) OVER (PARTITION BY digest) AS last_pos FROM ordered),
+            freed AS (
+                SELECT l.created, l.id, l.pos, SUM(b.stored) OVER (ORDER BY l.pos) AS freed
+                FROM last l JOIN blobs b ON b.digest = l.digest WHERE l.pos = l.last_pos)
+            SELECT created, id FROM freed WHERE freed >= ? ORDER BY pos LIMIT 1
+        """, (excess,)).fetchone()
+
+    def _referenced_bytes(self) -> int:
+        row = self._db.execute(
+            "SELECT COALESCE(SUM(stored), 0) FROM blobs WHERE digest IN (SELECT digest FROM artifacts)").fetchone()
+        return row[0]
+
+    # -----------------------------
+    # lifecycle
+    # -----------------------------
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            keys, logical = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM artifacts a JOIN blobs b ON a.digest = b.digest"
+            ).fetchone()
+            blobs, stored = self._db.execute("SELECT COUNT(*), COALESCE(SUM(stored), 0) FROM blobs").fetchone()
+        return dict(self.counts, io_seconds=round(self.counts["io_seconds"], 3), keys=keys, blobs=blobs,
+                    logical_bytes=logical, stored_bytes=stored, codec=self.codec,
+                    max_bytes=self.max_bytes, max_age_seconds=self.max_age_seconds)
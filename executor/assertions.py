@@ -0,0 +1,93 @@
+"""
+Assertion steps, evaluated inside the browser with auto-waiting (Playwright's
+`expect`), so only the outcome crosses the CDP connection instead of the whole
+serialized DOM.
+
+    {"action": "assert_text",      "target": {"type": "selector", "value": "#total"}, "value": "$42.00"}
+    {"action": "assert_visible",   "target": {"type": "selector", "value": ".toast"}}
+    {"action": "assert_hidden",    "target": {"type": "selector", "value": ".spinner"}}
+    {"action": "assert_count",     "target": {"type": "selector", "value": ".cart li"}, "value": "3"}
+    {"action": "assert_attribute", "target": {"type": "selector", "value": "#buy", "attribute": "aria-disabled"},
+     "value": "false"}
+    {"action": "assert_url",       "value": "/checkout/done"}
+    {"action": "assert_title",     "value": "re:^Order #\\d+"}
+
+Expected strings match as substrings; prefix with `re:` for a regular expression.
+A target of type "text" is located with get_by_text(); anything else is a
+Playwright selector. The legacy `assert` (value somewhere in the page) is also
+checked in the page: it polls the body's text until the step's timeout, then
+checks the serialized HTML once, for values that only appear in markup or
+attributes.
+"""
+
+import re
+from typing import Any, Dict, Optional
+
+from playwright.async_api import expect
+
+ASSERT_ACTIONS = ("assert", "assert_text", "assert_visible", "assert_hidden", "assert_count",
+                  "assert_attribute", "assert_url", "assert_title")
+
+# textContent reads the text nodes; outerHTML re-serializes the whole document on every call
+_TEXT_CONTAINS = "text => !!document.body && document.body.textContent.includes(text)"
+_HTML_CONTAINS = "text => document.documentElement.outerHTML.includes(text)"
+
+
+def expected_pattern(value: Optional[str]):
+    value = value or ""
+    if value.startswith("re:"):
+        return re.compile(value[3:])
+    return re.compile(re.escape(value))
+
+
+def locator_for(page, target: Dict[str, Any]):
+    if target.get("type") == "text":
+        return page.get_by_text(target.get("value") or "")
+    return page.locator(target.get("value") or "")
+
+
+async def html_contains(page, text: str) -> bool:
+    try:
+        return bool(await page.evaluate(_HTML_CONTAINS, text))
+    except Exception:
+        return False
+
+
+async def run_assertion(page, action: str, target: Optional[Dict[str, Any]], value: Optional[str],
+                        timeout_ms: Optional[int]):
+    """Raise AssertionError unless the assertion holds within timeout_ms."""
+    target = target or {}
+    try:
+        if action == "assert":
+            text = target.get("value") or ""
+            try:
+                await page.wait_for_function(_TEXT_CONTAINS, arg=text, polling=100, timeout=timeout_ms)
+            except Exception:
+                if not await html_contains(page, text):
+                    raise AssertionError(f"Assertion failed: {text} not found in page content")
+        elif action == "assert_url":
+            await expect(page).to_have_url(expected_pattern(value), timeout=timeout_ms)
+        elif action == "assert_title":
+            await expect(page).to_have_title(expected_pattern(value), timeout=timeout_ms)
+        elif action == "assert_count":
+            await expect(locator_for(page, target)).to_have_count(int(value or 0), timeout=timeout_ms)
+        else:
+            locator = locator_for(page, target).first
+            if action == "assert_text":
+                await expect(locator).to_contain_text(expected_pattern(value), timeout=timeout_ms)
+            elif action == "assert_visible":
+                await expect(locator).to_be_visible(timeout=timeout_ms)
+            elif action == "assert_hidden":
+                await expect(locator).to_be_hidden(timeout=timeout_ms)
+            elif action == "assert_attribute":
+                name = target.get("attribute")
+                if not name:
+                    raise ValueError("assert_attribute needs target.attribute")
+                await expect(locator).to_have_attribute(name, expected_pattern(value), timeout=timeout_ms)
+    except AssertionError as e:
+        if str(e).startswith("Assertion failed"):
+            raise
+        # expect() messages carry a long call log; the first line says what didn't match
+        first = (str(e).strip().splitlines() or [""])[0]
+        subject = target.get("value") or value
+        raise AssertionError(f"Assertion failed: {action} {subject!r}: {first}")
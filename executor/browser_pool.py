@@ -0,0 +1,252 @@
+"""
+Warm Chromium browser pool for the executor.
+
+One long-lived Playwright instance owns `size` pre-launched browsers. Every run
+gets a fresh, isolated BrowserContext from the least-loaded healthy browser, so
+the per-run cost is a `new_context()` instead of a full browser launch.
+
+- Each browser hosts at most `contexts_per_browser` concurrent contexts.
+- A browser is recycled (closed and relaunched) after serving `recycle_after`
+  contexts, or as soon as it disconnects/crashes. A failed relaunch is retried
+  with exponential backoff; a slot still missing after `relaunch_attempts` is
+  reported as lost in `stats()`.
+- `stats()` exposes occupancy and acquire wait times.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Set
+
+from playwright.async_api import async_playwright
+
+
+class _PooledBrowser:
+    def __init__(self, browser):
+        self.browser = browser
+        self.active = 0
+        self.served = 0
+        self.retiring = False
+        self.dead = False
+
+    @property
+    def healthy(self) -> bool:
+        return not self.dead and self.browser.is_connected()
+
+
+class BrowserPool:
+    def __init__(self, size: int = 2, contexts_per_browser: int = 4, recycle_after: int = 50,
+                 launch_options: Optional[Dict[str, Any]] = None, relaunch_attempts: int = 5,
+                 relaunch_backoff: float = 0.5):
+        self.size = max(1, size)
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self.recycle_after = max(1, recycle_after)
+        self.launch_options = launch_options or {"headless": True}
+        self.relaunch_attempts = max(1, relaunch_attempts)
+        self.relaunch_backoff = relaunch_backoff
+
+        self._playwright = None
+        self._browsers: List[_PooledBrowser] = []
+        self._cond = asyncio.Condition()
+        self._start_lock = asyncio.Lock()
+        self._started = False
+        self._replacing = 0
+        self._replace_tasks: Set[asyncio.Task] = set()
+
+        # stats
+        self._waiting = 0
+        self._acquired = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recycled = 0
+        self._crashed = 0
+        self._relaunch_failures = 0
+        self._lost = 0
+
+    # -----------------------------
+    # lifecycle
+    # -----------------------------
+
+    async def start(self):
+        async with self._start_lock:
+            if self._started:
+                return
+            self._playwright = await async_playwright().start()
+            self._browsers = list(await asyncio.gather(*(self._launch() for _ in range(self.size))))
+            self._started = True
+
+    async def stop(self):
+        async with self._start_lock:
+            if not self._started:
+                return
+            self._started = False
+            # a relaunch finishing after playwright stops would leak its browser
+            for task in list(self._replace_tasks):
+                task.cancel()
+            await asyncio.gather(*self._replace_tasks, return_exceptions=True)
+            for entry in self._browsers:
+                try:
+                    await entry.browser.close()
+                except Exception:
+                    pass
+            self._browsers = []
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _launch(self) -> _PooledBrowser:
+        browser = await self._playwright.chromium.launch(**self.launch_options)
+        entry = _PooledBrowser(browser)
+        browser.on("disconnected", lambda _: self._on_disconnected(entry))
+        return entry
+
+    def _on_disconnected(self, entry: _PooledBrowser):
+        if entry.dead or entry.retiring or not self._started:
+            return
+        entry.dead = True
+        self._crashed += 1
+        if entry.active == 0:
+            self._schedule_replace(entry)
+
+    def _schedule_replace(self, entry: _PooledBrowser):
+        if entry not in self._browsers:
+            return
+        self._browsers.remove(entry)
+        self._replacing += 1
+        task = asyncio.get_running_loop().create_task(self._replace(entry))
+        self._replace_tasks.add(task)
+        task.add_done_callback(self._replace_tasks.discard)
+
+    async def _replace(self, old: _PooledBrowser):
+        try:
+            try:
+                await old.browser.close()
+            except Exception:
+                pass
+            for attempt in range(self.relaunch_attempts):
+                if not self._started:
+                    return
+                try:
+                    new = await self._launch()
+                except Exception as e:
+                    self._relaunch_failures += 1
+                    print(f"[BrowserPool] relaunch failed (attempt {attempt + 1}/{self.relaunch_attempts}): {e}")
+                    if attempt + 1 < self.relaunch_attempts:
+                        await asyncio.sleep(min(30.0, self.relaunch_backoff * (2 ** attempt)))
+                    continue
+                if self._started:
+                    self._browsers.append(new)
+                else:
+                    await new.browser.close()
+                return
+            self._lost += 1
+            print(f"[BrowserPool] gave up relaunching a browser; {len(self._browsers)} of {self.size} left")
+        finally:
+            self._replacing -= 1
+            async with self._cond:
+                self._cond.notify_all()
+
+    # -----------------------------
+    # acquire / release
+    # -----------------------------
+
+    def _pick(self) -> Optional[_PooledBrowser]:
+        candidates = [
+            b for b in self._browsers
+            if b.healthy and not b.retiring and b.active < self.contexts_per_browser
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda b: b.active)
+
+    async def acquire(self, **context_options):
+        """Reserve a slot and open a context on it. Returns (entry, context);
+        hand both back to `release()` when done."""
+        await self.start()
+
+        started = time.monotonic()
+        self._waiting += 1
+        try:
+            async with self._cond:
+                while True:
+                    entry = self._pick()
+                    if entry is not None:
+                        break
+                    if not self._browsers and not self._replacing:
+                        # every browser failed to relaunch; try once more inline
+                        self._browsers.append(await self._launch())
+                        self._lost = max(0, self._lost - 1)
+                        continue
+                    await self._cond.wait()
+                entry.active += 1
+                entry.served += 1
+                if entry.served >= self.recycle_after:
+                    entry.retiring = True
+        finally:
+            self._waiting -= 1
+
+        waited = time.monotonic() - started
+        self._acquired += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+        try:
+            context = await entry.browser.new_context(**context_options)
+        except BaseException:
+            await self.release(entry, None)
+            raise
+        return entry, context
+
+    async def release(self, entry: _PooledBrowser, context):
+        """Close the context (flushing HAR etc.) and free its slot."""
+        if context is not None:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        entry.active -= 1
+        if not entry.browser.is_connected():
+            entry.dead = True
+        if (entry.retiring or entry.dead) and entry.active == 0:
+            if entry.retiring and not entry.dead:
+                self._recycled += 1
+            self._schedule_replace(entry)
+        async with self._cond:
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        """Yield a fresh BrowserContext; it is closed (flushing HAR etc.) on exit."""
+        entry, context = await self.acquire(**context_options)
+        try:
+            yield context
+        finally:
+            await self.release(entry, context)
+
+    # -----------------------------
+    # stats
+    # -----------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        in_use = sum(b.active for b in self._browsers)
+        capacity = len(self._browsers) * self.contexts_per_browser
+        return {
+            "started": self._started,
+            "browsers": len(self._browsers),
+            "browsers_replacing": self._replacing,
+            "contexts_per_browser": self.contexts_per_browser,
+            "capacity": capacity,
+            "in_use": in_use,
+            "occupancy": (in_use / capacity) if capacity else 0.0,
+            "waiting": self._waiting,
+            "acquired_total": self._acquired,
+            "wait_avg_ms": (self._wait_total / self._acquired * 1000) if self._acquired else 0.0,
+            "wait_max_ms": self._wait_max * 1000,
+            "recycled_total": self._recycled,
+            "crashed_total": self._crashed,
+            "relaunch_failures_total": self._relaunch_failures,
+            "browsers_lost": self._lost,
+            "per_browser": [
+                {"active": b.active, "served": b.served, "retiring": b.retiring, "healthy": b.healthy}
+                for b in self._browsers
+            ],
+        }
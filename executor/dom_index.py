@@ -0,0 +1,111 @@
+"""
+Compact index of a page's interactive elements, written next to the DOM snapshot
+when a step fails so the agent's repairer doesn't have to parse raw HTML.
+
+    {"url": ..., "title": ..., "count": 412, "truncated": false,
+     "elements": [{"tag": "button", "role": "button", "name": "Log in", "text": "Log in",
+                   "id": "login-btn", "classes": ["btn", "primary"], "testid": "login",
+                   "testid_attr": "data-testid", "type": "submit", "css": "#login-form > button",
+                   "visible": true}, ...],
+     "target_count": 0}
+
+The walk runs inside the page in one evaluate() call, so its cost does not
+depend on how large the serialized HTML is.
+"""
+
+from typing import Any, Dict, Optional
+
+MAX_ELEMENTS = 3000
+MAX_TEXT = 80
+
+INTERACTIVE = ", ".join([
+    "a[href]", "button", "input:not([type=hidden])", "select", "textarea", "summary", "label",
+    "[role=button]", "[role=link]", "[role=checkbox]", "[role=radio]", "[role=switch]", "[role=tab]",
+    "[role=menuitem]", "[role=option]", "[role=textbox]", "[role=combobox]", "[onclick]",
+    "[contenteditable='']", "[contenteditable=true]", "[tabindex]:not([tabindex='-1'])",
+])
+
+TESTID_ATTRS = ["data-testid", "data-test-id", "data-test", "data-qa", "data-cy"]
+
+_SCRIPT = """
+([selector, testidAttrs, maxElements, maxText]) => {
+  const clip = (s) => (s || "").replace(/\\s+/g, " ").trim().slice(0, maxText);
+  const idCount = new Map();
+  for (const el of document.querySelectorAll("[id]")) idCount.set(el.id, (idCount.get(el.id) || 0) + 1);
+  const implicitRole = (el) => {
+    const tag = el.tagName.toLowerCase();
+    if (tag === "a") return "link";
+    if (tag === "button" || tag === "summary") return "button";
+    if (tag === "select") return "combobox";
+    if (tag === "textarea") return "textbox";
+    if (tag === "input") {
+      const t = (el.getAttribute("type") || "text").toLowerCase();
+      if (["button", "submit", "reset", "image"].includes(t)) return "button";
+      if (t === "checkbox" || t === "radio") return t;
+      return "textbox";
+    }
+    return "";
+  };
+  const accessibleName = (el) => {
+    const label = el.getAttribute("aria-label");
+    if (label) return label;
+    const by = el.getAttribute("aria-labelledby");
+    if (by) {
+      const text = by.split(/\\s+/).map((id) => document.getElementById(id)).filter(Boolean)
+        .map((n) => n.textContent).join(" ");
+      if (text.trim()) return text;
+    }
+    if (el.labels && el.labels.length) return el.labels[0].textContent;
+    return el.getAttribute("alt") || el.getAttribute("title") || el.getAttribute("placeholder")
+      || (el.tagName === "INPUT" ? el.value : el.textContent);
+  };
+  const cssPath = (el) => {
+    const parts = [];
+    for (let n = el; n && n.nodeType === 1 && n !== document.documentElement; n = n.parentElement) {
+      if (n.id && idCount.get(n.id) === 1) { parts.unshift("#" + CSS.escape(n.id)); break; }
+      let part = n.tagName.toLowerCase(), index = 1, same = 0;
+      for (const s of n.parentElement ? n.parentElement.children : []) {
+        if (s.tagName !== n.tagName) continue;
+        same++;
+        if (s === n) index = same;
+      }
+      if (same > 1) part += `:nth-of-type(${index})`;
+      parts.unshift(part);
+    }
+    return parts.join(" > ");
+  };
+  const nodes = document.querySelectorAll(selector);
+  const elements = [];
+  for (const el of nodes) {
+    if (elements.length >= maxElements) break;
+    const testidAttr = testidAttrs.find((a) => el.hasAttribute(a)) || null;
+    elements.push({
+      tag: el.tagName.toLowerCase(),
+      role: el.getAttribute("role") || implicitRole(el),
+      name: clip(accessibleName(el)),
+      text: clip(el.textContent),
+      id: el.id || null,
+      classes: Array.from(el.classList).slice(0, 8),
+      testid: testidAttr ? el.getAttribute(testidAttr) : null,
+      testid_attr: testidAttr,
+      type: el.getAttribute("type"),
+      css: cssPath(el),
+      visible: !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length),
+    });
+  }
+  return {url: location.href, title: document.title, count: nodes.length,
+          truncated: nodes.length > elements.length, elements};
+}
+"""
+
+
+async def build_dom_index(page, target: Optional[str] = None) -> Dict[str, Any]:
+    """Index the page; with the failed step's selector, also record how many elements
+    it matches now (0 means the selector is broken, not just slow)."""
+    index = await page.evaluate(_SCRIPT, [INTERACTIVE, TESTID_ATTRS, MAX_ELEMENTS, MAX_TEXT])
+    if target:
+        try:
+            index["target_count"] = await page.locator(target).count()
+        except Exception:
+            index["target_count"] = None  # not a valid selector for Playwright
+    return index
@@ -5,7 +5,47 @@ This replaces the TypeScript MCP adapter with a Python service for easier integr
 
 Endpoints:
 - POST /exec: accepts { run_id, test_ir } and executes via Playwright.
-- Optionally saves screenshots, DOM snapshot, HAR file under ./artifacts.
+- GET /pool/stats: browser pool occupancy and wait-time stats.
+- Failed runs sent with keep_session return a session_id + failed_step_index; POST /exec with
+  that session_id and only the (patched) remaining steps resumes on the same page
+  (EXECUTOR_SESSION_LEASE_SECONDS); DELETE /sessions/{id} ends the lease early.
+- TestIR.meta.prefix_cache reuses cookies/localStorage + URL reached by common leading
+  steps (e.g. login) across tests; results list the steps served from cache (see prefix_cache.py).
+- TestIR.meta.network blocks resource types/domains, stubs URLs and picks the HAR mode
+  (off / on_failure / full) for the run (see network_policy.py).
+- TestIR.meta.replay serves requests from a recorded HAR or the shared content-addressed
+  replay cache (EXECUTOR_REPLAY_DIR, filled via POST /replay/ingest); see replay_cache.py.
+- Every result carries step_timings: per-step latency keyed by (url_pattern, action, selector),
+  which the agent aggregates into adaptive timeouts.
+- The agent's X-Trace-Id header is echoed in the result's `trace` together with spans for
+  context open, steps, DOM snapshot/index, lease and context close (HAR flush).
+- X-Deadline-Ms (the caller's timeout for this attempt) bounds the run; on expiry the browser work is
+  cancelled, the context closed and /exec answers 504 deadline_exceeded.
+- GET /metrics: Prometheus text format (HTTP/run/step latency histograms, in-flight gauges).
+- On a failed step, besides the DOM snapshot ({run}_dom.json), writes a compact index of the
+  page's interactive elements ({run}_dom_index.json, artifacts.dom_index_key; see dom_index.py)
+  that the agent ranks replacement selectors against.
+- TestIR.meta.matrix runs the test once per data row ({{var}} placeholders in step values and
+  targets), each row in its own context from the warm pool, with bounded concurrency
+  (EXECUTOR_MATRIX_CONCURRENCY); results are aggregated per row under `matrix` (see matrix.py).
+- Assertions (assert, assert_text/visible/hidden/count/attribute/url/title) run in the page
+  with auto-waiting; only the outcome crosses the wire (see assertions.py).
+- assert_screenshot compares the page (or target element) with a named baseline
+  (EXECUTOR_BASELINE_DIR): byte/pixel/perceptual-hash short cuts, then a NumPy tile diff with
+  ignore masks in a process pool (EXECUTOR_VISUAL_WORKERS); mismatches store a heatmap
+  (artifacts.visual_diffs) and each comparison is listed under `visual` (see visual.py).
+- Screenshots, DOM snapshots/indexes and HARs go to a content-addressed store under
+  ./artifacts/store (see artifact_store.py): identical content is kept once, text is
+  compressed, writes run on a worker pool, and size/age retention runs in the background
+  (EXECUTOR_ARTIFACT_MAX_MB, EXECUTOR_ARTIFACT_MAX_AGE_HOURS). `artifacts.*_key` values are
+  store keys: GET /artifacts/{key} (Range requests supported), GET /artifacts/stats.
+- TestIR.meta.perf / meta.budgets: Web Vitals read after every goto plus a streaming pass over
+  the run's HAR (bytes by resource type, timing breakdowns, slowest endpoints) under `perf`;
+  an exceeded budget (e.g. lcp_ms 2500, script_kb 500) fails the run (see perf.py).
+
+Browsers are kept warm in a BrowserPool (see browser_pool.py); each run gets a fresh
+isolated context. Tune with EXECUTOR_POOL_SIZE, EXECUTOR_CONTEXTS_PER_BROWSER and
+EXECUTOR_RECYCLE_AFTER.
 
 Requirements:
     pip install fastapi uvicorn playwright
@@ -17,22 +57,102 @@ Run:
 This service can be called by the Agent (agent_server.py) at EXECUTOR_URL.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Response
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
 import asyncio
+import multiprocessing
 import os
 import json
+import re
+import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-from playwright.async_api import async_playwright
+from artifact_store import ArtifactStore
+from browser_pool import BrowserPool
+from dom_index import build_dom_index
+from assertions import ASSERT_ACTIONS, locator_for, run_assertion
+from session_store import SessionStore
+from prefix_cache import PrefixCache, cache_options
+from matrix import expand as expand_matrix, matrix_options
+from network_policy import NetworkPolicy
+from replay_cache import ReplayCache, ReplayPolicy
+from perf import analyze_har, budget_error, check_budgets, collect_vitals, perf_options, summarize
+from visual import BaselineStore, compare_with_baseline, image_hashes, visual_options
+from tracing import (PROMETHEUS_CONTENT_TYPE, TRACE_HEADER, Registry, Trace, current_trace,
+                     instrument_app, reset_trace, span, use_trace)
 
 app = FastAPI(title="Python MCP Executor PoC")
 
 ARTIFACT_DIR = os.path.abspath("./artifacts")
 os.makedirs(ARTIFACT_DIR, exist_ok=True)
 
+POOL_SIZE = int(os.getenv("EXECUTOR_POOL_SIZE", "2"))
+CONTEXTS_PER_BROWSER = int(os.getenv("EXECUTOR_CONTEXTS_PER_BROWSER", "4"))
+RECYCLE_AFTER = int(os.getenv("EXECUTOR_RECYCLE_AFTER", "50"))
+SESSION_LEASE_SECONDS = float(os.getenv("EXECUTOR_SESSION_LEASE_SECONDS", "60"))
+MAX_LEASED_SESSIONS = int(os.getenv("EXECUTOR_MAX_LEASED_SESSIONS", "4"))
+PREFIX_CACHE_TTL = float(os.getenv("EXECUTOR_PREFIX_CACHE_TTL", "300"))
+PREFIX_CACHE_SIZE = int(os.getenv("EXECUTOR_PREFIX_CACHE_SIZE", "100"))
+REPLAY_DIR = os.getenv("EXECUTOR_REPLAY_DIR", os.path.join(ARTIFACT_DIR, "replay"))
+# data-driven runs: rows in flight per request (default: the pool's context capacity), rows per request
+MATRIX_CONCURRENCY = int(os.getenv("EXECUTOR_MATRIX_CONCURRENCY", str(POOL_SIZE * CONTEXTS_PER_BROWSER)))
+MATRIX_MAX_ROWS = int(os.getenv("EXECUTOR_MATRIX_MAX_ROWS", "500"))
+# artifact store: retention limits, pool threads for hashing/compression/disk, codec (zstd|gzip|none)
+ARTIFACT_MAX_BYTES = int(float(os.getenv("EXECUTOR_ARTIFACT_MAX_MB", "5120")) * 1024 * 1024)
+ARTIFACT_MAX_AGE_SECONDS = float(os.getenv("EXECUTOR_ARTIFACT_MAX_AGE_HOURS", "168")) * 3600
+ARTIFACT_WORKERS = int(os.getenv("EXECUTOR_ARTIFACT_WORKERS", "4"))
+ARTIFACT_CODEC = os.getenv("EXECUTOR_ARTIFACT_CODEC") or None
+ARTIFACT_GC_SECONDS = float(os.getenv("EXECUTOR_ARTIFACT_GC_SECONDS", "600"))
+# a HAR is moved into the store right after its context closes; one left in ARTIFACT_DIR this long is stray
+STRAY_HAR_SECONDS = float(os.getenv("EXECUTOR_STRAY_HAR_SECONDS", "3600"))
+# visual regression: baselines, worker processes for screenshot comparison
+BASELINE_DIR = os.getenv("EXECUTOR_BASELINE_DIR", os.path.join(ARTIFACT_DIR, "baselines"))
+VISUAL_WORKERS = int(os.getenv("EXECUTOR_VISUAL_WORKERS", "2"))
+# answer this much before the caller's deadline so the reply still reaches it
+DEADLINE_MARGIN_SECONDS = 1.0
+
+browser_pool = BrowserPool(
+    size=POOL_SIZE,
+    contexts_per_browser=CONTEXTS_PER_BROWSER,
+    recycle_after=RECYCLE_AFTER,
+)
+session_store = SessionStore(browser_pool, lease_seconds=SESSION_LEASE_SECONDS, max_sessions=MAX_LEASED_SESSIONS)
+prefix_cache = PrefixCache(ttl_seconds=PREFIX_CACHE_TTL, max_entries=PREFIX_CACHE_SIZE)
+replay_cache = ReplayCache(REPLAY_DIR)
+_har_replays: Dict[Any, ReplayCache] = {}  # (path, mtime) or blob digest -> in-memory cache of one HAR
+artifact_store = ArtifactStore(os.path.join(ARTIFACT_DIR, "store"), max_bytes=ARTIFACT_MAX_BYTES,
+                               max_age_seconds=ARTIFACT_MAX_AGE_SECONDS, workers=ARTIFACT_WORKERS,
+                               codec=ARTIFACT_CODEC)
+_artifact_gc: Optional[asyncio.Task] = None
+baseline_store = BaselineStore(BASELINE_DIR)
+_visual_pool: Optional[ProcessPoolExecutor] = None
+
+# Prometheus metrics
+metrics = Registry()
+instrument_app(app, metrics, "executor")
+RUNS_IN_FLIGHT = metrics.gauge("executor_runs_in_flight", "Test runs currently executing")
+RUN_SECONDS = metrics.histogram("executor_run_seconds", "Wall time of a run", ("status",))
+STEP_SECONDS = metrics.histogram("executor_step_seconds", "Step latency", ("action", "ok"))
+CONTEXT_OPEN_SECONDS = metrics.histogram("executor_context_open_seconds", "Pool acquire + new context + new page")
+CONTEXT_CLOSE_SECONDS = metrics.histogram("executor_context_close_seconds", "Context close, including HAR flush")
+DOM_SNAPSHOT_SECONDS = metrics.histogram("executor_dom_snapshot_seconds", "DOM snapshot on failure")
+metrics.gauge("executor_pool_contexts_in_use", "Browser contexts in use", fn=lambda: browser_pool.stats()["in_use"])
+metrics.gauge("executor_pool_waiting", "Runs waiting for a browser context", fn=lambda: browser_pool.stats()["waiting"])
+metrics.gauge("executor_pool_browsers_lost", "Browser slots that could not be relaunched",
+              fn=lambda: browser_pool.stats()["browsers_lost"])
+ARTIFACT_WAIT_SECONDS = metrics.histogram("executor_artifact_wait_seconds",
+                                         "Time a run waits for its artifact writes to finish")
+VISUAL_COMPARE_SECONDS = metrics.histogram("executor_visual_compare_seconds",
+                                           "Screenshot vs. baseline comparison", ("stage",))
+HAR_ANALYZE_SECONDS = metrics.histogram("executor_har_analyze_seconds", "Streaming pass over a run's HAR")
+BUDGET_VIOLATIONS = metrics.counter("executor_perf_budget_violations_total", "Exceeded performance budgets",
+                                    ("metric",))
+metrics.gauge("executor_sessions_leased", "Failed-run sessions kept for resume", fn=lambda: len(session_store.sessions))
+
 # -----------------------------
 # Data models
 # -----------------------------
@@ -52,78 +172,507 @@ class TestIR(BaseModel):
 class ExecRequest(BaseModel):
     run_id: str
     test_ir: TestIR
+    session_id: Optional[str] = None  # resume a failed run's session with these steps
+    keep_session: bool = False  # lease the context on failure (the agent is about to retry)
+
+class IngestRequest(BaseModel):
+    har: List[str]  # artifact store keys (artifacts.har_key), or paths under the artifact dir
 
 class ExecResponse(BaseModel):
     run_id: str
     status: str
     artifacts: Optional[Dict[str, Any]] = {}
     error: Optional[str] = None
+    cached_steps: Optional[List[int]] = None
+    prefix_cache: Optional[Dict[str, Any]] = None
+    network: Optional[Dict[str, Any]] = None
+    replay: Optional[Dict[str, Any]] = None
+    step_timings: Optional[List[Dict[str, Any]]] = None
+    trace: Optional[Dict[str, Any]] = None
+    matrix: Optional[Dict[str, Any]] = None
+    visual: Optional[List[Dict[str, Any]]] = None
+    perf: Optional[Dict[str, Any]] = None
 
 # -----------------------------
 # Core execution logic
 # -----------------------------
 
-async def execute_test_ir(run_id: str, test_ir: TestIR) -> Dict[str, Any]:
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F-]{16,}|[0-9a-zA-Z_-]{24,})$")
+
+def url_pattern(url: Optional[str]) -> str:
+    """host + path with id-like segments collapsed, e.g. shop.test/orders/:id"""
+    if not url or "://" not in url:
+        return url or ""
+    rest = url.split("://", 1)[1].split("#", 1)[0].split("?", 1)[0]
+    host, _, path = rest.partition("/")
+    segments = [":id" if _ID_SEGMENT.match(seg) else seg for seg in path.split("/") if seg]
+    return "/".join([host.lower()] + segments)
+
+def record_step(result: Dict[str, Any], timing: Dict[str, Any], started: float, ok: bool):
+    elapsed = time.monotonic() - started
+    timing.update(ms=round(elapsed * 1000, 1), ok=ok)
+    result.setdefault("step_timings", []).append(timing)
+    STEP_SECONDS.labels(action=timing["action"], ok=str(ok).lower()).observe(elapsed)
+    trace = current_trace()
+    if trace is not None:
+        trace.add("step", started, elapsed, index=timing["index"], action=timing["action"], ok=ok)
+
+_LIST_ARTIFACTS = ("screenshots", "visual_diffs")
+
+def save_artifact(result: Dict[str, Any], field: str, key: str, write):
+    """Record `key` under result.artifacts[field] (a list for screenshots and visual diffs)
+    and let the store write it in the background; finish_artifacts() waits for the writes."""
+    if field in _LIST_ARTIFACTS:
+        result["artifacts"].setdefault(field, []).append(key)
+    else:
+        result["artifacts"][field] = key
+    result.setdefault("_artifact_writes", []).append((field, key, asyncio.ensure_future(write)))
+
+async def finish_artifacts(result: Dict[str, Any]):
+    """Wait for the run's artifact writes; drop keys whose write failed."""
+    writes = result.pop("_artifact_writes", None)
+    if not writes:
+        return
+    with span("artifact_writes", ARTIFACT_WAIT_SECONDS, count=len(writes)):
+        outcomes = await asyncio.gather(*(w for _, _, w in writes), return_exceptions=True)
+    for (field, key, _), outcome in zip(writes, outcomes):
+        if isinstance(outcome, BaseException):
+            print(f"[ArtifactStore] write {key} failed: {outcome}")
+            if field in _LIST_ARTIFACTS:
+                result["artifacts"][field].remove(key)
+            elif result["artifacts"].get(field) == key:
+                del result["artifacts"][field]
+
+def visual_pool() -> ProcessPoolExecutor:
+    global _visual_pool
+    if _visual_pool is None:
+        # spawn: the service runs threads (artifact pool), which don't mix with fork
+        _visual_pool = ProcessPoolExecutor(max_workers=max(1, VISUAL_WORKERS),
+                                           mp_context=multiprocessing.get_context("spawn"))
+    return _visual_pool
+
+# document-relative boxes, so they line up with full-page screenshots
+_BOXES = "els => els.map(e => { const r = e.getBoundingClientRect(); return [r.x + scrollX, r.y + scrollY, r.width, r.height]; })"
+
+async def visual_assert(page, step: Step, target: Dict[str, Any], result: Dict[str, Any], artifact_prefix: str,
+                        test_ir: Optional[TestIR]):
+    """assert_screenshot: compare against the named baseline (recording it on first use
+    or with `update`) and raise AssertionError on a mismatch."""
+    if not step.value:
+        raise ValueError("assert_screenshot needs a baseline name in value")
+    opts = visual_options(test_ir.meta if test_ir else None, target)
+    name = f"{test_ir.test_id if test_ir else '_'}/{step.value}"
+    shot_options = {"animations": "disabled", "caret": "hide", "timeout": step.timeout_ms}
+    origin = (0, 0)
+    if target.get("value"):
+        locator = locator_for(page, target).first
+        png = await locator.screenshot(**shot_options)
+        origin = tuple((await locator.evaluate_all(_BOXES))[0][:2])
+    else:
+        png = await page.screenshot(full_page=True, **shot_options)
+    # ignore rects are in screenshot pixels; masked elements are measured in CSS pixels
+    scale = await page.evaluate("devicePixelRatio") if opts["mask"] else 1
+    rects = [list(r) for r in opts["ignore"]]
+    for selector in opts["mask"]:
+        for x, y, w, h in await page.locator(selector).evaluate_all(_BOXES):
+            rects.append([(x - origin[0]) * scale, (y - origin[1]) * scale, w * scale, h * scale])
+
+    loop = asyncio.get_running_loop()
+    entry = {"name": step.value, "baseline": name}
+    baseline = baseline_store.get(name)
+    if baseline is None or opts["update"]:
+        hashes = await loop.run_in_executor(visual_pool(), image_hashes, png)
+        await asyncio.to_thread(baseline_store.put, name, png, hashes)
+        entry.update(status="baseline_updated" if baseline else "baseline_created",
+                     size=[hashes["width"], hashes["height"]])
+        result.setdefault("visual", []).append(entry)
+        return
+
+    with span("visual_compare", baseline=step.value) as attrs:
+        started = time.monotonic()
+        res = await loop.run_in_executor(visual_pool(), compare_with_baseline, baseline["path"], png, rects,
+                                         opts, baseline)
+        VISUAL_COMPARE_SECONDS.labels(stage=res["stage"]).observe(time.monotonic() - started)
+        attrs.update(stage=res["stage"], passed=res["passed"])
+    heat = res.pop("heatmap")
+    entry.update(res, status="passed" if res["passed"] else "failed")
+    result.setdefault("visual", []).append(entry)
+    if res["passed"]:
+        return
+    stem = artifact_prefix + "_" + re.sub(r"[^\w.-]+", "_", step.value)
+    entry["actual_key"] = f"{stem}_actual.png"
+    save_artifact(result, "screenshots", entry["actual_key"], artifact_store.put(entry["actual_key"], png, "image/png"))
+    if heat:
+        entry["diff_key"] = f"{stem}_diff.png"
+        save_artifact(result, "visual_diffs", entry["diff_key"], artifact_store.put(entry["diff_key"], heat, "image/png"))
+    raise AssertionError(
+        f"Visual mismatch: {step.value}: {res['diff_ratio']:.3%} of pixels differ "
+        f"(limit {float(opts['max_diff_ratio']):.3%}), {res['failed_tiles']} tile(s) over "
+        f"{float(opts['max_tile_ratio']):.0%} changed")
+
+async def run_steps(page, steps: List[Step], result: Dict[str, Any], artifact_prefix: str,
+                    start: int = 0, stop: Optional[int] = None, test_ir: Optional[TestIR] = None) -> Optional[int]:
+    """Run steps[start:stop] in order on page; on the first failure record it in
+    result and return its index in `steps` (None when every step passed)."""
+    stop = len(steps) if stop is None else stop
+    for index in range(start, stop):
+        step = steps[index]
+        action = step.action.lower()
+        target = step.target or {}
+        ttype = target.get("type")
+        tval = target.get("value")
+        timing = {
+            "index": index,
+            "action": action,
+            "selector": None if action == "goto" else tval,
+            "url_pattern": url_pattern(tval if action == "goto" else page.url),
+        }
+        started = time.monotonic()
+        try:
+
+            if action == "goto":
+                await page.goto(tval, timeout=step.timeout_ms)
+                if test_ir is not None and perf_options(test_ir.meta) is not None:
+                    vitals = await collect_vitals(page)
+                    if vitals:
+                        result.setdefault("perf", {}).setdefault("navigations", []).append(vitals)
+            elif action == "click":
+                await page.click(tval, timeout=step.timeout_ms)
+            elif action == "type":
+                await page.fill(tval, step.value or "", timeout=step.timeout_ms)
+            elif action == "waitfor":
+                await page.wait_for_selector(tval, timeout=step.timeout_ms)
+            elif action in ASSERT_ACTIONS:
+                await run_assertion(page, action, target, step.value, step.timeout_ms)
+            elif action == "assert_screenshot":
+                await visual_assert(page, step, target, result, artifact_prefix, test_ir)
+            elif action == "screenshot":
+                # the browser hands back encoded PNG bytes; hashing and disk I/O happen off the loop
+                png = await page.screenshot(full_page=True)
+                key = f"{artifact_prefix}_step_{uuid.uuid4().hex[:6]}.png"
+                save_artifact(result, "screenshots", key, artifact_store.put(key, png, "image/png"))
+            else:
+                print(f"[WARN] Unknown action: {action}")
+            record_step(result, timing, started, True)
+
+        except Exception as step_err:
+            record_step(result, timing, started, False)
+            # Capture DOM snapshot and add failure record (serialized and stored on the artifact pool)
+            try:
+                with span("dom_snapshot", DOM_SNAPSHOT_SECONDS):
+                    dom_content = await page.content()
+                key = f"{artifact_prefix}_dom.json"
+                save_artifact(result, "dom_snapshot_key", key, artifact_store.put_json(key, {"html": dom_content}))
+            except Exception as e:
+                print(f"DOM snapshot failed: {e}")
+            try:
+                with span("dom_index"):
+                    dom_index = await build_dom_index(page, None if action == "goto" else tval)
+                key = f"{artifact_prefix}_dom_index.json"
+                save_artifact(result, "dom_index_key", key, artifact_store.put_json(key, dom_index))
+            except Exception as e:
+                print(f"DOM index failed: {e}")
+
+            result.update({
+                "status": "failed",
+                "error": str(step_err),
+                "failed_step": step.dict(),
+                "failed_step_index": index,
+                "failed_step_url": page.url,
+            })
+            return index
+    return None
+
+def artifact_path(path: str) -> str:
+    """Resolve a client-supplied path, refusing anything outside the artifact dir."""
+    full = os.path.abspath(os.path.join(ARTIFACT_DIR, path))
+    if os.path.commonpath([full, ARTIFACT_DIR]) != ARTIFACT_DIR:
+        raise ValueError(f"path outside the artifact dir: {path}")
+    return full
+
+def load_har(name: str) -> Dict[str, Any]:
+    """A HAR by artifact store key, or by path under the artifact dir."""
+    if artifact_store.lookup(name) is not None:
+        try:
+            return json.loads(artifact_store.read_sync(name)[1])
+        except KeyError:
+            raise FileNotFoundError(f"HAR not found: {name}")  # collected since the lookup
+    path = artifact_path(name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"HAR not found: {name}")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_har_replay(name: str) -> ReplayCache:
+    meta = artifact_store.lookup(name)
+    if meta is not None:
+        key = meta["digest"]
+    else:
+        path = artifact_path(name)
+        key = (path, os.path.getmtime(path))
+    cache = _har_replays.get(key)
+    if cache is None:
+        cache = ReplayCache()
+        cache.ingest_har_json(load_har(name))
+        if len(_har_replays) >= 8:
+            _har_replays.pop(next(iter(_har_replays)))
+        _har_replays[key] = cache
+    return cache
+
+async def replay_policy_for(meta: Optional[Dict[str, Any]]) -> Optional[ReplayPolicy]:
+    opt = (meta or {}).get("replay")
+    if not opt:
+        return None
+    if opt.get("har"):
+        cache = await asyncio.to_thread(load_har_replay, opt["har"])
+    else:
+        cache = replay_cache
+    return ReplayPolicy(cache, match=opt.get("match"), ignore_query=opt.get("ignore_query"),
+                        fallback=opt.get("fallback") or "network")
+
+async def attach_routes(session, policy: NetworkPolicy, replay: Optional[ReplayPolicy]):
+    # routes registered later run first: replay answers hits, misses fall back to the policy
+    await policy.attach(session.context)
+    if replay is not None:
+        await replay.attach(session.context)
+    session.network, session.replay = policy, replay
+
+async def open_session(artifact_prefix: str, policy: NetworkPolicy, replay: Optional[ReplayPolicy],
+                       har_path: Optional[str], **context_options):
+    if har_path:
+        context_options["record_har_path"] = har_path
+    with span("context_open", CONTEXT_OPEN_SECONDS):
+        session = await session_store.open(artifact_prefix, **context_options)
+    try:
+        await attach_routes(session, policy, replay)
+    except BaseException:
+        await session_store.close(session)
+        raise
+    return session
+
+async def open_with_prefix_cache(test_ir: TestIR, result: Dict[str, Any], artifact_prefix: str,
+                                 har_path: Optional[str], policy: NetworkPolicy, replay: Optional[ReplayPolicy]):
+    """Open a session for the test, starting from a cached prefix state when the
+    test opts in. Returns (session, index of the first step to run, hit key)."""
+    use_cache, _ = cache_options(test_ir.meta)
+    hit = prefix_cache.lookup(test_ir.steps) if use_cache else None
+    if hit is None:
+        return await open_session(artifact_prefix, policy, replay, har_path), 0, None
+
+    n, key, entry = hit
+    session = await open_session(artifact_prefix, policy, replay, har_path, storage_state=entry["storage_state"])
+    try:
+        with span("prefix_restore", steps=n):
+            await session.page.goto(entry["url"])
+    except BaseException:
+        await session_store.close(session)
+        raise
+    result["prefix_cache"] = {"hit": True, "key": key, "steps": n}
+    result["cached_steps"] = list(range(n))
+    return session, n, key
+
+async def run_with_prefix_cache(session, test_ir: TestIR, result: Dict[str, Any], artifact_prefix: str,
+                                start: int, hit_key: Optional[str]) -> Optional[int]:
+    """Run the test on a session from open_with_prefix_cache, storing the prefix
+    state when the test asks for it. Returns the failed step index, if any."""
+    steps = test_ir.steps
+    if hit_key is not None:
+        failed_index = await run_steps(session.page, steps, result, artifact_prefix, start=start, test_ir=test_ir)
+        if failed_index is not None:
+            # the cached state may be stale (e.g. expired login); don't serve it again
+            prefix_cache.invalidate(hit_key)
+        return failed_index
+
+    _, store_steps = cache_options(test_ir.meta)
+    if not store_steps or store_steps > len(steps):
+        return await run_steps(session.page, steps, result, artifact_prefix, test_ir=test_ir)
+
+    failed_index = await run_steps(session.page, steps, result, artifact_prefix, stop=store_steps, test_ir=test_ir)
+    if failed_index is None:
+        try:
+            key = prefix_cache.store(steps, store_steps, await session.context.storage_state(), session.page.url)
+            result["prefix_cache"] = {"hit": False, "stored": key is not None, "key": key, "steps": store_steps}
+        except Exception as e:
+            print(f"[PrefixCache] store failed: {e}")
+        failed_index = await run_steps(session.page, steps, result, artifact_prefix, start=store_steps,
+                                       test_ir=test_ir)
+    return failed_index
+
+async def close_session(session):
+    with span("context_close", CONTEXT_CLOSE_SECONDS, har=bool(session.har_path)):
+        await session_store.close(session)
+
+async def store_leased_har(session):
+    """After the store closes a leased session: keep its now-flushed HAR under the
+    key its failed result already reported, or drop it when none was promised."""
+    if not session.har_path or not os.path.exists(session.har_path):
+        return
+    if session.har_key:
+        await artifact_store.put_file(session.har_key, session.har_path, "application/json")
+    else:
+        await asyncio.to_thread(os.remove, session.har_path)
+
+session_store.on_close = store_leased_har
+
+async def check_perf(result: Dict[str, Any], opts: Dict[str, Any], har_path: Optional[str]):
+    """Analyze the flushed HAR off the loop, summarize with the navigations collected
+    after each goto and fail a passing run whose budgets are exceeded."""
+    navigations = result.get("perf", {}).get("navigations", [])
+    har = None
+    if har_path and os.path.exists(har_path):
+        with span("har_analyze", HAR_ANALYZE_SECONDS):
+            try:
+                har = await asyncio.to_thread(analyze_har, har_path, url_pattern)
+            except (OSError, ValueError) as e:
+                print(f"[perf] HAR analysis failed: {e}")
+    summary = summarize(navigations, har)
+    budgets = check_budgets(summary, opts["budgets"], har is not None)
+    result["perf"] = {"navigations": navigations, "summary": summary, "har": har, "budgets": budgets}
+    for v in budgets["violations"]:
+        BUDGET_VIOLATIONS.labels(metric=v["metric"]).inc()
+    if budgets["violations"] and result["status"] == "success":
+        result.update({"status": "failed", "error": budget_error(budgets["violations"])})
+
+async def execute_test_ir(run_id: str, test_ir: TestIR, session_id: Optional[str] = None,
+                          trace_id: Optional[str] = None, timeout: Optional[float] = None,
+                          lease: bool = False) -> Dict[str, Any]:
+    """Run a TestIR under a trace; the result carries the trace id and its spans.
+    With `timeout` (seconds) the run is cancelled, and its context closed, when it expires.
+    With `lease` a failed run's context is kept for a resume instead of being closed."""
+    trace = Trace(trace_id)
+    token = use_trace(trace)
+    RUNS_IN_FLIGHT.inc()
+    if (test_ir.meta or {}).get("matrix") and not session_id:
+        run = _execute_matrix(run_id, test_ir)
+    else:
+        run = _execute_test_ir(run_id, test_ir, session_id, lease=lease)
+    try:
+        if timeout is None:
+            result = await run
+        else:
+            result = await asyncio.wait_for(run, max(0.0, timeout))
+    except asyncio.TimeoutError:
+        result = {"status": "error", "error": "deadline_exceeded", "artifacts": {}}
+    finally:
+        RUNS_IN_FLIGHT.dec()
+        reset_trace(token)
+    RUN_SECONDS.labels(status=result["status"]).observe(time.monotonic() - trace.started)
+    result["trace"] = trace.to_dict()
+    return result
+
+async def _execute_matrix(run_id: str, test_ir: TestIR) -> Dict[str, Any]:
+    """Run every row of meta.matrix in its own isolated context from the warm pool,
+    at most `concurrency` rows at once, and aggregate the results per row."""
+    try:
+        opt = matrix_options(test_ir.meta)
+        rows = expand_matrix(test_ir.dict(), MATRIX_MAX_ROWS)
+        concurrency = max(1, min(int(opt.get("concurrency") or MATRIX_CONCURRENCY), MATRIX_CONCURRENCY))
+    except (ValueError, TypeError) as e:
+        return {"status": "error", "error": str(e), "artifacts": {}}
+    fail_fast = bool(opt.get("fail_fast"))
+    sem = asyncio.Semaphore(concurrency)
+    stopped = False
+
+    async def run_row(i: int, row: Dict[str, Any], row_ir: Dict[str, Any]) -> Dict[str, Any]:
+        nonlocal stopped
+        async with sem:
+            if stopped:
+                return {"row": i, "vars": row, "status": "skipped"}
+            with span("matrix_row", row=i) as attrs:
+                # no session lease: a row failure is reported, not resumed
+                res = await _execute_test_ir(f"{run_id}_r{i}", TestIR(**row_ir))
+                attrs["status"] = res["status"]
+            if res["status"] != "success" and fail_fast:
+                stopped = True
+            return dict(res, row=i, vars=row)
+
+    results = await asyncio.gather(*(run_row(i, row, ir) for i, (row, ir) in enumerate(rows)))
+
+    step_timings = []
+    for r in results:
+        step_timings.extend(dict(t, row=r["row"]) for t in r.pop("step_timings", None) or [])
+    counts = {s: sum(1 for r in results if r["status"] == s) for s in ("success", "failed", "error", "skipped")}
+    not_passed = len(results) - counts["success"]
+    result = {
+        "status": "success" if not not_passed else "failed",
+        "artifacts": {},
+        "step_timings": step_timings,
+        "matrix": {"rows": len(results), "concurrency": concurrency, "passed": counts["success"],
+                   "failed": counts["failed"], "errored": counts["error"], "skipped": counts["skipped"],
+                   "results": results},
+        "completed_at": datetime.utcnow().isoformat(),
+    }
+    if not_passed:
+        result["error"] = f"{not_passed} of {len(results)} matrix rows did not pass"
+    return result
+
+async def _execute_test_ir(run_id: str, test_ir: TestIR, session_id: Optional[str] = None,
+                           lease: bool = False) -> Dict[str, Any]:
     result = {"status": "success", "artifacts": {}}
-    artifact_prefix = os.path.join(ARTIFACT_DIR, f"{run_id}_{test_ir.test_id}")
+    artifact_prefix = f"{run_id}_{test_ir.test_id}"
+    session = None
 
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(record_har_path=f"{artifact_prefix}.har")
-            page = await context.new_page()
-
-            for step in test_ir.steps:
-                try:
-                    action = step.action.lower()
-                    target = step.target or {}
-                    ttype = target.get("type")
-                    tval = target.get("value")
-
-                    if action == "goto":
-                        await page.goto(tval, timeout=step.timeout_ms)
-                    elif action == "click":
-                        await page.click(tval, timeout=step.timeout_ms)
-                    elif action == "type":
-                        await page.fill(tval, step.value or "", timeout=step.timeout_ms)
-                    elif action == "waitfor":
-                        await page.wait_for_selector(tval, timeout=step.timeout_ms)
-                    elif action == "assert":
-                        content = await page.content()
-                        if tval not in content:
-                            raise AssertionError(f"Assertion failed: {tval} not found in page content")
-                    elif action == "screenshot":
-                        shot_path = f"{artifact_prefix}_step_{uuid.uuid4().hex[:6]}.png"
-                        await page.screenshot(path=shot_path, full_page=True)
-                        result["artifacts"].setdefault("screenshots", []).append(shot_path)
-                    else:
-                        print(f"[WARN] Unknown action: {action}")
-
-                except Exception as step_err:
-                    # Capture DOM snapshot and add failure record
-                    dom_path = f"{artifact_prefix}_dom.json"
-                    try:
-                        dom_content = await page.content()
-                        with open(dom_path, "w", encoding="utf-8") as f:
-                            json.dump({"html": dom_content}, f, ensure_ascii=False)
-                        result["artifacts"]["dom_snapshot_key"] = dom_path
-                    except Exception as e:
-                        print(f"DOM snapshot failed: {e}")
-
-                    result.update({
-                        "status": "failed",
-                        "error": str(step_err),
-                        "failed_step": step.dict(),
-                    })
-                    break
-
-            await context.close()
-            await browser.close()
-
-        # Save HAR file
-        if os.path.exists(f"{artifact_prefix}.har"):
-            result["artifacts"]["har_key"] = f"{artifact_prefix}.har"
+        policy = NetworkPolicy.from_meta(test_ir.meta)
+        replay = await replay_policy_for(test_ir.meta)
+        record = bool(replay is not None and (test_ir.meta or {}).get("replay", {}).get("record"))
+        # Playwright writes the HAR here on context close; it is moved into the store afterwards
+        perf_opts = perf_options(test_ir.meta)
+        har_path = (os.path.join(ARTIFACT_DIR, f"{artifact_prefix}.har")
+                    if policy.har != "off" or record or perf_opts else None)
+
+        if session_id:
+            # resume: continue a parked session, or restore it from its snapshot
+            if har_path:
+                har_path = os.path.join(ARTIFACT_DIR, f"{artifact_prefix}_resumed_{uuid.uuid4().hex[:6]}.har")
+            resume_options = {"record_har_path": har_path} if har_path else {}
+            with span("session_resume", CONTEXT_OPEN_SECONDS):
+                session = await session_store.resume(session_id, **resume_options)
+            if session is None:
+                return {"status": "error", "error": "session_expired", "session_id": session_id, "artifacts": {}}
+            if session.network is None:
+                # restored from a snapshot: a fresh context without routing
+                await attach_routes(session, policy, replay)
+            har_path = session.har_path or har_path
+            result["resumed_session"] = session_id
+            failed_index = await run_steps(session.page, test_ir.steps, result, artifact_prefix, test_ir=test_ir)
+        else:
+            session, start, hit_key = await open_with_prefix_cache(test_ir, result, artifact_prefix, har_path, policy, replay)
+            failed_index = await run_with_prefix_cache(session, test_ir, result, artifact_prefix, start, hit_key)
+        if session.network is not None and session.network.routes:
+            result["network"] = session.network.stats()
+        if session.replay is not None:
+            result["replay"] = session.replay.stats()
+
+        # a leased context doesn't flush its HAR until the lease ends: runs that need
+        # the HAR in this result (har on_failure, perf) are closed instead
+        if failed_index is not None and lease and session_store.enabled and policy.lease_on_failure \
+                and perf_opts is None:
+            # keep the page where it failed so the agent can resend just the fix; its HAR
+            # is stored under this key when the lease ends
+            if har_path and policy.har != "off":
+                session.har_key = result["artifacts"]["har_key"] = os.path.basename(har_path)
+            with span("session_lease"):
+                result["session_id"] = await session_store.lease(session)
+            session = None
+        else:
+            await close_session(session)
+            session = None
+
+        if perf_opts is not None:
+            await check_perf(result, perf_opts, har_path)
 
+        # Save HAR file (flushed when the context is closed)
+        if har_path and os.path.exists(har_path):
+            if record:
+                result["replay"]["ingested"] = await asyncio.to_thread(replay_cache.ingest_har, har_path)
+            if policy.har == "off" or (policy.har == "on_failure" and result["status"] == "success"):
+                await asyncio.to_thread(os.remove, har_path)
+            else:
+                key = os.path.basename(har_path)
+                save_artifact(result, "har_key", key, artifact_store.put_file(key, har_path, "application/json"))
+
+        await finish_artifacts(result)
         # Timestamp and summary
         result["completed_at"] = datetime.utcnow().isoformat()
         return result
@@ -131,19 +680,156 @@ async def execute_test_ir(run_id: str, test_ir: TestIR) -> Dict[str, Any]:
     except Exception as e:
         result.update({"status": "error", "error": str(e)})
         return result
+    finally:
+        if session is not None:
+            await close_session(session)
+        await finish_artifacts(result)
 
 # -----------------------------
-# Endpoint
+# Endpoints
 # -----------------------------
 
+def sweep_stray_hars(max_age: float = STRAY_HAR_SECONDS, now: Optional[float] = None) -> int:
+    """Delete HARs left in ARTIFACT_DIR past `max_age` (e.g. written by a context
+    closed during a crash or shutdown); they are outside the store's retention."""
+    now = time.time() if now is None else now
+    removed = 0
+    for entry in os.scandir(ARTIFACT_DIR):
+        try:
+            if entry.name.endswith(".har") and entry.is_file() and entry.stat().st_mtime < now - max_age:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass  # moved into the store meanwhile
+    return removed
+
+async def artifact_gc_loop():
+    while True:
+        try:
+            swept = await artifact_store.gc()
+            swept["stray_hars"] = await asyncio.to_thread(sweep_stray_hars)
+            if any(swept.values()):
+                print(f"[ArtifactStore] retention: {swept}")
+        except Exception as e:
+            print(f"[ArtifactStore] retention failed: {e}")
+        await asyncio.sleep(ARTIFACT_GC_SECONDS)
+
+@app.on_event("startup")
+async def start_browser_pool():
+    global _artifact_gc
+    await browser_pool.start()
+    _artifact_gc = asyncio.get_running_loop().create_task(artifact_gc_loop())
+
+@app.on_event("shutdown")
+async def stop_browser_pool():
+    await session_store.stop()
+    await browser_pool.stop()
+    if _artifact_gc is not None:
+        _artifact_gc.cancel()
+    if _visual_pool is not None:
+        _visual_pool.shutdown(wait=False, cancel_futures=True)
+    await asyncio.to_thread(artifact_store.close)
+
+def parse_range(header: Optional[str], size: int):
+    """(start, end) of a single `bytes=` range, None for no/unsupported range.
+    Raises ValueError when the range can't be satisfied."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise ValueError(f"bytes */{size}")
+    return start, min(end, size - 1)
+
+@app.get("/artifacts/stats")
+async def artifacts_stats():
+    return await asyncio.to_thread(artifact_store.stats)
+
+@app.get("/artifacts/{key}")
+async def get_artifact(key: str, range_header: Optional[str] = Header(None, alias="Range"),
+                       accept_encoding: Optional[str] = Header(None)):
+    """Artifact content by key. Honours a single `Range: bytes=a-b`; without one, a
+    compressed blob is sent as-is when the client accepts its encoding."""
+    meta = await asyncio.to_thread(artifact_store.lookup, key)
+    if meta is None:
+        raise HTTPException(status_code=404, detail=f"artifact not found: {key}")
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{meta["digest"]}"'}
+    try:
+        byte_range = parse_range(range_header, meta["size"])
+    except ValueError as e:
+        raise HTTPException(status_code=416, detail="range not satisfiable", headers={"Content-Range": str(e)})
+    if byte_range is None:
+        accepted = {e.split(";")[0].strip() for e in (accept_encoding or "").split(",")}
+        if meta["encoding"] == "none" or meta["encoding"] in accepted:
+            if meta["encoding"] != "none":
+                headers["Content-Encoding"] = meta["encoding"]
+            return FileResponse(meta["path"], media_type=meta["content_type"], headers=headers)
+    start, end = byte_range or (0, None)
+    try:
+        _, data = await artifact_store.read(key, start, end)
+    except KeyError:  # collected since the lookup
+        raise HTTPException(status_code=404, detail=f"artifact not found: {key}")
+    if byte_range is None:
+        return Response(data, media_type=meta["content_type"], headers=headers)
+    headers["Content-Range"] = f"bytes {start}-{end}/{meta['size']}"
+    return Response(data, status_code=206, media_type=meta["content_type"], headers=headers)
+
+@app.get("/pool/stats")
+async def pool_stats():
+    return dict(browser_pool.stats(), sessions=session_store.stats(), prefix_cache=prefix_cache.stats(),
+                replay=replay_cache.stats(), visual=baseline_store.stats())
+
+@app.delete("/sessions/{session_id}")
+async def release_session(session_id: str):
+    """Close a leased session (its HAR is stored now) and drop its snapshot."""
+    if not await session_store.release(session_id):
+        raise HTTPException(status_code=404, detail="session not found")
+    return {"released": session_id}
+
+@app.post("/replay/ingest")
+async def replay_ingest(req: IngestRequest):
+    """Add recorded HARs to the shared replay cache."""
+    added = {}
+    for name in req.har:
+        try:
+            har = await asyncio.to_thread(load_har, name)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        added[name] = await asyncio.to_thread(replay_cache.ingest_har_json, har)
+    return {"ingested": added, "cache": replay_cache.stats()}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.post("/exec", response_model=ExecResponse)
-async def exec_test_ir(req: ExecRequest):
+async def exec_test_ir(req: ExecRequest, response: Response, x_trace_id: Optional[str] = Header(None),
+                       x_deadline_ms: Optional[int] = Header(None)):
     run_id = req.run_id or f"run_{uuid.uuid4().hex[:8]}"
-    print(f"[Executor] Starting run {run_id} for test {req.test_ir.test_id}")
+    print(f"[Executor] Starting run {run_id} for test {req.test_ir.test_id} (trace {x_trace_id or '-'})")
 
-    res = await execute_test_ir(run_id, req.test_ir)
+    timeout = x_deadline_ms / 1000 - DEADLINE_MARGIN_SECONDS if x_deadline_ms is not None else None
+    res = await execute_test_ir(run_id, req.test_ir, session_id=req.session_id, trace_id=x_trace_id, timeout=timeout,
+                                lease=req.keep_session)
+    response.headers[TRACE_HEADER] = res["trace"]["trace_id"]
 
+    if res.get("error") == "session_expired":
+        raise HTTPException(status_code=410, detail=res)
+    if res.get("error") == "deadline_exceeded":
+        raise HTTPException(status_code=504, detail=res)
     if res["status"] in ("failed", "error"):
         raise HTTPException(status_code=500, detail=res)
 
-    return ExecResponse(run_id=run_id, status=res["status"], artifacts=res.get("artifacts", {}))
+    return ExecResponse(run_id=run_id, status=res["status"], artifacts=res.get("artifacts", {}),
+                        cached_steps=res.get("cached_steps"), prefix_cache=res.get("prefix_cache"),
+                        network=res.get("network"), replay=res.get("replay"),
+                        step_timings=res.get("step_timings"), trace=res.get("trace"), matrix=res.get("matrix"),
+                        visual=res.get("visual"), perf=res.get("perf"))
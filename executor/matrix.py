@@ -0,0 +1,84 @@
+"""
+Data-driven runs: one TestIR, many rows of variables.
+
+A test opts in with `meta.matrix`:
+
+    {"matrix": {
+        "rows": [{"email": "a@x.test", "msg": "Welcome"}, {"email": "bad", "msg": "Invalid email"}],
+        "axes": {"locale": ["en", "de"]},   # optional; cartesian product, crossed with rows
+        "concurrency": 8,                   # rows in flight at once (capped by the executor)
+        "fail_fast": false                  # stop starting rows after the first failure
+    }}
+
+`{{name}}` placeholders in a step's `value` and in the string fields of its
+`target` are replaced per row. A placeholder without a value in some row is an
+error for the whole request, so a typo doesn't quietly run the literal text.
+"""
+
+import itertools
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_VAR = re.compile(r"\{\{\s*([\w.-]+)\s*\}\}")
+
+
+def matrix_options(meta: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    opt = (meta or {}).get("matrix")
+    if not opt:
+        return None
+    if not isinstance(opt, dict):
+        raise ValueError("meta.matrix must be an object with rows and/or axes")
+    return opt
+
+
+def expand_rows(opt: Dict[str, Any], max_rows: int) -> List[Dict[str, Any]]:
+    rows = opt.get("rows") or [{}]
+    axes = opt.get("axes") or {}
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        raise ValueError("meta.matrix.rows must be a list of objects")
+    if not isinstance(axes, dict) or not all(isinstance(v, list) and v for v in axes.values()):
+        raise ValueError("meta.matrix.axes must map names to non-empty lists")
+    names = list(axes)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(axes[n] for n in names))]
+    out = [dict(row, **combo) for row in rows for combo in combos]
+    if len(out) > max_rows:
+        raise ValueError(f"meta.matrix expands to {len(out)} rows; the limit is {max_rows}")
+    return out
+
+
+def _fill(text: str, row: Dict[str, Any], missing: set) -> str:
+    def sub(m):
+        name = m.group(1)
+        if name not in row:
+            missing.add(name)
+            return m.group(0)
+        return str(row[name])
+    return _VAR.sub(sub, text)
+
+
+def substitute_steps(steps: List[Dict[str, Any]], row: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], set]:
+    """Steps (as dicts) with the row's values filled in, plus unknown variable names."""
+    missing: set = set()
+    out = []
+    for step in steps:
+        step = dict(step)
+        if isinstance(step.get("value"), str):
+            step["value"] = _fill(step["value"], row, missing)
+        if isinstance(step.get("target"), dict):
+            step["target"] = {k: _fill(v, row, missing) if isinstance(v, str) else v
+                              for k, v in step["target"].items()}
+        out.append(step)
+    return out, missing
+
+
+def expand(test_ir: Dict[str, Any], max_rows: int) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """[(row vars, row TestIR dict)] for a matrix TestIR; the row TestIRs carry no matrix."""
+    opt = matrix_options(test_ir.get("meta"))
+    meta = {k: v for k, v in (test_ir.get("meta") or {}).items() if k != "matrix"}
+    out = []
+    for row in expand_rows(opt, max_rows):
+        steps, missing = substitute_steps(test_ir.get("steps") or [], row)
+        if missing:
+            raise ValueError(f"meta.matrix: no value for {', '.join(sorted(missing))} in row {row}")
+        out.append((row, dict(test_ir, steps=steps, meta=meta)))
+    return out
@@ -0,0 +1,136 @@
+"""
+Per-run network policy ("fast mode") applied with Playwright request routing.
+
+A test opts in with `meta.network`:
+
+    {
+      "fast": true,                                   # block images/fonts/media + common analytics hosts
+      "block_resource_types": ["image", "font"],      # Playwright resource types
+      "block_domains": ["ads.example.com"],           # host or any subdomain of it
+      "allow_domains": ["example.com"],               # if set, every other host is blocked
+      "stubs": [{"url": "**/api/flags*", "status": 200, "json": {"beta": false}}],
+      "har": "off" | "on_failure" | "full"            # default "full"
+    }
+
+Stub `url` patterns are globs matched against the full request URL. A stub
+answers with `json` or `body` (plus optional `status`, `content_type`, `headers`).
+Routing is only installed when something needs to be blocked or stubbed, since an
+active route disables the browser's HTTP cache.
+
+Playwright writes the HAR only when the context closes, while a failed run
+normally keeps its context leased for resume (see session_store.py). A HAR
+requested with "on_failure" is wanted exactly when the run fails, so those runs
+are closed on failure instead of leased; with "full" the run is leased and its
+HAR is stored when the lease ends.
+"""
+
+import json
+from fnmatch import fnmatchcase
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+HAR_MODES = ("off", "on_failure", "full")
+
+FAST_RESOURCE_TYPES = ["image", "font", "media"]
+FAST_BLOCK_DOMAINS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "connect.facebook.net", "hotjar.com", "segment.io", "segment.com",
+    "mixpanel.com", "amplitude.com", "fullstory.com", "newrelic.com", "nr-data.net",
+    "sentry.io", "clarity.ms", "bat.bing.com",
+]
+
+
+def _norm_domains(domains: Optional[List[str]]) -> List[str]:
+    return [d.strip().lower().lstrip(".") for d in (domains or []) if d and d.strip()]
+
+
+def _host_matches(host: str, domains: List[str]) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class NetworkPolicy:
+    def __init__(self, block_resource_types: Optional[List[str]] = None,
+                 block_domains: Optional[List[str]] = None,
+                 allow_domains: Optional[List[str]] = None,
+                 stubs: Optional[List[Dict[str, Any]]] = None,
+                 har: str = "full"):
+        if har not in HAR_MODES:
+            raise ValueError(f"network.har must be one of {', '.join(HAR_MODES)}")
+        self.block_resource_types = {t.lower() for t in (block_resource_types or [])}
+        self.block_domains = _norm_domains(block_domains)
+        self.allow_domains = _norm_domains(allow_domains)
+        self.stubs = [s for s in (stubs or []) if s.get("url")]
+        self.har = har
+        self.counts = {"allowed": 0, "blocked": 0, "stubbed": 0}
+
+    @classmethod
+    def from_meta(cls, meta: Optional[Dict[str, Any]]) -> "NetworkPolicy":
+        opt = (meta or {}).get("network") or {}
+        types = list(opt.get("block_resource_types") or [])
+        domains = list(opt.get("block_domains") or [])
+        if opt.get("fast"):
+            types += FAST_RESOURCE_TYPES
+            domains += FAST_BLOCK_DOMAINS
+        return cls(
+            block_resource_types=types,
+            block_domains=domains,
+            allow_domains=opt.get("allow_domains"),
+            stubs=opt.get("stubs"),
+            har=opt.get("har") or "full",
+        )
+
+    @property
+    def lease_on_failure(self) -> bool:
+        """Whether a failed run may keep its context for resume (and delay its HAR)."""
+        return self.har != "on_failure"
+
+    @property
+    def routes(self) -> bool:
+        return bool(self.block_resource_types or self.block_domains or self.allow_domains or self.stubs)
+
+    def _stub_for(self, url: str) -> Optional[Dict[str, Any]]:
+        for stub in self.stubs:
+            if fnmatchcase(url, stub["url"]):
+                return stub
+        return None
+
+    def _blocked(self, url: str, resource_type: str) -> bool:
+        if resource_type in self.block_resource_types:
+            return True
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https", "ws", "wss"):
+            return False  # data:, blob:, about: never leave the browser
+        host = (parts.hostname or "").lower()
+        if self.allow_domains and not _host_matches(host, self.allow_domains):
+            return True
+        return _host_matches(host, self.block_domains)
+
+    async def _handle(self, route, request):
+        url = request.url
+        stub = self._stub_for(url)
+        if stub is not None:
+            self.counts["stubbed"] += 1
+            if "json" in stub:
+                body, content_type = json.dumps(stub["json"]), "application/json"
+            else:
+                body, content_type = stub.get("body", ""), "text/plain"
+            await route.fulfill(
+                status=int(stub.get("status", 200)),
+                headers=stub.get("headers"),
+                content_type=stub.get("content_type", content_type),
+                body=body,
+            )
+        elif self._blocked(url, request.resource_type):
+            self.counts["blocked"] += 1
+            await route.abort("blockedbyclient")
+        else:
+            self.counts["allowed"] += 1
+            await route.continue_()
+
+    async def attach(self, context):
+        """Install the routing handler on a BrowserContext (no-op if nothing to route)."""
+        if self.routes:
+            await context.route("**/*", self._handle)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counts, har=self.har)
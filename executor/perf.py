@@ -0,0 +1,268 @@
+"""
+Page performance: navigation timings / Web Vitals from the Performance API, a
+streaming HAR analysis, and budgets that fail the run when exceeded.
+
+A test opts in with `meta.perf: true`, or by declaring budgets:
+
+    {"budgets": {"lcp_ms": 2500, "cls": 0.1, "ttfb_ms": 800,   # worst navigation of the run
+                 "script_kb": 500, "image_kb": 1500,           # transfer size by resource type
+                 "total_kb": 3000, "requests": 120, "failed_requests": 0}}
+
+After every `goto` the page's navigation entry, first-contentful-paint, largest-
+contentful-paint and layout shifts are read in the page. CLS here is the plain
+sum of shifts without recent input (no session windows). The run's HAR is then
+read entry by entry (never whole) for per-request timing breakdowns, bytes and
+requests by resource type and the slowest endpoints. Playwright writes the HAR
+when the context closes, so perf runs are never leased on failure: the HAR is
+flushed before it is read, and failed runs get request and byte metrics too.
+HAR-based budgets are skipped only when no HAR could be read.
+"""
+
+import heapq
+import json
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+NAV_METRICS = ("ttfb_ms", "fcp_ms", "lcp_ms", "cls", "dom_content_loaded_ms", "load_ms")
+HAR_METRICS = ("requests", "failed_requests", "total_kb")
+RESOURCE_TYPES = ("document", "script", "stylesheet", "image", "font", "media", "xhr", "other")
+_TYPE_ALIASES = {"js": "script", "css": "stylesheet", "img": "image", "fetch": "xhr"}
+TIMING_PHASES = ("blocked", "dns", "connect", "ssl", "send", "wait", "receive")
+MAX_ENDPOINTS = 2000
+
+VITALS_SCRIPT = """
+async () => {
+  const nav = performance.getEntriesByType("navigation")[0];
+  const fcp = performance.getEntriesByName("first-contentful-paint")[0];
+  const observe = (type) => new Promise(resolve => {
+    const seen = [];
+    try {
+      const po = new PerformanceObserver(list => seen.push(...list.getEntries()));
+      po.observe({type, buffered: true});
+      setTimeout(() => { seen.push(...po.takeRecords()); po.disconnect(); resolve(seen); }, 50);
+    } catch (e) { resolve(seen); }
+  });
+  const [lcp, shifts] = await Promise.all([observe("largest-contentful-paint"), observe("layout-shift")]);
+  return {
+    url: location.href,
+    ttfb_ms: nav ? nav.responseStart - nav.startTime : null,
+    dom_content_loaded_ms: nav && nav.domContentLoadedEventEnd ? nav.domContentLoadedEventEnd : null,
+    load_ms: nav && nav.loadEventEnd ? nav.loadEventEnd : null,
+    fcp_ms: fcp ? fcp.startTime : null,
+    lcp_ms: lcp.length ? lcp[lcp.length - 1].startTime : null,
+    cls: shifts.filter(s => !s.hadRecentInput).reduce((sum, s) => sum + s.value, 0),
+    document_kb: nav ? nav.transferSize / 1024 : null,
+  };
+}
+"""
+
+
+def perf_options(meta: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """None unless the test asks for performance data; validates meta.budgets."""
+    meta = meta or {}
+    budgets = meta.get("budgets")
+    if not meta.get("perf") and not budgets:
+        return None
+    if budgets is not None and not isinstance(budgets, dict):
+        raise ValueError("meta.budgets must map metric names to limits")
+    normalized = {}
+    for name, limit in (budgets or {}).items():
+        key = budget_key(name)
+        if key is None:
+            raise ValueError(f"meta.budgets: unknown metric {name!r}; use {', '.join(NAV_METRICS + HAR_METRICS)}"
+                             f" or <type>_kb with type in {', '.join(RESOURCE_TYPES)}")
+        normalized[key] = float(limit)
+    return {"budgets": normalized}
+
+
+def budget_key(name: str) -> Optional[str]:
+    if name in NAV_METRICS or name in HAR_METRICS:
+        return name
+    if name.endswith("_kb"):
+        kind = _TYPE_ALIASES.get(name[:-3], name[:-3])
+        if kind in RESOURCE_TYPES:
+            return f"{kind}_kb"
+    return None
+
+
+async def collect_vitals(page) -> Optional[Dict[str, Any]]:
+    try:
+        nav = await page.evaluate(VITALS_SCRIPT)
+    except Exception as e:
+        print(f"[perf] vitals unavailable: {e}")
+        return None
+    return {k: round(v, 4 if k == "cls" else 1) if isinstance(v, (int, float)) else v for k, v in nav.items()}
+
+
+# -----------------------------
+# streaming HAR reader
+# -----------------------------
+
+_ENTRIES = re.compile(r'(?<!\\)"entries"\s*:\s*\[')
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def iter_har_entries(path: str, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Yield log.entries[] of a HAR one at a time; memory stays around one entry
+    (plus a chunk) however large the file is."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        while True:
+            m = _ENTRIES.search(buf)
+            if m:
+                pos = m.end()
+                break
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            buf = buf[-64:] + chunk  # the key may straddle two chunks
+        while True:
+            pos = _SEPARATORS.match(buf, pos).end()
+            if pos >= len(buf):
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                buf, pos = chunk, 0
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                entry, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # entry not complete yet; read at least as much again so big entries stay linear
+                chunk = f.read(max(chunk_size, len(buf) - pos))
+                if not chunk:
+                    raise
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            yield entry
+            pos = end
+            if pos > chunk_size:
+                buf, pos = buf[pos:], 0
+
+
+def resource_type(entry: Dict[str, Any]) -> str:
+    kind = (entry.get("_resourceType") or "").lower()
+    if kind in RESOURCE_TYPES:
+        return kind
+    if kind == "fetch":
+        return "xhr"
+    mime = (((entry.get("response") or {}).get("content") or {}).get("mimeType") or "").lower()
+    if "html" in mime:
+        return "document"
+    if "javascript" in mime or "ecmascript" in mime:
+        return "script"
+    if "css" in mime:
+        return "stylesheet"
+    if mime.startswith("image/"):
+        return "image"
+    if "font" in mime:
+        return "font"
+    if mime.startswith(("audio/", "video/")):
+        return "media"
+    if "json" in mime or "xml" in mime:
+        return "xhr"
+    return "other"
+
+
+def transfer_bytes(response: Dict[str, Any]) -> int:
+    size = response.get("_transferSize")
+    if isinstance(size, (int, float)) and size > 0:
+        return int(size)
+    body, headers = response.get("bodySize", -1), response.get("headersSize", -1)
+    if body >= 0:
+        return body + max(headers, 0)
+    return max(0, int((response.get("content") or {}).get("size") or 0))
+
+
+def analyze_har(path: str, pattern: Callable[[str], str] = lambda url: url, top: int = 10) -> Dict[str, Any]:
+    """Per-type bytes/requests, summed timing phases, slowest requests (with their
+    breakdown) and slowest endpoints (by url pattern), in one pass over the HAR."""
+    requests = failed = 0
+    by_type: Dict[str, Dict[str, float]] = {}
+    phases = dict.fromkeys(TIMING_PHASES, 0.0)
+    slowest: List = []
+    endpoints: Dict[str, Dict[str, float]] = {}
+    for i, e in enumerate(iter_har_entries(path)):
+        req, resp = e.get("request") or {}, e.get("response") or {}
+        status = resp.get("status") or 0
+        kind = resource_type(e)
+        size = transfer_bytes(resp)
+        took = float(e.get("time") or 0)
+        timings = {p: round(float(v), 1) for p, v in (e.get("timings") or {}).items() if p in phases and v is not None and v >= 0}
+        requests += 1
+        failed += status <= 0 or status >= 400
+        t = by_type.setdefault(kind, {"requests": 0, "bytes": 0})
+        t["requests"] += 1
+        t["bytes"] += size
+        for p, v in timings.items():
+            phases[p] += v
+        row = {"url": (req.get("url") or "")[:300], "method": req.get("method"), "status": status, "type": kind,
+               "time_ms": round(took, 1), "bytes": size, "timings": timings}
+        if len(slowest) < top:
+            heapq.heappush(slowest, (took, i, row))
+        elif took > slowest[0][0]:
+            heapq.heapreplace(slowest, (took, i, row))
+        key = f"{req.get('method', 'GET')} {pattern(req.get('url') or '')}"
+        ep = endpoints.get(key)
+        if ep is None:
+            if len(endpoints) >= MAX_ENDPOINTS:
+                key = "(other)"
+                ep = endpoints.get(key)
+            if ep is None:
+                ep = endpoints[key] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+        ep["count"] += 1
+        ep["total_ms"] += took
+        ep["max_ms"] = max(ep["max_ms"], took)
+
+    top_endpoints = heapq.nlargest(top, endpoints.items(), key=lambda kv: kv[1]["max_ms"])
+    return {
+        "requests": requests,
+        "failed_requests": failed,
+        "total_kb": round(sum(t["bytes"] for t in by_type.values()) / 1024, 1),
+        "by_type": {k: {"requests": v["requests"], "kb": round(v["bytes"] / 1024, 1)} for k, v in sorted(by_type.items())},
+        "timing_ms": {p: round(v, 1) for p, v in phases.items()},
+        "slowest_requests": [row for _, _, row in sorted(slowest, key=lambda x: -x[0])],
+        "slowest_endpoints": [{"endpoint": k, "count": v["count"], "avg_ms": round(v["total_ms"] / v["count"], 1),
+                               "max_ms": round(v["max_ms"], 1)} for k, v in top_endpoints],
+    }
+
+
+# -----------------------------
+# summary & budgets
+# -----------------------------
+
+def summarize(navigations: List[Dict[str, Any]], har: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Flat numbers for budgets and roll-ups: worst value over the run's navigations,
+    HAR totals and <type>_kb."""
+    summary: Dict[str, Any] = {"navigations": len(navigations)}
+    for m in NAV_METRICS:
+        values = [n[m] for n in navigations if isinstance(n.get(m), (int, float))]
+        if values:
+            summary[m] = max(values)
+    if har is not None:
+        summary.update({m: har[m] for m in HAR_METRICS})
+        summary.update({f"{k}_kb": v["kb"] for k, v in har["by_type"].items()})
+    return summary
+
+
+def check_budgets(summary: Dict[str, Any], budgets: Dict[str, float], har_available: bool) -> Dict[str, Any]:
+    violations, skipped = [], []
+    for metric, limit in budgets.items():
+        value = summary.get(metric)
+        if value is None:
+            # a type with no requests weighs 0 KB; anything else wasn't measured
+            if metric.endswith("_kb") and har_available:
+                value = 0.0
+            else:
+                skipped.append(metric)
+                continue
+        if value > limit:
+            violations.append({"metric": metric, "value": value, "budget": limit})
+    return {"violations": violations, "skipped": skipped, "checked": len(budgets) - len(skipped)}
+
+
+def budget_error(violations: List[Dict[str, Any]]) -> str:
+    return "Performance budget exceeded: " + "; ".join(
+        f"{v['metric']} {v['value']:g} > {v['budget']:g}" for v in violations)
@@ -0,0 +1,104 @@
+"""
+Shared-prefix cache: reuse the browser state reached by common leading steps.
+
+Many TestIRs start with the same goto/type/click login sequence. A test opts in
+with `meta.prefix_cache`:
+
+    {"prefix_cache": {"steps": 3}}   # cache state after the first 3 steps (and reuse it)
+    {"prefix_cache": true}           # only reuse prefixes cached by other tests
+
+Step prefixes are hashed as a chain over normalized steps (action, target,
+value; timeouts ignored), so a lookup tries every leading prefix length with one
+dict probe each. Entries hold `storage_state` (cookies + localStorage) and the
+final URL, expire after a TTL and are evicted LRU. sessionStorage and in-page JS
+state are not captured.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# actions whose effect on the page is fully reflected by cookies/localStorage + URL
+CACHEABLE_ACTIONS = {"goto", "click", "type", "waitfor"}
+
+
+def _norm_step(step) -> str:
+    target = step.target or {}
+    return json.dumps(
+        [step.action.lower(), target.get("type"), target.get("value"), step.value],
+        ensure_ascii=False, separators=(",", ":"),
+    )
+
+
+def prefix_hashes(steps: List[Any]) -> List[str]:
+    """hashes[i] identifies steps[:i + 1]; stops at the first non-cacheable action."""
+    out, h = [], hashlib.sha256()
+    for step in steps:
+        if step.action.lower() not in CACHEABLE_ACTIONS:
+            break
+        h.update(_norm_step(step).encode("utf-8"))
+        h.update(b"\n")
+        out.append(h.copy().hexdigest()[:32])
+    return out
+
+
+def cache_options(meta: Optional[Dict[str, Any]]) -> Tuple[bool, Optional[int]]:
+    """(lookup enabled, number of leading steps to store) from TestIR.meta."""
+    opt = (meta or {}).get("prefix_cache")
+    if not opt:
+        return False, None
+    if isinstance(opt, dict):
+        steps = opt.get("steps")
+        return True, int(steps) if steps else None
+    return True, None
+
+
+class PrefixCache:
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 100):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, steps: List[Any]) -> Optional[Tuple[int, str, Dict[str, Any]]]:
+        """Longest cached prefix of steps as (length, key, entry), or None."""
+        now = time.monotonic()
+        hashes = prefix_hashes(steps)
+        for n in range(len(hashes), 0, -1):
+            key = hashes[n - 1]
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            if entry["expires_at"] < now:
+                self.entries.pop(key, None)
+                continue
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return n, key, entry
+        self.misses += 1
+        return None
+
+    def store(self, steps: List[Any], n: int, storage_state: Dict[str, Any], url: str) -> Optional[str]:
+        hashes = prefix_hashes(steps[:n])
+        if n <= 0 or len(hashes) < n:
+            return None  # prefix contains a non-cacheable action
+        key = hashes[n - 1]
+        self.entries[key] = {
+            "storage_state": storage_state,
+            "url": url,
+            "steps": n,
+            "expires_at": time.monotonic() + self.ttl_seconds,
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return key
+
+    def invalidate(self, key: str):
+        self.entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses, "ttl_seconds": self.ttl_seconds}
@@ -0,0 +1,232 @@
+"""
+Offline replay of recorded traffic from HAR files.
+
+Responses from HARs are stored content-addressed (sha256 of the body) and indexed
+by URL without its query string. Each entry also records the method, the
+normalized query (sorted, minus ignored params) and a hash of the request body,
+so the match rules can be chosen per run. A test opts in with `meta.replay`:
+
+    {
+      "source": "cache",                  # the shared cache (POST /replay/ingest), or
+      "har": "run_x_login.har",           # a single HAR under the artifact dir
+      "match": ["method", "query", "body"],
+      "ignore_query": ["_", "ts"],
+      "fallback": "network" | "abort" | "404",   # on a miss; default "network"
+      "record": true                      # ingest this run's HAR into the cache afterwards
+    }
+
+When the same request was recorded several times, the most recent response wins.
+
+Ingest runs in worker threads while lookups run on the event loop, so it merges
+into a copy of the index and publishes it with a single assignment; a published
+index and its lists are never modified again.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+MATCH_RULES = ("method", "query", "body")
+FALLBACKS = ("network", "abort", "404")
+MAX_ENTRIES_PER_URL = 20
+
+# the body is stored decoded, so these no longer describe it
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def normalize_query(query: str, ignore_query: Optional[List[str]] = None) -> str:
+    ignore = set(ignore_query or [])
+    return urlencode(sorted((k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k not in ignore))
+
+
+def split_url(url: str, ignore_query: Optional[List[str]] = None) -> Tuple[str, str]:
+    """(url without query/fragment, normalized query string)."""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, "", "")), normalize_query(parts.query, ignore_query)
+
+
+def body_hash(body: Optional[bytes]) -> str:
+    return hashlib.sha256(body).hexdigest()[:32] if body else ""
+
+
+class ReplayCache:
+    """Content-addressed response store. With `root` it persists blobs and the
+    index on disk; without, everything stays in memory (single-HAR replay)."""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root
+        self.index: Dict[str, List[Dict[str, Any]]] = {}
+        self._blobs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()  # serializes writers; readers use whatever index is published
+        if root:
+            os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+            index_path = os.path.join(root, "index.json")
+            if os.path.exists(index_path):
+                try:
+                    with open(index_path, "r", encoding="utf-8") as f:
+                        self.index = json.load(f)
+                except Exception as e:
+                    print(f"[ReplayCache] index unreadable, starting empty: {e}")
+
+    # -----------------------------
+    # blobs
+    # -----------------------------
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def _put_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if self.root is None:
+            self._blobs[digest] = data
+            return digest
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return digest
+
+    def get_blob(self, digest: str) -> bytes:
+        if self.root is None:
+            return self._blobs[digest]
+        with open(self._blob_path(digest), "rb") as f:
+            return f.read()
+
+    # -----------------------------
+    # ingest
+    # -----------------------------
+
+    def ingest_har(self, har_path: str) -> int:
+        """Index every response with a body from a HAR file; returns entries added."""
+        with open(har_path, "r", encoding="utf-8") as f:
+            return self.ingest_har_json(json.load(f))
+
+    def ingest_har_json(self, har: Dict[str, Any]) -> int:
+        new = []
+        for e in (har.get("log") or {}).get("entries") or []:
+            req, resp = e.get("request") or {}, e.get("response") or {}
+            status = resp.get("status") or 0
+            if not req.get("url") or status <= 0:
+                continue  # aborted / blocked requests have no response to replay
+            content = resp.get("content") or {}
+            text = content.get("text") or ""
+            data = base64.b64decode(text) if content.get("encoding") == "base64" else text.encode("utf-8")
+            post = (req.get("postData") or {}).get("text")
+            new.append(self._entry(req.get("method", "GET"), req["url"], post.encode("utf-8") if post else None,
+                                   status, resp.get("headers") or [], data))
+        self._publish(new, save=True)
+        return len(new)
+
+    def add(self, method: str, url: str, post_data: Optional[bytes], status: int,
+            headers: List[Dict[str, str]], body: bytes):
+        self._publish([self._entry(method, url, post_data, status, headers, body)])
+
+    def _entry(self, method: str, url: str, post_data: Optional[bytes], status: int,
+               headers: List[Dict[str, str]], body: bytes) -> Tuple[str, Dict[str, Any]]:
+        base, query = split_url(url)
+        return base, {
+            "method": method.upper(),
+            "query": query,
+            "body_hash": body_hash(post_data),
+            "status": status,
+            "headers": {h["name"]: h["value"] for h in headers
+                        if h.get("name") and h["name"].lower() not in _DROP_HEADERS},
+            "blob": self._put_blob(body),
+        }
+
+    def _publish(self, new: List[Tuple[str, Dict[str, Any]]], save: bool = False):
+        with self._lock:
+            index = dict(self.index)
+            for base, entry in new:
+                key = (entry["method"], entry["query"], entry["body_hash"])
+                entries = [x for x in index.get(base, []) if (x["method"], x["query"], x["body_hash"]) != key]
+                entries.append(entry)
+                index[base] = entries[-MAX_ENTRIES_PER_URL:]
+            self.index = index
+            if save:
+                self.save()
+
+    def save(self):
+        if not self.root:
+            return
+        path = os.path.join(self.root, "index.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    # -----------------------------
+    # lookup
+    # -----------------------------
+
+    def lookup(self, method: str, url: str, post_data: Optional[bytes],
+               match: List[str], ignore_query: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        base, query = split_url(url, ignore_query)
+        entries = self.index.get(base)
+        if not entries:
+            return None
+        method = method.upper()
+        digest = body_hash(post_data) if "body" in match else None
+        for entry in reversed(entries):
+            if "method" in match and entry["method"] != method:
+                continue
+            # entries store the full query; drop ignored params before comparing
+            if "query" in match and normalize_query(entry["query"], ignore_query) != query:
+                continue
+            if digest is not None and entry["body_hash"] != digest:
+                continue
+            return entry
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"urls": len(self.index), "entries": sum(len(v) for v in self.index.values())}
+
+
+class ReplayPolicy:
+    """Route handler serving a run's requests from a ReplayCache."""
+
+    def __init__(self, cache: ReplayCache, match: Optional[List[str]] = None,
+                 ignore_query: Optional[List[str]] = None, fallback: str = "network"):
+        match = list(MATCH_RULES if match is None else match)
+        unknown = [m for m in match if m not in MATCH_RULES]
+        if unknown:
+            raise ValueError(f"replay.match: unknown rule(s) {unknown}; use {', '.join(MATCH_RULES)}")
+        if fallback not in FALLBACKS:
+            raise ValueError(f"replay.fallback must be one of {', '.join(FALLBACKS)}")
+        self.cache = cache
+        self.match = match
+        self.ignore_query = ignore_query or []
+        self.fallback = fallback
+        self.counts = {"hits": 0, "misses": 0}
+
+    async def _handle(self, route, request):
+        if request.url.startswith(("data:", "blob:")):
+            await route.fallback()
+            return
+        entry = self.cache.lookup(request.method, request.url, request.post_data_buffer,
+                                  self.match, self.ignore_query)
+        if entry is not None:
+            self.counts["hits"] += 1
+            await route.fulfill(status=entry["status"], headers=entry["headers"],
+                                body=self.cache.get_blob(entry["blob"]))
+            return
+        self.counts["misses"] += 1
+        if self.fallback == "abort":
+            await route.abort("internetdisconnected")
+        elif self.fallback == "404":
+            await route.fulfill(status=404, body="")
+        else:
+            await route.fallback()  # next handler (network policy) or the network
+
+    async def attach(self, context):
+        await context.route("**/*", self._handle)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counts, match=self.match, fallback=self.fallback)
@@ -0,0 +1,155 @@
+"""
+Failure checkpoints for step-level resume.
+
+When a run fails, its browser context is kept alive for a short lease instead of
+being closed, so the agent can resend only the patched step and the remainder of
+the test against the same page. A storage_state + URL snapshot is also kept for a
+longer TTL; once the lease has lapsed, resuming restores a new context from it.
+
+A leased context only flushes its HAR when it is finally closed, so contexts the
+store closes itself (lease expiry, eviction, shutdown, a dead context on resume)
+are handed to `on_close` afterwards to store or drop the HAR.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class Session:
+    """A pool slot (entry + context) and the page a run is driving."""
+
+    def __init__(self, entry, context, page, artifact_prefix: str, har_path: Optional[str] = None):
+        self.id: Optional[str] = None
+        self.entry = entry
+        self.context = context
+        self.page = page
+        self.artifact_prefix = artifact_prefix
+        self.har_path = har_path
+        self.har_key: Optional[str] = None  # artifact key the HAR is stored under once the lease ends
+        self.network = None  # NetworkPolicy routing this context, if any
+        self.replay = None  # ReplayPolicy serving recorded responses, if any
+        self.expires_at = 0.0
+
+
+class SessionStore:
+    def __init__(self, pool, lease_seconds: float = 60.0, max_sessions: int = 4,
+                 snapshot_ttl: float = 600.0, max_snapshots: int = 200,
+                 on_close: Optional[Callable[[Session], Awaitable[None]]] = None):
+        self.pool = pool
+        self.on_close = on_close
+        self.lease_seconds = lease_seconds
+        self.max_sessions = max_sessions
+        self.snapshot_ttl = snapshot_ttl
+        self.max_snapshots = max_snapshots
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.snapshots: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.lease_seconds > 0
+
+    async def open(self, artifact_prefix: str, **context_options) -> Session:
+        entry, context = await self.pool.acquire(**context_options)
+        try:
+            page = await context.new_page()
+        except BaseException:
+            await self.pool.release(entry, context)
+            raise
+        return Session(entry, context, page, artifact_prefix, context_options.get("record_har_path"))
+
+    async def close(self, session: Session):
+        await self.pool.release(session.entry, session.context)
+
+    async def _expire(self, session: Session):
+        """Close a session nobody is driving any more; its HAR is written now."""
+        await self.close(session)
+        if self.on_close is not None:
+            try:
+                await self.on_close(session)
+            except Exception as e:
+                print(f"[SessionStore] on_close failed: {e}")
+
+    async def lease(self, session: Session) -> str:
+        """Park a failed run's session; returns its id. Closes it if leasing is off."""
+        session.id = session.id or f"sess_{uuid.uuid4().hex[:12]}"
+        try:
+            self.snapshots[session.id] = {
+                "storage_state": await session.context.storage_state(),
+                "url": session.page.url,
+                "artifact_prefix": session.artifact_prefix,
+                "expires_at": time.monotonic() + self.snapshot_ttl,
+            }
+            self.snapshots.move_to_end(session.id)
+            while len(self.snapshots) > self.max_snapshots:
+                self.snapshots.popitem(last=False)
+        except Exception as e:
+            print(f"[SessionStore] storage_state snapshot failed: {e}")
+
+        if not self.enabled:
+            await self._expire(session)
+            return session.id
+        session.expires_at = time.monotonic() + self.lease_seconds
+        self.sessions[session.id] = session
+        # leased contexts hold pool slots; never let them starve new runs
+        while len(self.sessions) > self.max_sessions:
+            _, oldest = self.sessions.popitem(last=False)
+            await self._expire(oldest)
+        self._ensure_sweeper()
+        return session.id
+
+    async def resume(self, session_id: str, **context_options) -> Optional[Session]:
+        """Take a parked session back (live if the lease holds, else rebuilt from
+        its snapshot). Returns None when neither is available."""
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            if session.context.pages and session.entry.healthy:
+                return session
+            await self._expire(session)
+
+        snap = self.snapshots.get(session_id)
+        if snap is None or snap["expires_at"] < time.monotonic():
+            return None
+        session = await self.open(snap["artifact_prefix"], storage_state=snap["storage_state"], **context_options)
+        session.id = session_id
+        if snap.get("url") and snap["url"] != "about:blank":
+            await session.page.goto(snap["url"])
+        return session
+
+    async def release(self, session_id: str) -> bool:
+        """Drop a parked session and its snapshot once the agent stops retrying.
+        Returns False when neither was held."""
+        snap = self.snapshots.pop(session_id, None)
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            await self._expire(session)
+        return session is not None or snap is not None
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while self.sessions:
+            await asyncio.sleep(min(5.0, self.lease_seconds))
+            await self.sweep()
+
+    async def sweep(self):
+        now = time.monotonic()
+        for sid in [sid for sid, s in self.sessions.items() if s.expires_at < now]:
+            await self._expire(self.sessions.pop(sid))
+        for sid in [sid for sid, snap in self.snapshots.items() if snap["expires_at"] < now]:
+            self.snapshots.pop(sid, None)
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        while self.sessions:
+            _, session = self.sessions.popitem()
+            await self._expire(session)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"leased": len(self.sessions), "snapshots": len(self.snapshots), "lease_seconds": self.lease_seconds}
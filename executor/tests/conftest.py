@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+# executor modules import each other as top-level modules (`from session_store import SessionStore`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# executor_service puts ARTIFACT_DIR under the working directory at import time
+os.chdir(tempfile.mkdtemp(prefix="executor-tests-"))
+
+
+class FakeContext:
+    """Writes its HAR on close, like Playwright's record_har_path."""
+
+    def __init__(self, har_path=None, har_entries=()):
+        self.har_path = har_path
+        self.har_entries = list(har_entries)
+        self.pages = ["page"]
+
+    async def storage_state(self):
+        return {"cookies": []}
+
+    async def new_page(self):
+        return FakePage()
+
+
+class FakePage:
+    url = "https://example.test/cart"
+
+    async def goto(self, url):
+        self.url = url
+
+
+class FakeEntry:
+    healthy = True
+
+
+class FakePool:
+    """BrowserPool stand-in; `har_entries` go into every HAR written on release."""
+
+    def __init__(self):
+        self.released = []
+        self.har_entries = []
+
+    async def acquire(self, **context_options):
+        return FakeEntry(), FakeContext(context_options.get("record_har_path"), self.har_entries)
+
+    async def release(self, entry, context):
+        self.released.append(context)
+        if context.har_path:
+            with open(context.har_path, "w") as f:
+                json.dump({"log": {"entries": context.har_entries}}, f)
+
+
+@pytest.fixture
+def pool():
+    return FakePool()
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import executor_service
+from artifact_store import ArtifactStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = ArtifactStore(str(tmp_path / "store"), max_bytes=0, max_age_seconds=0, workers=2, codec="gzip")
+    yield s
+    s.close()
+
+
+def test_put_dedups_and_reads_ranges_of_compressed_blobs(store, tmp_path):
+    doc = b'{"log": {"entries": [' + b",".join(b'{"n": %d}' % i for i in range(500)) + b"]}}"
+    har = tmp_path / "run1.har"
+    har.write_bytes(doc)
+
+    async def main():
+        first = await store.put_json("run1_dom.json", {"html": "<p>hi</p>"})
+        again = await store.put_json("run2_dom.json", {"html": "<p>hi</p>"})
+        png = await store.put("run1_shot.png", b"\x89PNG" + b"\0" * 2000, "image/png")
+        await store.put_file("run1.har", str(har), "application/json")
+        return first, again, png, await store.read("run1.har", start=10, end=29)
+
+    first, again, png, (meta, chunk) = asyncio.run(main())
+    assert again["dedup"] and again["digest"] == first["digest"]
+    assert store.lookup("run1_shot.png")["encoding"] == "none"  # images stored as they come
+    assert meta["encoding"] == "gzip" and meta["stored"] < meta["size"] == len(doc)
+    assert chunk == doc[10:30]
+    assert not har.exists()  # moved into the store
+    assert store.read_sync("run1.har", start=len(doc) - 3)[1] == doc[-3:]
+    with pytest.raises(KeyError):
+        store.read_sync("missing")
+    assert store.stats()["keys"] == 4 and store.stats()["blobs"] == 3
+
+
+def test_blob_collected_after_the_lookup_reads_as_missing(store, monkeypatch):
+    store.put_sync("run1_dom.json", b'{"html": "<p>hi</p>"}' * 50, "application/json")
+    os.remove(store.lookup("run1_dom.json")["path"])
+    with pytest.raises(KeyError):
+        store.read_sync("run1_dom.json")
+
+    monkeypatch.setattr(executor_service, "artifact_store", store)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(executor_service.get_artifact("run1_dom.json", range_header="bytes=0-9"))
+    assert exc.value.status_code == 404
+
+
+def test_gc_applies_age_then_size_and_deletes_orphans(store):
+    for i in range(4):
+        store.put_sync(f"k{i}", bytes([i]) * 1000, "image/png")
+    store.put_sync("k0_copy", b"\0" * 1000, "image/png")
+    blob = store.lookup("k1")["path"]
+
+    store.max_age_seconds = 60
+    assert store.gc_sync(now=time.time() + 30) == {"expired": 0, "evicted": 0, "blobs_deleted": 0}
+    store.max_age_seconds, store.max_bytes = 0, 2500
+    swept = store.gc_sync()
+    # oldest keys first: dropping k0 frees nothing while k0_copy shares its blob
+    assert swept == {"expired": 0, "evicted": 3, "blobs_deleted": 2}
+    assert [k for k in ("k0", "k1", "k2", "k3", "k0_copy") if store.lookup(k)] == ["k3", "k0_copy"]
+    assert not os.path.exists(blob)
+
+    store.max_bytes, store.max_age_seconds = 0, 60
+    assert store.gc_sync(now=time.time() + 120)["expired"] == 2
+    assert store.stats()["blobs"] == 0
+
+
+def test_stray_hars_outside_the_store_are_swept(tmp_path, monkeypatch):
+    monkeypatch.setattr(executor_service, "ARTIFACT_DIR", str(tmp_path))
+    old, fresh, other = tmp_path / "run1_t.har", tmp_path / "run2_t.har", tmp_path / "notes.txt"
+    for p in (old, fresh, other):
+        p.write_text("{}")
+    past = time.time() - 7200
+    os.utime(old, (past, past))
+    os.utime(other, (past, past))
+
+    assert executor_service.sweep_stray_hars(max_age=3600) == 1
+    assert not old.exists() and fresh.exists() and other.exists()
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+import assertions
+from assertions import expected_pattern, run_assertion
+
+
+class FakePage:
+    """Answers the in-page checks from a body text and the serialized HTML."""
+
+    def __init__(self, text, html):
+        self.text = text
+        self.html = html
+        self.polled = []
+        self.evaluated = []
+
+    async def wait_for_function(self, expression, arg=None, polling=None, timeout=None):
+        self.polled.append(expression)
+        if arg not in self.text:
+            raise TimeoutError(f"Timeout {timeout}ms exceeded")
+
+    async def evaluate(self, expression, arg=None):
+        self.evaluated.append(expression)
+        return arg in self.html
+
+
+def check(page, text):
+    asyncio.run(run_assertion(page, "assert", {"type": "text", "value": text}, None, 500))
+
+
+def test_legacy_assert_polls_text_not_html():
+    page = FakePage("Order confirmed", '<div class="ok">Order confirmed</div>')
+    check(page, "confirmed")
+    assert page.polled == [assertions._TEXT_CONTAINS] and "outerHTML" not in page.polled[0]
+    assert page.evaluated == []
+
+
+def test_legacy_assert_falls_back_to_markup_once():
+    page = FakePage("Order confirmed", '<div class="ok" data-order="A-17">Order confirmed</div>')
+    check(page, 'data-order="A-17"')
+    assert page.evaluated == [assertions._HTML_CONTAINS]
+
+    with pytest.raises(AssertionError, match="Assertion failed: missing not found in page content"):
+        check(page, "missing")
+    assert len(page.evaluated) == 2
+
+
+def test_expected_pattern():
+    assert expected_pattern("$4.00").search("total $4.00 incl.")
+    assert not expected_pattern("$4.00").search("total $4500")
+    assert expected_pattern(r"re:^Order #\d+").search("Order #12")
+    assert expected_pattern(None).search("")
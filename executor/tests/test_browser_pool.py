@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+import browser_pool
+from browser_pool import BrowserPool
+
+
+class FakeBrowser:
+    def __init__(self, launcher):
+        self.launcher = launcher
+        self.connected = True
+        self.closed = False
+        self.handlers = []
+
+    def on(self, event, fn):
+        self.handlers.append(fn)
+
+    def is_connected(self):
+        return self.connected and not self.closed
+
+    async def new_context(self, **options):
+        return FakeContext()
+
+    async def close(self):
+        self.closed = True
+
+    def crash(self):
+        self.connected = False
+        for fn in self.handlers:
+            fn(self)
+
+
+class FakeContext:
+    async def close(self):
+        pass
+
+
+class FakeChromium:
+    def __init__(self):
+        self.launched = []
+        self.fail = 0  # launches that raise before one succeeds
+        self.delay = 0.0
+
+    async def launch(self, **options):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("chromium exited")
+        b = FakeBrowser(self)
+        self.launched.append(b)
+        return b
+
+
+class FakePlaywright:
+    def __init__(self, chromium):
+        self.chromium = chromium
+        self.stopped = False
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def chromium(monkeypatch):
+    c = FakeChromium()
+    monkeypatch.setattr(browser_pool, "async_playwright", lambda: FakePlaywright(c))
+    return c
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_recycles_after_serving_and_spreads_load(chromium):
+    async def main():
+        pool = BrowserPool(size=2, contexts_per_browser=2, recycle_after=2)
+        held = [await pool.acquire() for _ in range(2)]
+        assert [b["active"] for b in pool.stats()["per_browser"]] == [1, 1]  # least loaded first
+        for entry, ctx in held:
+            await pool.release(entry, ctx)
+        held = [await pool.acquire() for _ in range(2)]  # second context each: both retire
+        for entry, ctx in held:
+            await pool.release(entry, ctx)
+        await settle()
+        stats = pool.stats()
+        assert stats["recycled_total"] == 2 and stats["browsers"] == 2 and len(chromium.launched) == 4
+        assert all(b.closed for b in chromium.launched[:2])
+        await pool.stop()
+
+    asyncio.run(main())
+
+
+def test_waits_at_capacity_and_replaces_crashed_browsers(chromium):
+    async def main():
+        pool = BrowserPool(size=1, contexts_per_browser=1)
+        entry, ctx = await pool.acquire()
+        waiter = asyncio.ensure_future(pool.acquire())
+        await settle()
+        assert not waiter.done() and pool.stats()["waiting"] == 1
+
+        entry.browser.crash()  # busy browsers are replaced once their last context is released
+        assert pool.stats()["crashed_total"] == 1 and len(chromium.launched) == 1
+        await pool.release(entry, ctx)
+        new_entry, new_ctx = await asyncio.wait_for(waiter, 1)
+        assert new_entry.browser is chromium.launched[1] and pool.stats()["in_use"] == 1
+        await pool.release(new_entry, new_ctx)
+        await pool.stop()
+
+    asyncio.run(main())
+
+
+def test_relaunch_retries_with_backoff_then_reports_lost_slots(chromium):
+    async def main():
+        pool = BrowserPool(size=2, relaunch_attempts=3, relaunch_backoff=0.01)
+        await pool.start()
+        chromium.fail = 2
+        chromium.launched[0].crash()
+        await asyncio.sleep(0.1)
+        stats = pool.stats()
+        assert stats["browsers"] == 2 and stats["relaunch_failures_total"] == 2 and stats["browsers_lost"] == 0
+
+        chromium.fail = 3
+        chromium.launched[1].crash()
+        await asyncio.sleep(0.1)
+        stats = pool.stats()
+        assert stats["browsers"] == 1 and stats["browsers_lost"] == 1 and stats["browsers_replacing"] == 0
+        await pool.stop()
+
+    asyncio.run(main())
+
+
+def test_stop_cancels_pending_relaunches(chromium):
+    async def main():
+        pool = BrowserPool(size=1)
+        await pool.start()
+        chromium.delay = 0.2
+        chromium.launched[0].crash()
+        await settle()
+        assert pool.stats()["browsers_replacing"] == 1
+        await pool.stop()
+        await asyncio.sleep(0.3)
+        assert pool.stats()["browsers"] == 0 and not pool._replace_tasks
+        assert len(chromium.launched) == 1  # the relaunch never finished
+
+    asyncio.run(main())
@@ -0,0 +1,37 @@
+import pytest
+
+from matrix import expand
+
+IR = {
+    "test_id": "signup",
+    "steps": [
+        {"action": "goto", "target": {"type": "url", "value": "https://shop.test/{{locale}}/signup"}},
+        {"action": "type", "target": {"type": "selector", "value": "#email"}, "value": "{{ email }}"},
+        {"action": "assert", "target": {"type": "text", "value": "{{msg}}"}, "timeout_ms": 500},
+    ],
+    "meta": {"network": {"fast": True}, "matrix": {
+        "rows": [{"email": "a@x.test", "msg": "Welcome"}, {"email": "bad", "msg": "Invalid email"}],
+        "axes": {"locale": ["en", "de"]},
+    }},
+}
+
+
+def test_rows_cross_axes_and_fill_placeholders():
+    rows = expand(IR, max_rows=10)
+    assert [r["email"] + "/" + r["locale"] for r, _ in rows] == ["a@x.test/en", "a@x.test/de", "bad/en", "bad/de"]
+    row, ir = rows[1]
+    assert ir["steps"][0]["target"]["value"] == "https://shop.test/de/signup"
+    assert ir["steps"][1]["value"] == "a@x.test" and ir["steps"][2]["target"]["value"] == "Welcome"
+    assert ir["steps"][2]["timeout_ms"] == 500
+    assert ir["meta"] == {"network": {"fast": True}}  # row runs carry no matrix
+    assert IR["steps"][1]["value"] == "{{ email }}"  # the request's own TestIR is untouched
+
+
+def test_unknown_placeholders_and_limits_are_errors():
+    bad = dict(IR, steps=IR["steps"] + [{"action": "type", "value": "{{pasword}}"}])
+    with pytest.raises(ValueError, match="no value for pasword"):
+        expand(bad, max_rows=10)
+    with pytest.raises(ValueError, match="expands to 4 rows"):
+        expand(IR, max_rows=3)
+    with pytest.raises(ValueError):
+        expand(dict(IR, meta={"matrix": {"axes": {"locale": []}}}), max_rows=10)
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import pytest
+
+from network_policy import NetworkPolicy
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type="fetch"):
+        self.url = url
+        self.resource_type = resource_type
+
+
+class FakeRoute:
+    def __init__(self):
+        self.outcome = None
+
+    async def fulfill(self, **kwargs):
+        self.outcome = ("fulfill", kwargs)
+
+    async def abort(self, reason):
+        self.outcome = ("abort", reason)
+
+    async def continue_(self):
+        self.outcome = ("continue", None)
+
+
+def handle(policy, url, resource_type="fetch"):
+    route = FakeRoute()
+    asyncio.run(policy._handle(route, FakeRequest(url, resource_type)))
+    return route.outcome
+
+
+def test_on_failure_har_runs_are_not_leased():
+    assert not NetworkPolicy.from_meta({"network": {"har": "on_failure"}}).lease_on_failure
+    assert NetworkPolicy.from_meta({"network": {"har": "full"}}).lease_on_failure
+    assert NetworkPolicy.from_meta(None).lease_on_failure
+    with pytest.raises(ValueError):
+        NetworkPolicy(har="sometimes")
+
+
+def test_fast_mode_blocks_assets_and_analytics_subdomains():
+    policy = NetworkPolicy.from_meta({"network": {"fast": True}})
+    assert policy.routes
+    assert handle(policy, "https://shop.test/logo.png", "image")[0] == "abort"
+    assert handle(policy, "https://www.google-analytics.com/collect")[0] == "abort"
+    assert handle(policy, "https://shop.test/api/cart")[0] == "continue"
+    assert handle(policy, "data:text/plain,hi")[0] == "continue"
+    assert policy.stats() == {"allowed": 2, "blocked": 2, "stubbed": 0, "har": "full"}
+
+
+def test_allow_list_and_stubs():
+    policy = NetworkPolicy.from_meta({"network": {
+        "allow_domains": ["shop.test"],
+        "stubs": [{"url": "**/api/flags*", "json": {"beta": False}, "status": 201}],
+    }})
+    assert handle(policy, "https://cdn.other.test/app.js")[0] == "abort"
+    assert handle(policy, "https://api.shop.test/v1")[0] == "continue"
+    kind, kwargs = handle(policy, "https://cdn.other.test/api/flags?v=2")
+    assert kind == "fulfill" and kwargs["status"] == 201
+    assert kwargs["content_type"] == "application/json" and json.loads(kwargs["body"]) == {"beta": False}
+    assert not NetworkPolicy().routes
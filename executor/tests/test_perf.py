@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import executor_service
+from artifact_store import ArtifactStore
+from perf import analyze_har, budget_error, check_budgets, iter_har_entries, perf_options, summarize
+from session_store import SessionStore
+
+
+def entry(i, url="https://shop.test/api/items/1", status=200, mime="application/json", size=1024, took=10.0):
+    return {"request": {"method": "GET", "url": url},
+            "response": {"status": status, "_transferSize": size, "content": {"mimeType": mime, "size": size}},
+            "time": took, "timings": {"wait": took - 2, "receive": 2, "ssl": -1}, "_i": i,
+            "comment": 'tricky "entries": [ inside a string'}
+
+
+def write_har(path, entries):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"log": {"version": "1.2", "pages": [{"id": "p"}], "entries": entries}}, f, indent=1)
+
+
+def test_iter_har_entries_streams_across_chunk_boundaries(tmp_path):
+    path = str(tmp_path / "run.har")
+    entries = [entry(i, url=f"https://shop.test/{'x' * (i * 37)}") for i in range(60)]
+    write_har(path, entries)
+    for chunk_size in (7, 64, 1 << 16):
+        assert [e["_i"] for e in iter_har_entries(path, chunk_size)] == list(range(60))
+
+    write_har(path, [])
+    assert list(iter_har_entries(path, 8)) == []
+    with open(path, "w") as f:
+        f.write('{"log": {"entries": [{"time": 1}, {"time": ')
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_har_entries(path, 8))
+
+
+def test_analyze_har_totals_types_and_slowest(tmp_path):
+    path = str(tmp_path / "run.har")
+    write_har(path, [
+        entry(0, "https://shop.test/", mime="text/html", size=2048, took=120),
+        entry(1, "https://shop.test/app.js", mime="application/javascript", size=512 * 1024, took=300),
+        entry(2, "https://shop.test/api/items/1", took=50),
+        entry(3, "https://shop.test/api/items/2", status=500, took=80),
+        entry(4, "https://cdn.test/logo.png", status=0, mime="image/png", size=0, took=5),
+    ])
+    har = analyze_har(path, pattern=lambda url: url.rsplit("/", 1)[0] + "/:id" if "/api/" in url else url, top=2)
+    assert har["requests"] == 5 and har["failed_requests"] == 2
+    assert har["by_type"]["script"] == {"requests": 1, "kb": 512.0}
+    assert har["by_type"]["xhr"]["requests"] == 2 and har["by_type"]["image"]["kb"] == 0
+    assert [r["time_ms"] for r in har["slowest_requests"]] == [300, 120]
+    assert har["timing_ms"]["ssl"] == 0 and har["timing_ms"]["receive"] == 10
+    # top=2: the two endpoints with the slowest single request
+    assert [e["endpoint"] for e in har["slowest_endpoints"]] == ["GET https://shop.test/app.js", "GET https://shop.test/"]
+
+
+def test_budgets():
+    opts = perf_options({"budgets": {"js_kb": 100, "lcp_ms": 2500, "image_kb": 10, "requests": 3}})
+    assert opts["budgets"] == {"script_kb": 100, "lcp_ms": 2500, "image_kb": 10, "requests": 3}
+    assert perf_options({}) is None and perf_options({"perf": True}) == {"budgets": {}}
+    with pytest.raises(ValueError):
+        perf_options({"budgets": {"bogus_kb": 1}})
+
+    har = {"requests": 5, "failed_requests": 0, "total_kb": 600.0,
+           "by_type": {"script": {"requests": 1, "kb": 512.0}}}
+    summary = summarize([{"lcp_ms": 1800}, {"lcp_ms": 2600, "cls": 0.01}], har)
+    assert summary["lcp_ms"] == 2600 and summary["script_kb"] == 512.0 and summary["navigations"] == 2
+
+    checked = check_budgets(summary, opts["budgets"], har_available=True)
+    assert {v["metric"] for v in checked["violations"]} == {"script_kb", "lcp_ms", "requests"}
+    assert "script_kb" in budget_error(checked["violations"])
+    # without a HAR the byte and request budgets can't be judged
+    checked = check_budgets(summarize([{"lcp_ms": 100}], None), opts["budgets"], har_available=False)
+    assert not checked["violations"] and set(checked["skipped"]) == {"script_kb", "image_kb", "requests"}
+
+
+@pytest.fixture
+def executor(pool, tmp_path, monkeypatch):
+    """executor_service over the fake pool: every run fails at its first step."""
+    async def run_steps(page, steps, result, artifact_prefix, start=0, stop=None, test_ir=None):
+        result.update(status="failed", error="element not found", failed_step_index=start)
+        return start
+
+    store = SessionStore(pool, lease_seconds=60, on_close=executor_service.store_leased_har)
+    artifacts = ArtifactStore(str(tmp_path / "store"), workers=1)
+    monkeypatch.setattr(executor_service, "session_store", store)
+    monkeypatch.setattr(executor_service, "artifact_store", artifacts)
+    monkeypatch.setattr(executor_service, "ARTIFACT_DIR", str(tmp_path))
+    monkeypatch.setattr(executor_service, "run_steps", run_steps)
+    pool.har_entries = [entry(i) for i in range(3)]
+    yield executor_service
+    artifacts.close()
+
+
+def run(service, meta):
+    ir = service.TestIR(test_id="t1", steps=[{"action": "click", "target": {"value": "#buy"}}], meta=meta)
+    return asyncio.run(service._execute_test_ir("run1", ir, lease=True))
+
+
+def test_failed_perf_run_is_not_leased_and_reports_har_metrics(executor):
+    result = run(executor, {"budgets": {"requests": 2}})
+    assert result["status"] == "failed" and "session_id" not in result
+    assert result["perf"]["summary"]["requests"] == 3
+    assert result["perf"]["budgets"]["violations"] == [{"metric": "requests", "value": 3, "budget": 2.0}]
+    assert executor.artifact_store.lookup(result["artifacts"]["har_key"]) is not None
+
+
+def test_failed_on_failure_har_run_returns_its_har(executor):
+    result = run(executor, {"network": {"har": "on_failure"}})
+    assert "session_id" not in result
+    assert executor.artifact_store.lookup(result["artifacts"]["har_key"]) is not None
+
+
+def test_leased_run_stores_its_har_when_the_lease_ends(executor):
+    result = run(executor, {})
+    key = result["artifacts"]["har_key"]
+    assert result["session_id"] and executor.artifact_store.lookup(key) is None
+
+    asyncio.run(executor.session_store.stop())
+    meta, body = executor.artifact_store.read_sync(key)
+    assert len(json.loads(body)["log"]["entries"]) == 3
+
+
+def test_runs_are_leased_only_on_request_and_released_by_delete(executor):
+    ir = executor.TestIR(test_id="t1", steps=[{"action": "click", "target": {"value": "#buy"}}])
+    assert "session_id" not in asyncio.run(executor._execute_test_ir("run0", ir))
+
+    result = run(executor, {})
+    key = result["artifacts"]["har_key"]
+    assert asyncio.run(executor.release_session(result["session_id"])) == {"released": result["session_id"]}
+    assert executor.artifact_store.lookup(key) is not None and not executor.session_store.snapshots
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(executor.release_session(result["session_id"]))
+    assert exc.value.status_code == 404
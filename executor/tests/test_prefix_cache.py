@@ -0,0 +1,42 @@
+import time
+
+from executor_service import Step
+from prefix_cache import PrefixCache, cache_options, prefix_hashes
+
+LOGIN = [
+    Step(action="goto", value=None, target={"type": "url", "value": "https://shop.test/login"}),
+    Step(action="type", target={"type": "selector", "value": "#email"}, value="a@x.test"),
+    Step(action="click", target={"type": "selector", "value": "#submit"}),
+]
+
+
+def test_prefix_hashes_chain_and_ignore_timeouts():
+    hashes = prefix_hashes(LOGIN)
+    assert len(hashes) == 3 and len(set(hashes)) == 3
+    slower = [s.model_copy(update={"timeout_ms": 30000}) for s in LOGIN]
+    assert prefix_hashes(slower) == hashes
+    # a non-cacheable action ends the chain
+    assert prefix_hashes(LOGIN[:1] + [Step(action="assert", target={"value": "Hi"})] + LOGIN[1:]) == hashes[:1]
+
+
+def test_longest_cached_prefix_wins_and_entries_expire():
+    cache = PrefixCache(ttl_seconds=60, max_entries=2)
+    assert cache.store(LOGIN, 1, {"cookies": []}, "https://shop.test/login")
+    key = cache.store(LOGIN, 3, {"cookies": [{"name": "sid"}]}, "https://shop.test/account")
+    test = LOGIN + [Step(action="click", target={"type": "selector", "value": "#orders"})]
+    n, hit, entry = cache.lookup(test)
+    assert (n, hit, entry["url"]) == (3, key, "https://shop.test/account")
+
+    cache.entries[key]["expires_at"] = time.monotonic() - 1
+    assert cache.lookup(test)[0] == 1 and key not in cache.entries
+    assert cache.store(LOGIN + [Step(action="assert", target={"value": "x"})], 4, {}, "") is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_lru_eviction_and_options():
+    cache = PrefixCache(max_entries=2)
+    keys = [cache.store(LOGIN, n, {}, f"u{n}") for n in (1, 2, 3)]
+    assert list(cache.entries) == keys[1:]
+    assert cache_options({"prefix_cache": {"steps": 3}}) == (True, 3)
+    assert cache_options({"prefix_cache": True}) == (True, None)
+    assert cache_options({}) == (False, None)
@@ -0,0 +1,106 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+from replay_cache import ReplayCache, ReplayPolicy, normalize_query
+
+
+def har_entry(url, body, method="GET", status=200, post=None, encoding=None):
+    content = {"text": base64.b64encode(body).decode() if encoding else body.decode(), "mimeType": "application/json"}
+    if encoding:
+        content["encoding"] = encoding
+    req = {"method": method, "url": url}
+    if post is not None:
+        req["postData"] = {"text": post}
+    headers = [{"name": "Content-Type", "value": "application/json"}, {"name": "Content-Encoding", "value": "br"}]
+    return {"request": req, "response": {"status": status, "headers": headers, "content": content}}
+
+
+HAR = {"log": {"entries": [
+    har_entry("https://shop.test/api/items?page=1&ts=1", b'{"page": 1}'),
+    har_entry("https://shop.test/api/items?ts=2&page=2", b'{"page": 2}'),
+    har_entry("https://shop.test/api/cart", b'{"ok": true}', method="POST", post='{"sku": 1}'),
+    har_entry("https://shop.test/logo.png", b"\x89PNG", encoding="base64"),
+    har_entry("https://ads.test/pixel", b"", status=0),
+]}}
+
+
+def test_ingest_and_match_rules(tmp_path):
+    path = tmp_path / "run.har"
+    path.write_text(json.dumps(HAR))
+    cache = ReplayCache(str(tmp_path / "replay"))
+    assert cache.ingest_har(str(path)) == 4  # the aborted request has nothing to replay
+
+    cache = ReplayCache(str(tmp_path / "replay"))  # reloaded from disk
+    entry = cache.lookup("GET", "https://shop.test/api/items?page=2&ts=99", None, ["method", "query"], ["ts"])
+    assert cache.get_blob(entry["blob"]) == b'{"page": 2}'
+    assert "Content-Encoding" not in entry["headers"]  # the stored body is decoded
+    assert cache.lookup("GET", "https://shop.test/api/items?page=3", None, ["query"], ["ts"]) is None
+    assert cache.get_blob(cache.lookup("GET", "https://shop.test/logo.png", None, [])["blob"]) == b"\x89PNG"
+
+    assert cache.lookup("POST", "https://shop.test/api/cart", b'{"sku": 2}', ["method", "body"]) is None
+    assert cache.lookup("POST", "https://shop.test/api/cart", b'{"sku": 1}', ["method", "body"])["status"] == 200
+    assert cache.lookup("GET", "https://shop.test/api/cart", None, ["method"]) is None
+    assert normalize_query("b=2&a=1&_=3", ["_"]) == "a=1&b=2"
+
+
+def test_latest_recording_wins():
+    cache = ReplayCache()
+    cache.ingest_har_json({"log": {"entries": [har_entry("https://shop.test/api/me", b'{"v": 1}')]}})
+    cache.ingest_har_json({"log": {"entries": [har_entry("https://shop.test/api/me", b'{"v": 2}')]}})
+    assert cache.stats() == {"urls": 1, "entries": 1}
+    assert cache.get_blob(cache.lookup("GET", "https://shop.test/api/me", None, ["method"])["blob"]) == b'{"v": 2}'
+
+
+def test_ingest_publishes_a_new_index_and_leaves_the_old_one_intact():
+    cache = ReplayCache()
+    cache.ingest_har_json({"log": {"entries": [har_entry("https://shop.test/api/me", b'{"v": 1}')]}})
+    before = cache.index
+    entries = before["https://shop.test/api/me"]
+    cache.ingest_har_json({"log": {"entries": [har_entry("https://shop.test/api/me", b'{"v": 2}'),
+                                               har_entry("https://shop.test/api/cart", b"[]")]}})
+    assert cache.index is not before and list(before) == ["https://shop.test/api/me"]
+    assert before["https://shop.test/api/me"] is entries and len(entries) == 1
+    assert cache.get_blob(entries[0]["blob"]) == b'{"v": 1}'
+    assert cache.stats() == {"urls": 2, "entries": 2}
+
+
+class Route:
+    def __init__(self):
+        self.outcome = None
+
+    async def fulfill(self, **kwargs):
+        self.outcome = ("fulfill", kwargs.get("status"))
+
+    async def abort(self, reason):
+        self.outcome = ("abort", reason)
+
+    async def fallback(self):
+        self.outcome = ("fallback", None)
+
+
+class Request:
+    def __init__(self, url, method="GET"):
+        self.url, self.method, self.post_data_buffer = url, method, None
+
+
+@pytest.mark.parametrize("fallback, miss", [("network", ("fallback", None)), ("404", ("fulfill", 404)),
+                                            ("abort", ("abort", "internetdisconnected"))])
+def test_policy_serves_hits_and_applies_the_fallback(fallback, miss):
+    cache = ReplayCache()
+    cache.ingest_har_json(HAR)
+    policy = ReplayPolicy(cache, match=["method"], fallback=fallback)
+
+    def handle(url):
+        route = Route()
+        asyncio.run(policy._handle(route, Request(url)))
+        return route.outcome
+
+    assert handle("https://shop.test/logo.png") == ("fulfill", 200)
+    assert handle("https://shop.test/missing") == miss
+    assert handle("data:image/png;base64,xx") == ("fallback", None)
+    assert policy.stats()["hits"] == 1 and policy.stats()["misses"] == 1
+    with pytest.raises(ValueError):
+        ReplayPolicy(cache, match=["headers"])
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import time
+
+import executor_service
+from session_store import SessionStore
+
+
+def store_with_hook(pool, **kwargs):
+    closed = []
+
+    async def on_close(session):
+        closed.append(session.id)
+
+    return SessionStore(pool, on_close=on_close, **kwargs), closed
+
+
+def test_expired_and_evicted_leases_reach_on_close(pool):
+    async def main():
+        store, closed = store_with_hook(pool, lease_seconds=60, max_sessions=1)
+        first = await store.lease(await store.open("run1"))
+        second = await store.lease(await store.open("run2"))
+        assert closed == [first]  # evicted to respect max_sessions
+
+        store.sessions[second].expires_at = time.monotonic() - 1
+        await store.sweep()
+        assert closed == [first, second] and not store.sessions
+        await store.stop()
+
+    asyncio.run(main())
+
+
+def test_live_resume_hands_the_session_back_without_closing(pool):
+    async def main():
+        store, closed = store_with_hook(pool, lease_seconds=60)
+        session = await store.open("run1")
+        sid = await store.lease(session)
+        assert await store.resume(sid) is session
+        await store.close(session)  # the run path closes it and handles the HAR itself
+        assert closed == [] and store.pool.released == [session.context]
+
+        other = await store.lease(await store.open("run2"))
+        await store.stop()
+        assert closed == [other]
+
+    asyncio.run(main())
+
+
+def test_leased_har_is_stored_under_the_reported_key(pool, tmp_path, monkeypatch):
+    stored = {}
+
+    class Store:
+        async def put_file(self, key, path, content_type):
+            with open(path) as f:
+                stored[key] = f.read()
+            os.remove(path)
+
+    monkeypatch.setattr(executor_service, "artifact_store", Store())
+
+    async def main():
+        store = SessionStore(pool, lease_seconds=60, on_close=executor_service.store_leased_har)
+        kept = await store.open("run1", record_har_path=str(tmp_path / "run1.har"))
+        kept.har_key = "run1.har"
+        dropped = await store.open("run2", record_har_path=str(tmp_path / "run2.har"))
+        await store.lease(kept)
+        await store.lease(dropped)
+        await store.stop()
+
+    asyncio.run(main())
+    assert list(stored) == ["run1.har"] and "entries" in stored["run1.har"]
+    assert not os.listdir(tmp_path)
@@ -0,0 +1,86 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from visual import DEFAULTS, BaselineStore, compare_png, heatmap, image_hashes, visual_options
+
+
+def png(pixels, fmt_kwargs=None):
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="PNG", **(fmt_kwargs or {}))
+    return buf.getvalue()
+
+
+def page(height=128, width=128):
+    """A striped page so the hashes have structure to work with."""
+    px = np.full((height, width, 3), 250, dtype=np.uint8)
+    px[::16] = (20, 40, 60)
+    px[:, ::24] = (200, 30, 30)
+    return px
+
+
+def test_identical_bytes_and_identical_pixels_skip_the_diff():
+    base = page()
+    assert compare_png(png(base), png(base), [], DEFAULTS)["stage"] == "bytes"
+    # same pixels, different encoding
+    res = compare_png(png(base), png(base, {"compress_level": 0}), [], DEFAULTS)
+    assert res["stage"] == "pixels" and res["passed"] and res["heatmap"] is None
+    assert res["dhash_distance"] == 0 and res["phash_distance"] == 0
+
+
+def test_small_concentrated_change_fails_on_its_tile():
+    base = page()
+    actual = base.copy()
+    actual[40:50, 40:50] = (0, 0, 0)  # 100 px: 0.6% of the page, 25% of the 16 px tile at (32, 32)
+    opts = dict(DEFAULTS, max_diff_ratio=0.05, tile=16)
+    res = compare_png(png(base), png(actual), [], opts)
+    assert res["stage"] == "diff" and not res["passed"]
+    assert res["diff_pixels"] == 100 and res["diff_ratio"] < 0.05
+    assert res["failed_tiles"] == 1 and res["changed_tiles"] == 4 and res["max_tile_ratio"] == 0.25
+    assert Image.open(io.BytesIO(res["heatmap"])).size == (128, 128)
+
+    assert compare_png(png(base), png(actual), [], dict(opts, tile=32))["passed"]  # 100 / 1024 per tile
+
+    hashed = compare_png(png(base), png(actual), [], dict(opts, hash_precheck=True))
+    hashes_match = hashed["dhash_distance"] == 0 and hashed["phash_distance"] == 0
+    assert (hashed["stage"] == "hash") == hashes_match
+
+
+def test_heatmap_fades_light_pages_without_wrapping():
+    gray = np.full((16, 16, 3), 200, dtype=np.uint8)
+    none = np.zeros((16, 16), dtype=bool)
+    out = np.asarray(Image.open(io.BytesIO(heatmap(gray, none, none, np.zeros((1, 1), dtype=bool), 16))))
+    # (200 + 2 * 200 + 200) / 4 = 200, squeezed into 160..243
+    assert (out == 226).all()
+
+
+def test_ignored_regions_and_threshold():
+    base = page()
+    actual = base.copy()
+    actual[0:20, 0:64] = (0, 0, 0)
+    actual[100:110, 100:110] -= 10  # below the 0.1 * 255 per-channel threshold
+    res = compare_png(png(base), png(actual), [[0, 0, 64, 20]], DEFAULTS)
+    assert res["passed"] and res["diff_pixels"] == 0 and res["heatmap"] is None
+
+    res = compare_png(png(base), png(actual), [], dict(DEFAULTS, threshold=0.01))
+    assert not res["passed"] and res["diff_pixels"] == 64 * 20 + 100
+
+
+def test_size_change_counts_the_uncovered_area():
+    base = page(128, 128)
+    res = compare_png(png(base), png(page(160, 128)), [], DEFAULTS)
+    assert not res["passed"] and res["diff_pixels"] == 32 * 128
+    assert res["size"] == [128, 160] and res["baseline_size"] == [128, 128]
+
+
+def test_options_and_baseline_store(tmp_path):
+    opts = visual_options({"visual": {"threshold": 0.2, "tile": 16, "bogus": 1}}, {"tile": 8, "mask": [".ad"]})
+    assert opts["threshold"] == 0.2 and opts["tile"] == 8 and opts["mask"] == [".ad"] and "bogus" not in opts
+
+    shot = png(page())
+    store = BaselineStore(str(tmp_path))
+    store.put("checkout/cart", shot, image_hashes(shot))
+    entry = BaselineStore(str(tmp_path)).get("checkout/cart")
+    assert entry["width"] == 128 and open(entry["path"], "rb").read() == shot
+    assert store.get("checkout/none") is None
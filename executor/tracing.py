@@ -0,0 +1,260 @@
+"""
+Span-style timing and Prometheus text-format metrics.
+
+    trace = Trace(trace_id)              # one per task / executor run
+    token = use_trace(trace)
+    with span("executor_call", EXECUTOR_CALL_SECONDS.labels(outcome="ok")) as attrs:
+        attrs["attempt"] = 1
+    reset_trace(token)
+
+`span()` records into the trace active in the current context (contextvars, so
+concurrent runs don't mix) and optionally observes a histogram.
+
+This file exists twice, as agent/utils/tracing.py and executor/tracing.py, because
+each service's image is built from its own directory. Edit both copies;
+agent/tests/test_tracing.py fails when they differ.
+"""
+
+# Why not a shared package: docker-compose builds the agent from ./agent and the
+# executor from ./executor, and each Dockerfile only does `COPY . .` of its own
+# context, so code outside those directories never reaches either image.
+
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TRACE_HEADER = "X-Trace-Id"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+# -----------------------------
+# traces
+# -----------------------------
+
+class Trace:
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started = time.monotonic()
+        self.spans: List[Dict[str, Any]] = []
+
+    def add(self, name: str, start: float, duration: float, **attrs):
+        self.spans.append(dict(
+            name=name,
+            start_ms=round((start - self.started) * 1000, 1),
+            duration_ms=round(duration * 1000, 1),
+            **attrs,
+        ))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"trace_id": self.trace_id, "spans": self.spans}
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+def use_trace(trace: Trace):
+    return _current.set(trace)
+
+
+def reset_trace(token):
+    _current.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, histogram=None, **attrs):
+    """Time a block; yields its attrs dict so the block can add to it."""
+    start = time.monotonic()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        duration = time.monotonic() - start
+        if histogram is not None:
+            histogram.observe(duration)
+        trace = _current.get()
+        if trace is not None:
+            trace.add(name, start, duration, **attrs)
+
+
+# -----------------------------
+# metrics
+# -----------------------------
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    return "+Inf" if v == float("inf") else repr(float(v))
+
+
+class _Bound:
+    def __init__(self, metric, key: Tuple[str, ...]):
+        self._metric = metric
+        self._key = key
+
+    def __getattr__(self, attr):
+        fn = getattr(self._metric, f"_{attr}")
+        return lambda *a: fn(self._key, *a)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def labels(self, **labels) -> _Bound:
+        return _Bound(self, tuple(str(labels.get(n, "")) for n in self.labelnames))
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def _inc(self, key, amount: float = 1):
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def inc(self, amount: float = 1):
+        self._inc((), amount)
+
+    def render(self) -> List[str]:
+        return self.header() + [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}"
+                                for k, v in self.values.items()]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def __init__(self, *a, fn: Optional[Callable[[], float]] = None, **kw):
+        super().__init__(*a, **kw)
+        self.fn = fn  # sampled at render time
+
+    def _dec(self, key, amount: float = 1):
+        self._inc(key, -amount)
+
+    def _set(self, key, value: float):
+        self.values[key] = value
+
+    def dec(self, amount: float = 1):
+        self._dec((), amount)
+
+    def set(self, value: float):
+        self._set((), value)
+
+    def render(self) -> List[str]:
+        if self.fn is not None:
+            try:
+                self.values[()] = float(self.fn())
+            except Exception:
+                pass
+        return super().render()
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, *a, buckets=DEFAULT_BUCKETS, **kw):
+        super().__init__(*a, **kw)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.values: Dict[Tuple[str, ...], List[float]] = {}  # bucket counts..., sum, count
+
+    def _observe(self, key, value: float):
+        v = self.values.get(key)
+        if v is None:
+            v = self.values[key] = [0] * (len(self.buckets) + 2)
+        for i, ub in enumerate(self.buckets):
+            if value <= ub:
+                v[i] += 1
+                break
+        v[-2] += value
+        v[-1] += 1
+
+    def observe(self, value: float):
+        self._observe((), value)
+
+    def render(self) -> List[str]:
+        out = self.header()
+        for key, v in self.values.items():
+            cumulative = 0
+            for i, ub in enumerate(self.buckets):
+                cumulative += v[i]
+                le = _fmt_labels(self.labelnames, key, f'le="{_fmt_value(ub)}"')
+                out.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _fmt_labels(self.labelnames, key)
+            out.append(f"{self.name}_sum{labels} {_fmt_value(v[-2])}")
+            out.append(f"{self.name}_count{labels} {v[-1]}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames=(), fn=None) -> Gauge:
+        return self._add(Gauge(name, help, labelnames, fn=fn))
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets=buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self.metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def instrument_app(app, registry: Registry, prefix: str):
+    """HTTP latency histogram + in-flight gauge for a FastAPI app, keyed by route template."""
+    in_flight = registry.gauge(f"{prefix}_http_requests_in_flight", "HTTP requests being served")
+    latency = registry.histogram(f"{prefix}_http_request_duration_seconds", "HTTP request latency",
+                                 ("method", "route", "status"))
+
+    @app.middleware("http")
+    async def _metrics_middleware(request, call_next):
+        in_flight.inc()
+        start = time.monotonic()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            in_flight.dec()
+            route = request.scope.get("route")
+            latency.labels(method=request.method, route=getattr(route, "path", "unmatched"),
+                           status=status).observe(time.monotonic() - start)
@@ -0,0 +1,268 @@
+"""
+Visual regression: compare a screenshot with a stored baseline.
+
+    {"action": "assert_screenshot", "value": "cart"}                                  # full page
+    {"action": "assert_screenshot", "value": "cart-total",
+     "target": {"type": "selector", "value": "#total", "mask": [".ad", "#clock"],
+                "ignore": [[0, 0, 300, 40]], "max_diff_ratio": 0.002}}
+
+Defaults come from `meta.visual` and can be overridden per step in `target`:
+
+    threshold       0.1    per-pixel change: max channel delta as a fraction of 255
+    max_diff_ratio  0.001  changed share of the compared (unmasked) pixels
+    max_tile_ratio  0.2    changed share of any single tile (catches small, concentrated changes)
+    tile            32     tile edge in pixels
+    mask / ignore          selectors / [x, y, w, h] rectangles left out of the diff
+    hash_precheck   false  pass when dHash and pHash both match, without a pixel diff
+    update          false  overwrite the baseline with this screenshot
+
+The pipeline stops at the first conclusive stage: identical bytes, identical
+decoded pixels, (opt-in) identical perceptual hashes, then a vectorized
+tile-based diff, which also renders a heatmap (changed pixels red, ignored
+regions blue, failing tiles outlined). compare_png() is self-contained so it can
+run in a process pool. Perceptual hashes are reported either way, but only skip
+the pixel diff on request: an 8x8 hash can't see a changed price on a long page.
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+DEFAULTS = {"threshold": 0.1, "max_diff_ratio": 0.001, "max_tile_ratio": 0.2, "tile": 32,
+            "hash_precheck": False, "update": False}
+OPTION_KEYS = tuple(DEFAULTS) + ("mask", "ignore")
+
+
+def visual_options(meta: Optional[Dict[str, Any]], target: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """meta.visual merged over the defaults, then the step's own overrides."""
+    opts = dict(DEFAULTS, mask=[], ignore=[])
+    for src in ((meta or {}).get("visual") or {}, target or {}):
+        opts.update({k: v for k, v in src.items() if k in OPTION_KEYS})
+    return opts
+
+
+# -----------------------------
+# perceptual hashes
+# -----------------------------
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    m = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m
+
+_DCT32 = _dct_matrix(32)
+
+
+def _bits_hex(bits: np.ndarray) -> str:
+    return f"{int(''.join('1' if b else '0' for b in bits.ravel()), 2):016x}"
+
+
+def dhash(img: Image.Image) -> str:
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 thumbnail."""
+    px = np.asarray(img.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    return _bits_hex(px[:, 1:] > px[:, :-1])
+
+
+def phash(img: Image.Image) -> str:
+    """64-bit perceptual hash: low 8x8 DCT coefficients of a 32x32 thumbnail vs. their median."""
+    px = np.asarray(img.convert("L").resize((32, 32), Image.BILINEAR), dtype=np.float64)
+    low = (_DCT32 @ px @ _DCT32.T)[:8, :8].ravel()
+    return _bits_hex(low > np.median(low[1:]))
+
+
+def hamming(a: Optional[str], b: Optional[str]) -> Optional[int]:
+    if not a or not b:
+        return None
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def image_hashes(png: bytes) -> Dict[str, Any]:
+    img = Image.open(io.BytesIO(png))
+    return {"sha256": hashlib.sha256(png).hexdigest(), "width": img.width, "height": img.height,
+            "dhash": dhash(img), "phash": phash(img)}
+
+
+# -----------------------------
+# pixel diff
+# -----------------------------
+
+def ignore_mask(height: int, width: int, rects: Sequence[Sequence[float]]) -> np.ndarray:
+    mask = np.zeros((height, width), dtype=bool)
+    for x, y, w, h in rects:
+        x0, y0 = max(0, int(x)), max(0, int(y))
+        x1, y1 = min(width, int(np.ceil(x + w))), min(height, int(np.ceil(y + h)))
+        if x1 > x0 and y1 > y0:
+            mask[y0:y1, x0:x1] = True
+    return mask
+
+
+def changed_pixels(a: np.ndarray, b: np.ndarray, threshold: float) -> np.ndarray:
+    """Bool map over the union of both sizes; area only one image covers counts as changed."""
+    height, width = max(a.shape[0], b.shape[0]), max(a.shape[1], b.shape[1])
+    h, w = min(a.shape[0], b.shape[0]), min(a.shape[1], b.shape[1])
+    changed = np.ones((height, width), dtype=bool)
+    limit = int(threshold * 255)
+    # |a - b| as max - min stays in uint8; per-channel maximum is much faster than .max(axis=2)
+    x, y = a[:h, :w], b[:h, :w]
+    delta = np.maximum(x, y)
+    delta -= np.minimum(x, y)
+    changed[:h, :w] = np.maximum(np.maximum(delta[..., 0], delta[..., 1]), delta[..., 2]) > limit
+    return changed
+
+
+def tile_ratios(changed: np.ndarray, ignored: np.ndarray, tile: int) -> np.ndarray:
+    """Changed share of the compared pixels in each tile (0 for fully ignored tiles)."""
+    height, width = changed.shape
+    th, tw = -(-height // tile), -(-width // tile)
+    pad = ((0, th * tile - height), (0, tw * tile - width))
+    counted = np.pad(~ignored, pad)
+    hits = np.pad(changed & ~ignored, pad)
+    per_tile = hits.reshape(th, tile, tw, tile).sum(axis=(1, 3))
+    totals = counted.reshape(th, tile, tw, tile).sum(axis=(1, 3))
+    return np.divide(per_tile, totals, out=np.zeros(per_tile.shape), where=totals > 0)
+
+
+def heatmap(actual: np.ndarray, changed: np.ndarray, ignored: np.ndarray, failed_tiles: np.ndarray,
+            tile: int) -> bytes:
+    height, width = changed.shape
+    h, w = actual.shape[:2]
+    # faded grayscale page for context: (r + 2g + b) / 4, squeezed into 160..243
+    faded = np.full((height, width), 245, dtype=np.uint8)
+    a = actual.astype(np.uint16)  # widen first: 2 * g alone overflows uint8
+    faded[:h, :w] = ((a[..., 0] + 2 * a[..., 1] + a[..., 2]) >> 4) * 85 // 64 + 160
+    hits = changed & ~ignored
+    any_ignored = ignored.any()
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    for c, (tint, hit) in enumerate(((0, 255), (0, 0), (128, 0))):  # ignored: blue tint, changed: red
+        channel = faded.copy()
+        if any_ignored:
+            channel[ignored] = channel[ignored] // 2 + tint
+        channel[hits] = hit
+        out[..., c] = channel
+    for ty, tx in zip(*np.nonzero(failed_tiles)):
+        y0, x0 = ty * tile, tx * tile
+        y1, x1 = min(height, y0 + tile) - 1, min(width, x0 + tile) - 1
+        out[y0:y1 + 1, [x0, x1]] = (255, 140, 0)
+        out[[y0, y1], x0:x1 + 1] = (255, 140, 0)
+    buf = io.BytesIO()
+    Image.fromarray(out).save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+
+def _decode(png: bytes) -> Image.Image:
+    img = Image.open(io.BytesIO(png))
+    return img.convert("RGB") if img.mode != "RGB" else img
+
+
+def compare_png(baseline_png: bytes, actual_png: bytes, rects: Sequence[Sequence[float]],
+                options: Dict[str, Any], baseline_hashes: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Compare two PNGs (see the module docstring for the stages). Returns a JSON-able
+    summary with `passed`, plus the heatmap PNG bytes under `heatmap` when pixels differ."""
+    started = time.perf_counter()
+    out: Dict[str, Any] = {"passed": True, "stage": "bytes", "diff_pixels": 0, "diff_ratio": 0.0,
+                           "failed_tiles": 0, "heatmap": None}
+    if hashlib.sha256(actual_png).digest() == hashlib.sha256(baseline_png).digest():
+        out["ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return out
+
+    base_img, act_img = _decode(baseline_png), _decode(actual_png)
+    out.update(size=[act_img.width, act_img.height], baseline_size=[base_img.width, base_img.height])
+    base_hashes = baseline_hashes or {"dhash": dhash(base_img), "phash": phash(base_img)}
+    out.update(dhash=dhash(act_img), phash=phash(act_img))
+    out.update(dhash_distance=hamming(out["dhash"], base_hashes.get("dhash")),
+               phash_distance=hamming(out["phash"], base_hashes.get("phash")))
+    a, b = np.asarray(base_img), np.asarray(act_img)
+
+    if a.shape == b.shape and np.array_equal(a, b):
+        out["stage"] = "pixels"
+    elif options.get("hash_precheck") and a.shape == b.shape and out["dhash_distance"] == 0 \
+            and out["phash_distance"] == 0:
+        out["stage"] = "hash"
+    else:
+        out["stage"] = "diff"
+        tile = max(4, int(options.get("tile") or DEFAULTS["tile"]))
+        changed = changed_pixels(a, b, float(options.get("threshold", DEFAULTS["threshold"])))
+        ignored = ignore_mask(*changed.shape, rects)
+        ratios = tile_ratios(changed, ignored, tile)
+        failed = ratios > float(options.get("max_tile_ratio", DEFAULTS["max_tile_ratio"]))
+        compared = int(ignored.size - ignored.sum())
+        diff = int((changed & ~ignored).sum())
+        ratio = diff / compared if compared else 0.0
+        out.update(diff_pixels=diff, diff_ratio=round(ratio, 6), tiles=int(ratios.size),
+                   changed_tiles=int((ratios > 0).sum()), failed_tiles=int(failed.sum()),
+                   max_tile_ratio=round(float(ratios.max()) if ratios.size else 0.0, 4))
+        out["passed"] = ratio <= float(options.get("max_diff_ratio", DEFAULTS["max_diff_ratio"])) \
+            and not failed.any()
+        if diff:
+            out["heatmap"] = heatmap(b, changed, ignored, failed, tile)
+    out["ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return out
+
+
+def compare_with_baseline(baseline_path: str, actual_png: bytes, rects: Sequence[Sequence[float]],
+                          options: Dict[str, Any], baseline_hashes: Optional[Dict[str, Any]] = None):
+    """compare_png() reading the baseline itself, so only the new screenshot is sent
+    to the worker process."""
+    with open(baseline_path, "rb") as f:
+        return compare_png(f.read(), actual_png, rects, options, baseline_hashes)
+
+
+# -----------------------------
+# baselines
+# -----------------------------
+
+class BaselineStore:
+    """Baseline PNGs by name (`{test_id}/{name}`), stored content-addressed under root
+    with a JSON index carrying their size and perceptual hashes."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.index: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        index_path = os.path.join(root, "index.json")
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    self.index = json.load(f)
+            except Exception as e:
+                print(f"[BaselineStore] index unreadable, starting empty: {e}")
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, f"{digest}.png")
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        entry = self.index.get(name)
+        if entry is None or not os.path.exists(self.path(entry["sha256"])):
+            return None
+        return dict(entry, path=self.path(entry["sha256"]))
+
+    def put(self, name: str, png: bytes, hashes: Dict[str, Any]) -> Dict[str, Any]:
+        path = self.path(hashes["sha256"])
+        with self._lock:
+            if not os.path.exists(path):
+                tmp = f"{path}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(png)
+                os.replace(tmp, path)
+            self.index[name] = dict(hashes, updated_at=time.time())
+            self._save()
+        return self.index[name]
+
+    def _save(self):
+        path = os.path.join(self.root, "index.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"baselines": len(self.index)}
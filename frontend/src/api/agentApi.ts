@@ -8,20 +8,30 @@ export default client
 
 // frontend/src/hooks/useAgentStatus.ts
 import { useEffect, useState } from 'react'
-import agentApi from '../api/agentApi'
 
-export default function useAgentStatus(poll=5000){
+// Loads one page of tasks, then applies pushed deltas from /events/tasks (SSE).
+// EventSource resends Last-Event-ID on reconnect; a `reset` event means reload.
+export function useAgentStatus(limit=50){
   const [status, setStatus] = useState<any>(null)
   useEffect(()=>{
     let mounted=true
     async function load(){
       try{
-        const res = await agentApi.get('/tasks')
-        if(mounted) setStatus({tasks:res.data})
+        const res = await client.get('/tasks', { params: { limit } })
+        if(mounted) setStatus({tasks:res.data.items, counts:res.data.counts})
       }catch(e){ }
     }
-    load(); const id=setInterval(load,poll)
-    return ()=>{ mounted=false; clearInterval(id) }
-  }, [poll])
+    function apply(task:any){
+      setStatus((prev:any)=>{
+        const tasks = (prev?.tasks || []).filter((t:any)=>t.id !== task.id)
+        return {...prev, tasks: [task, ...tasks].slice(0, limit)}
+      })
+    }
+    load()
+    const es = new EventSource(`${AGENT_API}/events/tasks`)
+    es.addEventListener('task', (e:any)=>{ if(mounted) apply(JSON.parse(e.data)) })
+    es.addEventListener('reset', ()=>{ load() })
+    return ()=>{ mounted=false; es.close() }
+  }, [limit])
   return status
-}
\ No newline at end of file
+}
@@ -59,6 +59,16 @@ export default function Reports() {
         <p>{summary}</p>
       </div>
 
+      <div style={{marginTop:20, padding:12, border:'1px solid #ddd'}}>
+        <h3>Hourly Trend</h3>
+        {(metrics.trends?.hour || []).length === 0 && <div>No trend data yet.</div>}
+        <ul>
+          {(metrics.trends?.hour || []).slice(-12).map((b:any) => (
+            <li key={b.bucket}>{b.bucket}: {b.completed} completed, {b.failed} failed{b.avg_duration_seconds != null ? `, avg ${b.avg_duration_seconds.toFixed(1)}s` : ''}</li>
+          ))}
+        </ul>
+      </div>
+
       <div style={{marginTop:20}}>
         <h3>Recent Tasks</h3>
         <pre style={{background:'#f6f6f6', padding:12, maxHeight:300, overflow:'auto'}}>{JSON.stringify(metrics.recent_tasks, null, 2)}</pre>
@@ -0,0 +1,94 @@
+"""
+Benchmark: flat artifact files written on the event loop vs. the content-addressed store.
+
+Usage:
+    python scripts/bench_artifact_store.py [runs] [dom_kb]      # default: 200 300
+
+Each simulated run saves a DOM snapshot (JSON, ~dom_kb KB) and a DOM index on
+failure, and a 200 KB screenshot; like retries and reruns of the same failure,
+only every 10th run's page differs. Reported per mode:
+  loop stall    time the event loop spent blocked in artifact code (what other runs wait for)
+  disk          bytes on disk afterwards
+"""
+
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "executor"))
+from artifact_store import ArtifactStore  # noqa: E402
+
+
+def page(variant: int, dom_kb: int):
+    rnd = random.Random(variant)
+    rows = "".join(f"<tr><td class='sku'>SKU-{rnd.randint(0, 99999)}</td><td>Item {i}</td></tr>"
+                   for i in range(dom_kb * 1024 // 60))
+    html = f"<html><body><table>{rows}</table></body></html>"
+    index = {"url": "http://shop.test/cart", "elements": [
+        {"tag": "button", "role": "button", "name": f"Add {i}", "css": f"tr:nth-child({i}) button"}
+        for i in range(300)]}
+    shot = rnd.randbytes(200 * 1024)
+    return html, index, shot
+
+
+def disk_usage(root: str) -> int:
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+
+
+async def flat(root: str, runs: int, dom_kb: int) -> float:
+    stall = 0.0
+    for i in range(runs):
+        html, index, shot = page(i // 10, dom_kb)
+        prefix = os.path.join(root, f"run_{i}_t1")
+        t0 = time.perf_counter()
+        with open(f"{prefix}_dom.json", "w", encoding="utf-8") as f:
+            json.dump({"html": html}, f, ensure_ascii=False)
+        with open(f"{prefix}_dom_index.json", "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        with open(f"{prefix}_step.png", "wb") as f:
+            f.write(shot)
+        stall += time.perf_counter() - t0
+        await asyncio.sleep(0)
+    return stall
+
+
+async def store(root: str, runs: int, dom_kb: int) -> float:
+    s = ArtifactStore(root)
+    stall, pending = 0.0, []
+    for i in range(runs):
+        html, index, shot = page(i // 10, dom_kb)
+        prefix = f"run_{i}_t1"
+        t0 = time.perf_counter()
+        pending += [asyncio.ensure_future(s.put_json(f"{prefix}_dom.json", {"html": html})),
+                    asyncio.ensure_future(s.put_json(f"{prefix}_dom_index.json", index)),
+                    asyncio.ensure_future(s.put(f"{prefix}_step.png", shot, "image/png"))]
+        stall += time.perf_counter() - t0
+        await asyncio.sleep(0)
+    await asyncio.gather(*pending)
+    print(f"{'':<8} store stats: {json.dumps({k: v for k, v in s.stats().items() if k != 'max_bytes'})}")
+    s.close()
+    return stall
+
+
+async def bench(runs: int, dom_kb: int):
+    for name, fn in (("flat", flat), ("store", store)):
+        root = tempfile.mkdtemp()
+        try:
+            t0 = time.perf_counter()
+            stall = await fn(root, runs, dom_kb)
+            total = time.perf_counter() - t0
+            print(f"{name:<8} runs={runs}  loop stall={stall * 1000:8.1f} ms  total={total:6.2f}s"
+                  f"  disk={disk_usage(root) / 1e6:8.1f} MB")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    runs, dom_kb = (args + [200, 300][len(args):])[:2]
+    asyncio.run(bench(runs, dom_kb))
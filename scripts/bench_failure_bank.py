@@ -0,0 +1,105 @@
+"""
+Benchmark: indexed FailureBank vs. the legacy full-file SequenceMatcher scan.
+
+Usage:
+    python scripts/bench_failure_bank.py [sizes...]      # default: 10000 100000
+
+The legacy scan re-reads the JSONL file and runs difflib over every record per
+query, so only a few queries are timed at large sizes.
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent"))
+from utils.failure_bank import FailureBank  # noqa: E402
+
+ERRORS = [
+    "Timeout {n}ms exceeded.\n=========================== logs ===========================\nwaiting for locator(\"{sel}\")",
+    "Error: strict mode violation: locator(\"{sel}\") resolved to {n} elements",
+    "Assertion failed: {text} not found in page content",
+    "net::ERR_CONNECTION_REFUSED at https://staging-{n}.example.com/{page}",
+    "Element is not visible: {sel} (attempt {n})",
+    "Target page, context or browser has been closed",
+]
+PAGES = ["login", "cart", "checkout", "search", "profile", "orders", "settings", "home"]
+WIDGETS = ["submit", "add-to-cart", "checkout", "login", "menu", "search-input", "next", "confirm"]
+
+
+def make_record(rng: random.Random, i: int) -> dict:
+    page, widget = rng.choice(PAGES), rng.choice(WIDGETS)
+    sel = f"#{page}-{widget}-{rng.randint(1, 400)}"
+    err = rng.choice(ERRORS).format(n=rng.randint(1, 9000), sel=sel, text=f"{widget} {page}", page=page)
+    action = rng.choice(["click", "type", "waitfor", "assert"])
+    return {
+        "job_id": f"run_{i:08x}",
+        "error": err,
+        "failed_step": {"action": action, "target": {"type": "selector", "value": sel}, "timeout_ms": 5000},
+        "artifacts": {"dom_snapshot_key": f"./artifacts/run_{i:08x}_dom.json"},
+        "timestamp": "2024-01-01T00:00:00",
+    }
+
+
+def legacy_scan(path: str, text: str, limit: int = 3):
+    results = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+                sim = SequenceMatcher(None, text, json.dumps(rec.get("failed_step", ""))).ratio()
+                results.append((sim, rec))
+            except Exception:
+                continue
+    results.sort(key=lambda x: x[0], reverse=True)
+    return [r for (_, r) in results[:limit]]
+
+
+def pct(samples, q):
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+def bench(n: int, queries: int = 200, legacy_queries: int = 3):
+    rng = random.Random(n)
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "failure_bank.jsonl")
+        snap = os.path.join(d, "failure_bank.snapshot")
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(n):
+                f.write(json.dumps(make_record(rng, i), ensure_ascii=False) + "\n")
+
+        t0 = time.perf_counter()
+        bank = FailureBank(path, snap, snapshot_every=1)
+        build = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        FailureBank(path, snap)
+        load = time.perf_counter() - t0
+
+        probes = [make_record(rng, n + i) for i in range(queries)]
+        lat = []
+        for p in probes:
+            t0 = time.perf_counter()
+            bank.search_failure(p["error"], p["failed_step"], k=3)
+            lat.append(time.perf_counter() - t0)
+
+        legacy = []
+        for p in probes[:legacy_queries]:
+            t0 = time.perf_counter()
+            legacy_scan(path, json.dumps(p["failed_step"]))
+            legacy.append(time.perf_counter() - t0)
+
+    print(f"records={n:>7}  index_docs={len(bank.doc_features):>6}  build={build:.2f}s  snapshot_load={load:.2f}s")
+    print(f"  indexed top-3: p50={pct(lat, .5) * 1e3:.3f}ms  p99={pct(lat, .99) * 1e3:.3f}ms  ({queries} queries)")
+    print(f"  legacy scan:   mean={sum(legacy) / len(legacy) * 1e3:.1f}ms  ({legacy_queries} queries)")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000]
+    for n in sizes:
+        bench(n)
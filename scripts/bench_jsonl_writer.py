@@ -0,0 +1,93 @@
+"""
+Benchmark: batched JsonlWriter vs. synchronous appends from async handlers.
+
+Usage:
+    python scripts/bench_jsonl_writer.py [events] [producers]      # default: 20000 50
+
+`producers` coroutines each log events/producers records, yielding between
+writes like request handlers do. Reported per mode:
+  call p50/p99   time the handler spends in the write call (what request latency sees)
+  total          wall time until every record is on disk (writer flushed and closed)
+
+Modes:
+  sync open/append      open(..., "a") + write per record (old FailureBank / TaskManager path)
+  sync + fsync          the same with an fsync per record (durable, no batching)
+  writer                JsonlWriter, fsync every 100 lines / 1000 ms (agent defaults)
+  writer, fsync every   JsonlWriter with fsync_every=1: still one fsync per *batch*
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent"))
+from utils.jsonl_writer import JsonlWriter  # noqa: E402
+
+
+def record(i: int) -> dict:
+    return {"time": "2024-01-01T00:00:00", "event": "executor_call",
+            "detail": {"task_id": f"{i:08x}-task", "attempt": 1, "from_step": 0, "session_id": None}}
+
+
+def pct(samples, q):
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+def sync_append(path: str, fsync: bool):
+    def write(rec):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    return write
+
+
+async def run(write, n: int, producers: int):
+    lat = []
+
+    async def producer(p: int):
+        for i in range(p, n, producers):
+            t0 = time.perf_counter()
+            write(record(i))
+            lat.append(time.perf_counter() - t0)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(producer(p) for p in range(producers)))
+    return lat
+
+
+async def bench(n: int, producers: int):
+    with tempfile.TemporaryDirectory() as d:
+        modes = [("sync open/append", False, None), ("sync + fsync", True, None),
+                 ("writer", None, dict(fsync_every=100, fsync_interval_ms=1000)),
+                 ("writer, fsync every", None, dict(fsync_every=1, fsync_interval_ms=0))]
+        for name, fsync, opts in modes:
+            path = os.path.join(d, name.replace(" ", "_").replace("/", "_") + ".jsonl")
+            count = n if opts is not None or not fsync else min(n, 2000)  # per-record fsync is slow
+            t0 = time.perf_counter()
+            if opts is None:
+                lat = await run(sync_append(path, fsync), count, producers)
+                extra = ""
+            else:
+                writer = JsonlWriter(path, **opts)
+                lat = await run(writer.write, count, producers)
+                await writer.close()
+                s = writer.stats()
+                extra = f"  batches={s['batches']} fsyncs={s['fsyncs']} inline_drains={s['inline_drains']}"
+            total = time.perf_counter() - t0
+            with open(path, "r", encoding="utf-8") as f:
+                lines = sum(1 for _ in f)
+            assert lines == count, (name, lines, count)
+            print(f"{name:<20} events={count:>6}  call p50={pct(lat, .5) * 1e6:7.1f}us  p99={pct(lat, .99) * 1e6:8.1f}us"
+                  f"  total={total:6.2f}s  ({count / total:,.0f}/s){extra}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    n, producers = (args + [20000, 50][len(args):])[:2]
+    asyncio.run(bench(n, producers))
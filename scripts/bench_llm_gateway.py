@@ -0,0 +1,63 @@
+"""
+Benchmark: LLM gateway cache and request coalescing, offline.
+
+Usage:
+    python scripts/bench_llm_gateway.py [latency_ms] [prompts] [duplicates]   # default: 200 20 10
+
+Uses the stub backend (fixed latency per call) so the numbers show what the
+gateway saves, not model variance:
+  cold      every distinct prompt once, concurrently (backend calls)
+  warm      the same prompts again (cache hits)
+  restart   a fresh gateway on the same SQLite file (persistent hits)
+  burst     `duplicates` concurrent copies of each new prompt (coalesced)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent"))
+from utils.llm_gateway import LLMGateway, StubBackend  # noqa: E402
+
+
+async def timed(gateway: LLMGateway, prompts):
+    t0 = time.perf_counter()
+    await asyncio.gather(*(gateway.complete(p) for p in prompts))
+    return time.perf_counter() - t0
+
+
+async def bench(latency_ms: float, n: int, duplicates: int):
+    prompts = [f"Suggest a selector fix for failure #{i}" for i in range(n)]
+    burst = [f"Generate a scenario for flow #{i}" for i in range(n) for _ in range(duplicates)]
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "llm_cache.db")
+        backend = StubBackend(latency_ms)
+        gw = LLMGateway(backend, cache_path=path)
+
+        cold = await timed(gw, prompts)
+        warm = await timed(gw, prompts)
+        calls = backend.calls
+        burst_s = await timed(gw, burst)
+        burst_calls = backend.calls - calls
+        stats = gw.stats()
+        gw.close()
+
+        backend2 = StubBackend(latency_ms)
+        gw2 = LLMGateway(backend2, cache_path=path)
+        restart = await timed(gw2, prompts)
+        gw2.close()
+
+    print(f"stub latency={latency_ms:.0f}ms  prompts={n}  concurrency={gw.max_concurrency}")
+    print(f"  cold:    {cold * 1e3:8.1f}ms  backend calls={calls}")
+    print(f"  warm:    {warm * 1e3:8.1f}ms  backend calls=0")
+    print(f"  restart: {restart * 1e3:8.1f}ms  backend calls={backend2.calls}")
+    print(f"  burst:   {burst_s * 1e3:8.1f}ms  requests={len(burst)}  backend calls={burst_calls}"
+          f"  coalesced={stats['coalesced']}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    latency_ms, n, duplicates = (args + [200, 20, 10][len(args):])[:3]
+    asyncio.run(bench(latency_ms, n, duplicates))
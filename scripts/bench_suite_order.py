@@ -0,0 +1,94 @@
+"""
+Benchmark: time to the first failure of a red build, historical-duration (LPT) order
+vs. failure-history order (agent/utils/prioritizer.py).
+
+Usage:
+    python scripts/bench_suite_order.py [tests] [executors] [builds]      # default: 300 4 200
+
+Synthesizes a suite whose tests take 2-240 s: most are stable, a few are flaky
+and one or two are broken by the "current change" (they failed in the last
+runs). Two weeks of history (tasks + failure bank records) feed the prioritizer;
+then `builds` red builds are simulated and, per order, the median and p90
+seconds until the first failed result is reported across all shards.
+"""
+
+import os
+import random
+import statistics
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent"))
+from utils.prioritizer import suite_order  # noqa: E402
+from utils.sharding import historical_durations, lpt_shard  # noqa: E402
+
+
+def suite(n: int, rnd: random.Random):
+    tests = []
+    for i in range(n):
+        kind = rnd.choices(["stable", "flaky", "broken"], [0.9, 0.09, 0.01])[0]
+        fail = {"stable": 0.002, "flaky": 0.15, "broken": 0.9}[kind]
+        tests.append({"test_id": f"t{i}", "seconds": rnd.lognormvariate(3, 1.0) % 240 + 2, "p": fail, "kind": kind})
+    if not any(t["kind"] == "broken" for t in tests):
+        tests[rnd.randrange(n)].update(kind="broken", p=0.9)
+    return tests
+
+
+def history(tests, rnd: random.Random, runs: int = 30):
+    now = datetime.utcnow()
+    tasks, failures = [], []
+    for r in range(runs):
+        for t in tests:
+            # broken tests only started failing in the last few runs
+            p = t["p"] if t["kind"] != "broken" or r >= runs - 3 else 0.002
+            ended = now - timedelta(hours=(runs - r) * 12)
+            failed = rnd.random() < p
+            tid = f"{t['test_id']}-{r}"
+            tasks.append({"id": tid, "test_id": t["test_id"], "status": "failed" if failed else "completed",
+                          "started_at": (ended - timedelta(seconds=t["seconds"])).isoformat(),
+                          "updated_at": ended.isoformat()})
+            if failed:
+                failures.append({"job_id": f"run_{tid[:8]}", "test_id": t["test_id"], "timestamp": ended.isoformat()})
+    return tasks, failures
+
+
+def first_failure(shards, outcome) -> float:
+    best = float("inf")
+    for shard in shards:
+        clock = 0.0
+        for ir in shard:
+            clock += ir["seconds"]
+            if outcome[ir["test_id"]]:
+                best = min(best, clock)
+                break
+    return best
+
+
+def bench(n: int, executors: int, builds: int):
+    rnd = random.Random(5)
+    tests = suite(n, rnd)
+    tasks, failures = history(tests, rnd)
+    irs = [{"test_id": t["test_id"], "seconds": t["seconds"]} for t in tests]
+
+    lpt = [s["tests"] for s in lpt_shard(irs, historical_durations(tasks), executors)]
+    rank = {r["test"]["test_id"]: i for i, r in enumerate(suite_order(irs, tasks, failures))}
+    prioritized = [sorted(s, key=lambda ir: rank[ir["test_id"]]) for s in lpt]
+
+    results = {"lpt": [], "prioritized": []}
+    for _ in range(builds):
+        outcome = {t["test_id"]: rnd.random() < t["p"] for t in tests}
+        if not any(outcome.values()):
+            continue
+        results["lpt"].append(first_failure(lpt, outcome))
+        results["prioritized"].append(first_failure(prioritized, outcome))
+    wall = max(sum(ir["seconds"] for ir in s) for s in lpt)
+    print(f"{n} tests on {executors} executors, suite wall time {wall:.0f} s, {len(results['lpt'])} red builds")
+    for name, xs in results.items():
+        xs.sort()
+        print(f"{name:<12} first failure: median {statistics.median(xs):7.1f} s   p90 {xs[int(len(xs) * 0.9)]:7.1f} s")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    n, executors, builds = (args + [300, 4, 200][len(args):])[:3]
+    bench(n, executors, builds)
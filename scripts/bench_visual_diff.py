@@ -0,0 +1,116 @@
+"""
+Benchmark: screenshot vs. baseline comparison (executor/visual.py) on tall pages.
+
+Usage:
+    python scripts/bench_visual_diff.py [height] [workers]      # default: 4096 2
+
+Synthesizes a 1280 x height "page" (text lines, images, buttons) and reports,
+per case, the compare_png() stage that decided it and its median time:
+  identical bytes      same PNG again (no decode)
+  re-encoded           same pixels, different PNG encoding
+  small change         one button recoloured (fails on its tiles)
+  masked change        a rotating banner, covered by an ignore rect (passes)
+  shifted content      everything below the header moves down 24 px
+Then 8 comparisons of the small-change case, inline on the event loop vs. in a
+process pool, with the worst event-loop lag seen by a 10 ms ticker meanwhile.
+"""
+
+import asyncio
+import io
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "executor"))
+from visual import DEFAULTS, compare_png  # noqa: E402
+
+
+def page(height: int) -> np.ndarray:
+    rnd = np.random.default_rng(7)
+    img = np.full((height, 1280, 3), 250, dtype=np.uint8)
+    img[:80] = (30, 60, 120)                                        # header
+    for y in range(120, height - 40, 22):                           # text lines
+        width = int(rnd.integers(400, 1100))
+        img[y:y + 12, 80:80 + width] = rnd.integers(20, 80, (12, width, 1), dtype=np.uint8)
+    for y in range(300, height - 300, 900):                         # images
+        img[y:y + 240, 700:1180] = rnd.integers(0, 255, (240, 480, 3), dtype=np.uint8)
+    img[1000:1040, 80:240] = (0, 120, 215)                          # button
+    return img
+
+
+def encode(img: np.ndarray, level: int = 6) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="PNG", compress_level=level)
+    return buf.getvalue()
+
+
+def cases(height: int):
+    base = page(height)
+    button = base.copy()
+    button[1000:1040, 80:240] = (0, 150, 60)
+    banner = base.copy()
+    banner[300:540, 700:1180] = 255 - banner[300:540, 700:1180]
+    shifted = base.copy()
+    shifted[104:] = base[80:-24]
+    shifted[80:104] = 250
+    return encode(base), [
+        ("identical bytes", encode(base), []),
+        ("re-encoded", encode(base, 1), []),
+        ("small change", encode(button), []),
+        ("masked change", encode(banner), [[700, 300, 480, 240]]),
+        ("shifted content", encode(shifted), []),
+    ]
+
+
+async def loop_lag(stop: asyncio.Event) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - t0 - 0.01)
+    return worst
+
+
+async def responsiveness(baseline: bytes, actual: bytes, workers: int):
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(pool, compare_png, baseline, baseline, [], DEFAULTS)  # start the workers
+    for mode in ("inline", "pool"):
+        stop = asyncio.Event()
+        ticker = asyncio.ensure_future(loop_lag(stop))
+        await asyncio.sleep(0.02)
+        t0 = time.perf_counter()
+        if mode == "inline":
+            for _ in range(8):
+                compare_png(baseline, actual, [], DEFAULTS)
+                await asyncio.sleep(0)
+        else:
+            await asyncio.gather(*(loop.run_in_executor(pool, compare_png, baseline, actual, [], DEFAULTS)
+                                   for _ in range(8)))
+        total = time.perf_counter() - t0
+        stop.set()
+        print(f"{mode:<8} 8 comparisons: {total * 1000:7.0f} ms wall, worst loop lag {await ticker * 1000:6.0f} ms")
+    pool.shutdown()
+
+
+def bench(height: int, workers: int):
+    baseline, variants = cases(height)
+    print(f"page 1280x{height}, baseline PNG {len(baseline) / 1e6:.1f} MB")
+    for name, actual, rects in variants:
+        runs = [compare_png(baseline, actual, rects, DEFAULTS) for _ in range(5)]
+        r = runs[-1]
+        print(f"{name:<16} stage={r['stage']:<6} passed={str(r['passed']):<5} diff={r['diff_ratio']:.4%}"
+              f"  failed_tiles={r['failed_tiles']:<4} median={statistics.median(x['ms'] for x in runs):7.1f} ms")
+    asyncio.run(responsiveness(baseline, variants[2][1], workers))
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    height, workers = (args + [4096, 2][len(args):])[:2]
+    bench(height, workers)
@@ -0,0 +1,32 @@
+"""
+Backfill the agent's materialized report metrics (data/metrics.json) from existing files:
+tasks (snapshot + tail log), agent.log.jsonl (with rotated .1 .. .N) and failure_bank.jsonl.
+
+Stop the agent first (it rewrites metrics.json on shutdown), then run from the repo root:
+    DATA_DIR=./agent/data python scripts/rebuild_metrics.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent"))
+from config import Config  # noqa: E402
+from report_generator import read_jsonl  # noqa: E402
+from utils.failure_bank import FailureBank  # noqa: E402
+from utils.metrics_engine import MetricsEngine  # noqa: E402
+from utils.task_manager import TaskManager  # noqa: E402
+
+if __name__ == '__main__':
+    tasks = TaskManager(Config.TASK_STATE_FILE, snapshot_file=Config.TASK_SNAPSHOT_FILE).all_tasks()
+    # rotated event logs first (oldest = highest suffix), then the live file
+    logs = []
+    for i in range(Config.LOG_ROTATE_BACKUPS, 0, -1):
+        logs.extend(read_jsonl(f"{Config.LOG_FILE}.{i}"))
+    logs.extend(read_jsonl(Config.LOG_FILE))
+    failures = FailureBank(os.path.join(Config.DATA_DIR, "failure_bank.jsonl")).records
+
+    engine = MetricsEngine(Config.METRICS_FILE)
+    engine.rebuild(tasks, logs, failures)
+
+    m = engine.snapshot()
+    print(f"Rebuilt {Config.METRICS_FILE}: {m['total_tasks']} tasks, {m['log_count']} log events, {m['failure_count']} failures")